@@ -0,0 +1,61 @@
+"""
+Tool output reduction benchmark.
+
+Reduces synthetic command outputs of a few megabytes (compiler warnings with
+a buried error, and an `ls -R` like listing) to a token budget and reports
+the time and the size of the result.
+
+Usage: python benchmarks/reduce_output.py [--mb N] [--budget TOKENS]
+"""
+
+import time
+import argparse
+from shy_sh.agents.output import reduce_output
+from shy_sh.agents.tokens import get_tokenizer
+
+
+def _warnings(size):
+    lines, total, i = [], 0, 0
+    while total < size:
+        line = f"src/module{i % 97}.c:{i}:5: warning: unused variable 'tmp{i}' [-Wunused-variable]"
+        lines.append(line)
+        total += len(line) + 1
+        i += 1
+    lines.insert(
+        len(lines) // 2, "src/main.c:42:1: error: expected ';' before '}' token"
+    )
+    return "\n".join(lines)
+
+
+def _listing(size):
+    lines, total, i = [], 0, 0
+    while total < size:
+        line = f"./pkg/{i // 50}/{'abcdefghijklmnopqrstuvwxyz'[i % 26] * (i % 7 + 3)}_{i}.py"
+        lines.append(line)
+        total += len(line) + 1
+        i += 1
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--mb", type=float, default=4)
+    parser.add_argument("--budget", type=int, default=8000)
+    args = parser.parse_args()
+
+    size = int(args.mb * 1024 * 1024)
+    count = get_tokenizer().count
+    print(f"{'output':<10} {'input [MB]':>11} {'time [ms]':>10} {'tokens':>8}")
+    for name, make in [("warnings", _warnings), ("listing", _listing)]:
+        text = make(size)
+        start = time.perf_counter()
+        reduced = reduce_output(text, args.budget)
+        elapsed = time.perf_counter() - start
+        print(
+            f"{name:<10} {len(text) / 1024 / 1024:>11.1f} "
+            f"{elapsed * 1000:>10.0f} {count(reduced):>8}"
+        )
+
+
+if __name__ == "__main__":
+    main()
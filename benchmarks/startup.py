@@ -0,0 +1,94 @@
+"""
+Startup benchmark for the `shy` entry point.
+
+Every entry mode is run in a fresh interpreter with `python -X importtime`,
+the script reports the wall time, the peak RSS of the child process and the
+slowest top level imports of each mode.
+
+Usage: python benchmarks/startup.py [--runs N] [--top N]
+"""
+
+import os
+import sys
+import time
+import argparse
+import subprocess
+
+ENTRY_MODES = {
+    "version": ["-m", "shy_sh.main", "--version"],
+    "help": ["-m", "shy_sh.main", "--help"],
+    "configure (import)": [
+        "-c",
+        "import shy_sh.main; from shy_sh.settings import configure_yaml",
+    ],
+    "explain (import)": [
+        "-c",
+        "import shy_sh.main; import shy_sh.agents.chains.explain",
+    ],
+    "agent (import)": [
+        "-c",
+        "import shy_sh.main; import shy_sh.agents.shy_agent.agent",
+    ],
+}
+
+
+def _run(args):
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-X", "importtime", *args],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        env={**os.environ, "PYTHONWARNINGS": "ignore"},
+    )
+    stderr = proc.stderr.read().decode()  # type: ignore
+    _, status, rusage = os.wait4(proc.pid, 0)
+    elapsed = time.perf_counter() - start
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    # ru_maxrss is in kilobytes on linux and in bytes on macos
+    rss = rusage.ru_maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+    return elapsed, rss, _parse_importtime(stderr)
+
+
+def _parse_importtime(stderr: str):
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|", 2)
+        depth = (len(name) - len(name.lstrip())) // 2
+        imports.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return imports
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=5)
+    args = parser.parse_args()
+
+    print(
+        f"{'mode':<20} {'wall [ms]':>10} {'rss [MB]':>9} {'imports [ms]':>13} {'modules':>8}"
+    )
+    reports = {}
+    for mode, argv in ENTRY_MODES.items():
+        runs = [_run(argv) for _ in range(args.runs)]
+        wall = sorted(r[0] for r in runs)[len(runs) // 2]
+        rss = max(r[1] for r in runs)
+        imports = runs[-1][2]
+        total = sum(i[1] for i in imports) / 1000
+        reports[mode] = imports
+        print(
+            f"{mode:<20} {wall * 1000:>10.1f} {rss:>9.1f} {total:>13.1f} {len(imports):>8}"
+        )
+
+    for mode, imports in reports.items():
+        top_level = sorted(
+            (i for i in imports if i[3] <= 1), key=lambda i: i[2], reverse=True
+        )
+        print(f"\n{mode}: slowest imports")
+        for name, _, cumulative, _ in top_level[: args.top]:
+            print(f"  {cumulative / 1000:>8.1f} ms  {name}")
+
+
+if __name__ == "__main__":
+    main()
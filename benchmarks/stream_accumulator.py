@@ -0,0 +1,94 @@
+"""
+Stream accumulator microbenchmark.
+
+Replays a synthetic stream of 20k tokens and compares the legacy
+`final_message = final_message + chunk` loop (plus the full content parse on
+every chunk) with StreamAccumulator, for a text answer and for a streamed
+function call.
+
+Usage: python benchmarks/stream_accumulator.py [--tokens N]
+"""
+
+import time
+import argparse
+from langchain_core.messages import AIMessageChunk
+from shy_sh.agents.streaming import StreamAccumulator
+
+
+def _legacy_parse(chunk):
+    if isinstance(chunk.content, list):
+        return "".join(c.get("text") for c in chunk.content if c.get("type") == "text")
+    return chunk.content
+
+
+def legacy(chunks):
+    final_message = None
+    for chunk in chunks:
+        final_message = chunk if final_message is None else final_message + chunk
+        _legacy_parse(final_message)
+    return _legacy_parse(final_message), final_message.tool_calls
+
+
+def accumulator(chunks):
+    stream = StreamAccumulator()
+    for chunk in chunks:
+        stream.add(chunk)
+    return stream.text, stream.tool_calls
+
+
+def _text_stream(tokens):
+    return [AIMessageChunk(content=f"tok{i % 10} ") for i in range(tokens)]
+
+
+def _tool_call_stream(tokens):
+    chunks = [
+        AIMessageChunk(
+            content="",
+            tool_call_chunks=[
+                {"name": "shell", "args": '{"arg": "', "id": "call_1", "index": 0}
+            ],
+        )
+    ]
+    chunks += [
+        AIMessageChunk(
+            content="",
+            tool_call_chunks=[
+                {"name": None, "args": f"x{i % 10}", "id": None, "index": 0}
+            ],
+        )
+        for i in range(tokens)
+    ]
+    chunks.append(
+        AIMessageChunk(
+            content="",
+            tool_call_chunks=[{"name": None, "args": '"}', "id": None, "index": 0}],
+        )
+    )
+    return chunks
+
+
+def _measure(fn, chunks):
+    start = time.perf_counter()
+    result = fn(chunks)
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--tokens", type=int, default=20_000)
+    args = parser.parse_args()
+
+    print(f"{'stream':<12} {'legacy [ms]':>12} {'accumulator [ms]':>17} {'speedup':>8}")
+    for name, make in [("text", _text_stream), ("tool call", _tool_call_stream)]:
+        chunks = make(args.tokens)
+        legacy_time, legacy_result = _measure(legacy, chunks)
+        new_time, new_result = _measure(accumulator, chunks)
+        assert legacy_result == new_result, "results differ"
+        print(
+            f"{name:<12} {legacy_time * 1000:>12.1f} {new_time * 1000:>17.1f} "
+            f"{legacy_time / new_time:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+stream_shell throughput benchmark.
+
+Compares the legacy `read(1)` polling loop with the chunked dual-pipe reader
+on a command that writes a few megabytes to stdout, and on a command with a
+chatty stderr that deadlocks the legacy loop (reported as a timeout).
+
+Usage: python benchmarks/stream_shell.py [--mb N] [--timeout S]
+"""
+
+import sys
+import time
+import argparse
+import subprocess
+from threading import Thread
+from shy_sh.utils import stream_shell, decode_output2
+
+
+def legacy_stream_shell(cmd: str):
+    result = subprocess.Popen(
+        cmd,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        shell=True,
+    )
+    while result.poll() is None:
+        chunk = b""
+        if result.stdout is not None and result.stdout.readable():
+            chunk += result.stdout.read(1)
+        yield decode_output2(chunk)
+    remaining = b""
+    if result.stdout is not None and result.stdout.readable():
+        remaining += result.stdout.read()
+    if result.stderr is not None and result.stderr.readable():
+        remaining += result.stderr.read()
+
+    if remaining:
+        yield decode_output2(remaining)
+
+
+def _run(stream, timeout):
+    size = 0
+
+    def consume():
+        nonlocal size
+        for chunk in stream:
+            size += len(chunk)
+
+    start = time.perf_counter()
+    thread = Thread(target=consume, daemon=True)
+    thread.start()
+    thread.join(timeout)
+    elapsed = time.perf_counter() - start
+    return None if thread.is_alive() else elapsed, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--mb", type=int, default=4)
+    parser.add_argument("--timeout", type=float, default=30)
+    args = parser.parse_args()
+
+    python = f'"{sys.executable}" -c'
+    commands = {
+        "stdout": f"{python} \"import sys; sys.stdout.write('x' * {args.mb} * 1024 * 1024)\"",
+        "stdout+stderr": f"{python} \"import sys; sys.stderr.write('e' * {args.mb} * 1024 * 1024); sys.stdout.write('x' * 1024)\"",
+    }
+    print(f"{'command':<15} {'reader':<8} {'time [s]':>9} {'MB/s':>9}")
+    for name, cmd in commands.items():
+        for reader, fn in [("legacy", legacy_stream_shell), ("chunked", stream_shell)]:
+            elapsed, size = _run(fn(cmd), args.timeout)
+            if elapsed is None:
+                print(f"{name:<15} {reader:<8} {'timeout':>9} {'-':>9}")
+                continue
+            mb = size / 1024 / 1024
+            print(f"{name:<15} {reader:<8} {elapsed:>9.2f} {mb / elapsed:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+Tokenizer registry benchmark.
+
+For every model it compares the count of the legacy flat o200k_base encoding
+and of the tokenizer picked by the registry against a reference count, and
+reports the encode cost per message (cold) and through the token ledger (warm).
+
+Reference counts come from the exact local encoding when the model has one,
+pass --reference with a jsonl file of {"provider", "model", "text", "tokens"}
+rows (e.g. collected from the provider usage metadata) for the other models.
+
+Usage: python benchmarks/tokenizers.py [--reference FILE] [--messages N]
+"""
+
+import json
+import time
+import random
+import argparse
+from langchain_core.messages import HumanMessage
+from shy_sh.agents.tokens import (
+    TokenLedger,
+    Tokenizer,
+    get_tokenizer,
+    resolve_tokenizer,
+)
+
+MODELS = [
+    ("openai", "gpt-4o"),
+    ("openai", "gpt-4-turbo"),
+    ("anthropic", "claude-3-5-sonnet-latest"),
+    ("google", "gemini-1.5-flash"),
+    ("groq", "llama3-70b-8192"),
+    ("ollama", "llama3.2"),
+    ("ollama", "mistral"),
+]
+
+
+def _samples(n: int):
+    rnd = random.Random(42)
+    words = "the quick brown fox jumps over lazy dog shell command file folder".split()
+    samples = []
+    for i in range(n):
+        kind = i % 4
+        if kind == 0:
+            text = " ".join(rnd.choice(words) for _ in range(rnd.randint(5, 200)))
+        elif kind == 1:
+            text = "\n".join(
+                f"-rw-r--r--  1 user staff {rnd.randint(0, 99999):>6} Jan {rnd.randint(1, 31):>2} file_{j}.py"
+                for j in range(rnd.randint(5, 100))
+            )
+        elif kind == 2:
+            text = json.dumps(
+                {"tool": "shell", "arg": f"find . -name '*.{rnd.choice(words)}'"}
+            )
+        else:
+            text = "def f(x):\n" + "\n".join(
+                f"    y{j} = x * {j}  # àèìòù ✨" for j in range(rnd.randint(1, 50))
+            )
+        samples.append(text)
+    return samples
+
+
+def _load_reference(path):
+    reference = {}
+    if not path:
+        return reference
+    with open(path) as f:
+        for line in f:
+            row = json.loads(line)
+            key = (row["provider"], row["model"])
+            reference.setdefault(key, []).append((row["text"], row["tokens"]))
+    return reference
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--reference", help="jsonl file with measured token counts")
+    parser.add_argument("--messages", type=int, default=400)
+    args = parser.parse_args()
+
+    samples = _samples(args.messages)
+    reference = _load_reference(args.reference)
+    legacy = Tokenizer("o200k_base")
+
+    print(
+        f"{'model':<36} {'tokenizer':<18} {'legacy err':>10} {'new err':>8} "
+        f"{'cold [us/msg]':>14} {'warm [us/msg]':>14}"
+    )
+    for provider, model in MODELS:
+        tokenizer = get_tokenizer(provider, model)
+        encoding, factor = resolve_tokenizer(provider, model)
+        texts = reference.get((provider, model))
+        if texts is None and factor is None:
+            texts = [(t, Tokenizer(encoding).count(t)) for t in samples]
+
+        legacy_err = new_err = "n/a"
+        if texts:
+            expected = sum(tokens for _, tokens in texts)
+            legacy_total = sum(legacy.count(t) for t, _ in texts)
+            new_total = sum(tokenizer.count(t) for t, _ in texts)
+            legacy_err = f"{(legacy_total - expected) / expected:+.1%}"
+            new_err = f"{(new_total - expected) / expected:+.1%}"
+
+        start = time.perf_counter()
+        for text in samples:
+            tokenizer.count(text)
+        cold = (time.perf_counter() - start) / len(samples) * 1e6
+
+        ledger = TokenLedger()
+        messages = [HumanMessage(content=t) for t in samples]
+        ledger.counts(messages)
+        start = time.perf_counter()
+        ledger.counts(messages)
+        warm = (time.perf_counter() - start) / len(samples) * 1e6
+
+        print(
+            f"{provider + '/' + model:<36} {tokenizer.name:<18} {legacy_err:>10} "
+            f"{new_err:>8} {cold:>14.1f} {warm:>14.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
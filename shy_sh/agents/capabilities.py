@@ -0,0 +1,203 @@
+import os
+import re
+import json
+from functools import lru_cache
+from pydantic import BaseModel
+from shy_sh.settings import settings, CACHE_DIR
+from shy_sh.agents.tokens import normalize_model_name
+
+DEFAULT_CONTEXT_LEN = 8192
+DEFAULT_MAX_OUTPUT = 4096
+# Ollama allocates the KV cache for the whole num_ctx, larger windows are opt-in
+OLLAMA_DEFAULT_NUM_CTX = 8192
+MODELS_CACHE_FILE = CACHE_DIR / "models.json"
+OLLAMA_HOST = "http://localhost:11434"
+
+
+class ModelCapabilities(BaseModel):
+    context: int
+    max_output: int
+
+
+# model name prefix -> (context window, max output tokens), the first match wins
+MODEL_CAPABILITIES = [
+    ("gpt-4o", 128_000, 16_384),
+    ("chatgpt-4o", 128_000, 16_384),
+    ("gpt-4.1", 1_047_576, 32_768),
+    ("gpt-4.5", 128_000, 16_384),
+    ("gpt-4-turbo", 128_000, 4096),
+    ("gpt-4-32k", 32_768, 4096),
+    ("gpt-4", 8192, 4096),
+    ("gpt-5", 400_000, 128_000),
+    ("gpt-3.5", 16_385, 4096),
+    ("o1-mini", 128_000, 65_536),
+    ("o1", 200_000, 100_000),
+    ("o3", 200_000, 100_000),
+    ("o4", 200_000, 100_000),
+    ("claude-3-7", 200_000, 64_000),
+    ("claude-3-5", 200_000, 8192),
+    ("claude-sonnet-4", 200_000, 64_000),
+    ("claude-opus-4", 200_000, 32_000),
+    ("claude", 200_000, 4096),
+    ("gemini-2.5", 1_048_576, 65_536),
+    ("gemini-1.5-pro", 2_097_152, 8192),
+    ("gemini", 1_048_576, 8192),
+    ("gemma3:1b", 32_768, 8192),
+    ("gemma3", 131_072, 8192),
+    ("gemma", 8192, 4096),
+    ("llama3.1", 131_072, 4096),
+    ("llama3.2", 131_072, 4096),
+    ("llama3.3", 131_072, 4096),
+    ("llama3-1", 131_072, 4096),
+    ("llama3-2", 131_072, 4096),
+    ("llama3-3", 131_072, 4096),
+    ("llama-3.1", 131_072, 8192),
+    ("llama-3.2", 131_072, 8192),
+    ("llama-3.3", 131_072, 32_768),
+    ("llama3", 8192, 4096),
+    ("llama-3", 8192, 4096),
+    ("qwen3", 40_960, 8192),
+    ("qwen", 32_768, 8192),
+    ("deepseek-r1", 131_072, 8192),
+    ("deepseek-coder-v2", 163_840, 8192),
+    ("deepseek", 65_536, 8192),
+    ("mistral-nemo", 131_072, 4096),
+    ("mixtral-8x7b-32768", 32_768, 4096),
+    ("mixtral", 32_768, 4096),
+    ("mistral", 32_768, 4096),
+    ("phi4", 16_384, 4096),
+    ("codellama", 16_384, 4096),
+]
+PROVIDER_CAPABILITIES = {
+    "openai": (DEFAULT_CONTEXT_LEN * 4, DEFAULT_MAX_OUTPUT),
+    "ollama": (DEFAULT_CONTEXT_LEN, DEFAULT_MAX_OUTPUT),
+    "groq": (DEFAULT_CONTEXT_LEN, DEFAULT_MAX_OUTPUT),
+    "anthropic": (DEFAULT_CONTEXT_LEN * 4, DEFAULT_MAX_OUTPUT),
+    "google": (DEFAULT_CONTEXT_LEN * 4, DEFAULT_MAX_OUTPUT),
+    "aws": (DEFAULT_CONTEXT_LEN * 4, DEFAULT_MAX_OUTPUT),
+}
+
+
+def resolve_capabilities(provider: str, model: str) -> ModelCapabilities:
+    """The capabilities of a known model name, or the provider defaults"""
+    name = normalize_model_name(model).removeprefix("anthropic.")
+    for prefix, context, max_output in MODEL_CAPABILITIES:
+        if name.startswith(prefix):
+            return ModelCapabilities(context=context, max_output=max_output)
+    context, max_output = PROVIDER_CAPABILITIES.get(
+        provider, (DEFAULT_CONTEXT_LEN, DEFAULT_MAX_OUTPUT)
+    )
+    return ModelCapabilities(context=context, max_output=max_output)
+
+
+def get_model_capabilities(llm_config=None) -> ModelCapabilities:
+    llm = llm_config or settings.llm
+    context_window = getattr(llm, "context_window", None)
+    if llm.provider == "ollama":
+        context_window = context_window or settings.ollama.num_ctx
+    return _get_model_capabilities(
+        llm.provider,
+        llm.name,
+        context_window,
+        getattr(llm, "max_output_tokens", None),
+    )
+
+
+@lru_cache
+def _get_model_capabilities(provider, model, context_window, max_output_tokens):
+    capabilities = None
+    if provider == "ollama" and not (context_window and max_output_tokens):
+        capabilities = discover_ollama(model)
+    capabilities = capabilities or resolve_capabilities(provider, model)
+    context = context_window or capabilities.context
+    if provider == "ollama" and not context_window:
+        context = min(context, OLLAMA_DEFAULT_NUM_CTX)
+    return ModelCapabilities(
+        context=context,
+        max_output=max_output_tokens or capabilities.max_output,
+    )
+
+
+def discover_ollama(model: str) -> ModelCapabilities | None:
+    """
+    Asks the local Ollama server the context length of the model, the result
+    is cached on disk by model digest so `/api/show` is called once per model
+    """
+    import httpx
+
+    host = ollama_host()
+    try:
+        response = httpx.get(f"{host}/api/tags", timeout=2)
+        response.raise_for_status()
+        names = {model, f"{model}:latest"}
+        digest = next(
+            m["digest"]
+            for m in response.json()["models"]
+            if m.get("name") in names or m.get("model") in names
+        )
+    except (httpx.HTTPError, ValueError, KeyError, StopIteration):
+        return None
+
+    cache = _load_models_cache()
+    if digest in cache:
+        try:
+            return ModelCapabilities.model_validate(cache[digest])
+        except ValueError:
+            pass
+    try:
+        response = httpx.post(f"{host}/api/show", json={"model": model}, timeout=5)
+        response.raise_for_status()
+        capabilities = _parse_ollama_show(response.json())
+    except (httpx.HTTPError, ValueError):
+        return None
+    if capabilities:
+        cache[digest] = capabilities.model_dump()
+        _save_models_cache(cache)
+    return capabilities
+
+
+def ollama_host():
+    host = os.environ.get("OLLAMA_HOST") or OLLAMA_HOST
+    if "://" not in host:
+        host = f"http://{host}"
+    return host.rstrip("/")
+
+
+def _parse_ollama_show(show: dict) -> ModelCapabilities | None:
+    parameters = show.get("parameters") or ""
+    # the num_ctx of the Modelfile overrides the length the model was trained on
+    num_ctx = re.search(r"^num_ctx\s+(\d+)", parameters, re.MULTILINE)
+    context = int(num_ctx.group(1)) if num_ctx else None
+    if not context:
+        context = next(
+            (
+                v
+                for k, v in (show.get("model_info") or {}).items()
+                if k.endswith(".context_length")
+            ),
+            None,
+        )
+    if not context:
+        return None
+    num_predict = re.search(r"^num_predict\s+(\d+)", parameters, re.MULTILINE)
+    max_output = int(num_predict.group(1)) if num_predict else DEFAULT_MAX_OUTPUT
+    return ModelCapabilities(context=context, max_output=min(max_output, context // 2))
+
+
+def _load_models_cache() -> dict:
+    try:
+        with open(MODELS_CACHE_FILE) as f:
+            return json.load(f)
+    except Exception:
+        return {}
+
+
+def _save_models_cache(cache: dict):
+    try:
+        os.makedirs(MODELS_CACHE_FILE.parent, exist_ok=True)
+        tmp_file = MODELS_CACHE_FILE.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp_file, "w") as f:
+            json.dump(cache, f)
+        os.replace(tmp_file, MODELS_CACHE_FILE)
+    except OSError:
+        pass
@@ -1,9 +1,10 @@
 import re
 from langchain_core.runnables import chain
-from langchain_core.output_parsers import StrOutputParser
 from langchain.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain_core.messages import AIMessage
 from shy_sh.agents.llms import get_llm
+from shy_sh.agents.response_cache import cached_chain
+from shy_sh.agents.speculation import SpeculativeStream
 from shy_sh.settings import settings
 from shy_sh.utils import detect_shell
 from textwrap import dedent
@@ -131,19 +132,28 @@ def alternative_commands_chain(inputs):
             ("human", msg_template),
         ]
     )
-    return prompt | llm | StrOutputParser()
+    return cached_chain("alternative_commands", prompt, llm)
 
 
-def get_alternative_commands(inputs):
+def _chain_inputs(inputs):
+    return {
+        **inputs,
+        "lang_spec": f" in {settings.language} language" if settings.language else "",
+    }
+
+
+def prefetch_alternative_commands(inputs):
+    return SpeculativeStream(
+        "alternatives", alternative_commands_chain, _chain_inputs(inputs)
+    )
+
+
+def get_alternative_commands(inputs, prefetched=None):
     with Live() as live:
         live.update("⏱️ Finding an alternative solutions...")
-        response = alternative_commands_chain.invoke(
-            {
-                **inputs,
-                "lang_spec": (
-                    f" in {settings.language} language" if settings.language else ""
-                ),
-            }
-        )
+        if prefetched:
+            response = "".join(prefetched)
+        else:
+            response = alternative_commands_chain.invoke(_chain_inputs(inputs))
         live.update("")
     return re.findall(r"([^\n]+)\n```[^\n]*\n([^\n]+)\n```", response)
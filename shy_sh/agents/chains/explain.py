@@ -1,13 +1,14 @@
 import pyperclip
 from langchain_core.runnables import chain
-from langchain_core.output_parsers import StrOutputParser
 from langchain.prompts import ChatPromptTemplate
 from shy_sh.agents.llms import get_llm
-from shy_sh.utils import ask_confirm, syntax
+from shy_sh.agents.response_cache import cached_chain
+from shy_sh.agents.speculation import SpeculativeStream
+from shy_sh.utils import ask_confirm
+from shy_sh.render import StreamRenderer
 from shy_sh.models import ToolMeta
 from shy_sh.settings import settings
 from textwrap import dedent
-from rich.live import Live
 from rich import print
 
 
@@ -36,22 +37,25 @@ def explain_chain(_):
             ("human", msg_template),
         ]
     )
-    return prompt | llm | StrOutputParser()
+    return cached_chain("explain", prompt, llm)
 
 
-def explain(inputs, ask_execute=True, ask_alternative=False):
-    with Live(vertical_overflow="visible") as live:
-        text = "🤖: "
-        for chunk in explain_chain.stream(
-            {
-                **inputs,
-                "lang_spec": (
-                    f" in {settings.language} language" if settings.language else ""
-                ),
-            }
-        ):
-            text += chunk
-            live.update(syntax(text))
+def _chain_inputs(inputs):
+    return {
+        **inputs,
+        "lang_spec": f" in {settings.language} language" if settings.language else "",
+    }
+
+
+def prefetch_explain(inputs):
+    return SpeculativeStream("explain", explain_chain, _chain_inputs(inputs))
+
+
+def explain(inputs, ask_execute=True, ask_alternative=False, prefetched=None):
+    chunks = prefetched or explain_chain.stream(_chain_inputs(inputs))
+    with StreamRenderer(prefix="🤖: ") as renderer:
+        for chunk in chunks:
+            renderer.write(chunk)
     print()
 
     if not ask_execute:
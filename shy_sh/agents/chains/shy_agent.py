@@ -1,8 +1,10 @@
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+from langchain_core.messages import BaseMessage, HumanMessage
 from langchain_core.runnables import chain
-from shy_sh.agents.llms import get_llm
+from shy_sh.agents.llms import get_llm, get_fallback_llms
 from shy_sh.settings import settings
 from shy_sh.agents.tools import tools
+from shy_sh.agents.misc import split_probe_outputs
 from textwrap import dedent
 
 SYS_TEMPLATES = {
@@ -33,12 +35,27 @@ SYS_TEMPLATES = {
     ),
 }
 
+TIMESTAMP_SENTENCE = " The current date and time is {timestamp}."
+CONTEXT_TEMPLATE = "Context: the current date and time is {timestamp}."
+PROBES_TEMPLATE = "Output of the commands run at startup:\n{probes}"
+CACHE_CONTROL = {"type": "ephemeral"}
+
+# the react models tend to go on inventing the response of the tool they requested
+REACT_STOP_SEQUENCES = ["\nTool response:"]
+# reasoning models reject the stop parameter
+NO_STOP_MODELS = ("o1", "o3", "o4", "gpt-5")
+
+
+def _supports_stop(llm_config=None):
+    llm = llm_config or settings.llm
+    return not (llm.provider == "openai" and llm.name.startswith(NO_STOP_MODELS))
+
 
 @chain
 def shy_agent_chain(_):
-    llm = get_llm()
-    if settings.llm.agent_pattern == "function_call":
-        llm = llm.bind_tools(tools)
+    llm = _agent_llm()
+    if settings.prompt_cache:
+        return _cache_friendly_prompt | llm
     template = SYS_TEMPLATES[settings.llm.agent_pattern]
     prompt = ChatPromptTemplate.from_messages(
         [
@@ -49,3 +66,116 @@ def shy_agent_chain(_):
         ]
     )
     return prompt | llm
+
+
+@chain
+def _cache_friendly_prompt(inputs) -> list[BaseMessage]:
+    """
+    Keeps the prompt prefix byte-stable for the provider-side prompt caching:
+    the system prompt, the tools and the examples (with a fixed output for
+    the probes) don't change between the calls, the timestamp and the live
+    output of the probes are sent with the last question.
+    """
+    template = SYS_TEMPLATES[settings.llm.agent_pattern]
+    prompt = ChatPromptTemplate.from_messages(
+        [
+            ("system", template.replace(TIMESTAMP_SENTENCE, "")),
+            MessagesPlaceholder("few_shot_examples", optional=True),
+            MessagesPlaceholder("history"),
+            MessagesPlaceholder("question"),
+            MessagesPlaceholder("tool_history", optional=True),
+        ]
+    )
+    examples, probes = split_probe_outputs(inputs.get("few_shot_examples") or [])
+    context = CONTEXT_TEMPLATE.format(timestamp=inputs["timestamp"])
+    if probes:
+        context += "\n" + PROBES_TEMPLATE.format(probes=probes)
+    history = inputs["history"]
+    messages = prompt.invoke(
+        {
+            **inputs,
+            "few_shot_examples": examples,
+            "history": history[:-1],
+            "question": _with_context(history[-1:], context),
+        }
+    ).to_messages()
+    if _has_cache_breakpoints():
+        examples = len(inputs.get("few_shot_examples") or [])
+        messages = _with_cache_breakpoints(messages, {0, examples, len(messages) - 1})
+    return messages
+
+
+def _agent_llm():
+    llm = _bind_llm(get_llm(), settings.llm)
+    if not settings.llm.fallbacks and settings.failover.hedge_after is None:
+        return llm
+    from shy_sh.agents.failover import FailoverLLM
+
+    entries = [(f"{settings.llm.provider}:{settings.llm.name}", llm)]
+    for llm_config, fallback in zip(settings.llm.fallbacks, get_fallback_llms()):
+        # the fallbacks follow the agent pattern of the session, so the
+        # history keeps the same format whichever model answered
+        fallback = _bind_llm(fallback, llm_config)
+        if _has_cache_breakpoints() and llm_config.provider != "anthropic":
+            fallback = _without_cache_control | fallback
+        entries.append((f"{llm_config.provider}:{llm_config.name}", fallback))
+    return FailoverLLM(entries)
+
+
+def _bind_llm(llm, llm_config):
+    if settings.llm.agent_pattern == "function_call":
+        return llm.bind_tools(tools)
+    if _supports_stop(llm_config):
+        return llm.bind(stop=REACT_STOP_SEQUENCES)
+    return llm
+
+
+@chain
+def _without_cache_control(messages):
+    """The Anthropic cache breakpoints are rejected by the other providers"""
+    return [_strip_cache_control(m) for m in messages]
+
+
+def _strip_cache_control(message):
+    content = message.content
+    if isinstance(content, str) or not any(
+        isinstance(c, dict) and "cache_control" in c for c in content
+    ):
+        return message
+    content = [
+        {k: v for k, v in c.items() if k != "cache_control"}
+        if isinstance(c, dict)
+        else c
+        for c in content
+    ]
+    return message.model_copy(update={"content": content})
+
+
+def _with_context(question: list, context: str) -> list:
+    # a single user message, some providers reject two consecutive ones
+    if question and isinstance(question[0], HumanMessage):
+        if isinstance(question[0].content, str):
+            content = f"{context}\n\n{question[0].content}"
+            return [question[0].model_copy(update={"content": content})]
+    return [HumanMessage(content=context), *question]
+
+
+def _has_cache_breakpoints():
+    return settings.prompt_cache and settings.llm.provider == "anthropic"
+
+
+def _with_cache_breakpoints(messages: list, indexes: set[int]) -> list:
+    """Marks the messages where Anthropic caches the prefix (max 4)"""
+    return [
+        _with_cache_control(m) if i in indexes else m for i, m in enumerate(messages)
+    ]
+
+
+def _with_cache_control(message):
+    content = message.content
+    if isinstance(content, str):
+        content = [{"type": "text", "text": content}] if content else []
+    if not content or not isinstance(content[-1], dict):
+        return message
+    content = [*content[:-1], {**content[-1], "cache_control": CACHE_CONTROL}]
+    return message.model_copy(update={"content": content})
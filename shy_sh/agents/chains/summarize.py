@@ -0,0 +1,39 @@
+from langchain_core.runnables import chain
+from langchain_core.output_parsers import StrOutputParser
+from langchain.prompts import ChatPromptTemplate
+from shy_sh.agents.llms import get_llm
+from textwrap import dedent
+
+
+sys_template = dedent(
+    """
+    You keep the running summary of a conversation between a user and a shell assistant that uses tools.
+    Update the current summary with the new messages and output only the updated summary.
+
+    Keep every fact that can be useful later: the user requests, paths, file names, commands and their relevant results, errors, decisions and answers.
+    Drop the greetings, the repetitions and the outputs that were not useful.
+    Write at most {max_words} words.
+    """
+)
+
+msg_template = dedent(
+    """
+    Current summary:
+    {summary}
+
+    New messages:
+    {messages}
+    """
+)
+
+
+@chain
+def summarize_chain(_):
+    llm = get_llm()
+    prompt = ChatPromptTemplate.from_messages(
+        [
+            ("system", sys_template),
+            ("human", msg_template),
+        ]
+    )
+    return prompt | llm | StrOutputParser()
@@ -0,0 +1,239 @@
+from time import monotonic, sleep
+from threading import Lock, Thread
+from functools import lru_cache
+from urllib.parse import urlsplit
+import httpx
+from shy_sh.settings import settings
+from shy_sh.stats import stats
+from shy_sh.agents.transport import connection_pools, DEFAULT_TIMEOUT
+
+HEALTH_CHECK_TIMEOUT = 5
+
+
+class Endpoint:
+    def __init__(self, url: str):
+        self.url = url.rstrip("/")
+        self.name = urlsplit(self.url).netloc
+        self.outstanding = 0
+        self.failures = 0
+        self.ejected = False
+
+    def stat(self, name: str, value: float = 1):
+        stats.add(f"llm.endpoints.{self.name}.{name}", value)
+
+
+class EndpointBalancer:
+    """
+    Spreads the requests between OpenAI compatible endpoints serving the same
+    model (e.g. a pool of llama.cpp or vLLM replicas).
+
+    Each request goes to the endpoint with the fewest requests in flight, or
+    to the next one with the round-robin strategy. After `eject_after`
+    consecutive failures (connection errors or 5xx) an endpoint is ejected
+    and a background health check (`GET /models`) brings it back when it
+    answers again. If every endpoint is ejected they are all tried anyway.
+    """
+
+    def __init__(self, urls: list[str]):
+        self.endpoints = [Endpoint(url) for url in urls]
+        self._lock = Lock()
+        self._next = 0
+
+    def acquire(self, exclude=()) -> Endpoint:
+        with self._lock:
+            n = len(self.endpoints)
+            candidates = [
+                self.endpoints[(self._next + i) % n]
+                for i in range(n)
+                if self.endpoints[(self._next + i) % n] not in exclude
+            ]
+            healthy = [e for e in candidates if not e.ejected]
+            candidates = healthy or candidates or self.endpoints
+            self._next = (self._next + 1) % n
+            if settings.endpoints.balancing == "least_outstanding":
+                # the first of the rotation wins the ties
+                endpoint = min(candidates, key=lambda e: e.outstanding)
+            else:
+                endpoint = candidates[0]
+            endpoint.outstanding += 1
+            return endpoint
+
+    def release(self, endpoint: Endpoint):
+        with self._lock:
+            endpoint.outstanding -= 1
+
+    def record(self, endpoint: Endpoint, ok: bool, seconds: float | None = None):
+        endpoint.stat("requests")
+        if seconds is not None:
+            endpoint.stat("seconds", seconds)
+        with self._lock:
+            if ok:
+                endpoint.failures = 0
+                return
+            endpoint.failures += 1
+            eject = (
+                not endpoint.ejected
+                and endpoint.failures >= settings.endpoints.eject_after
+            )
+            if eject:
+                endpoint.ejected = True
+        endpoint.stat("errors")
+        if eject:
+            endpoint.stat("ejections")
+            Thread(target=self._health_check, args=(endpoint,), daemon=True).start()
+
+    def _health_check(self, endpoint: Endpoint):
+        client = connection_pools.client(endpoint.url, timeout=HEALTH_CHECK_TIMEOUT)
+        while True:
+            sleep(settings.endpoints.health_check_interval)
+            try:
+                if client.get(f"{endpoint.url}/models").status_code < 500:
+                    break
+            except httpx.HTTPError:
+                pass
+        with self._lock:
+            endpoint.ejected = False
+            endpoint.failures = 0
+        endpoint.stat("recoveries")
+
+    def route(self, request: httpx.Request, base_url: str, endpoint: Endpoint):
+        """Moves a request built for `base_url` to the endpoint"""
+        url = str(request.url)
+        if url.startswith(base_url):
+            request.url = httpx.URL(endpoint.url + url[len(base_url) :])
+            request.headers["Host"] = request.url.netloc.decode("ascii")
+
+
+class _BalancedStream(httpx.SyncByteStream, httpx.AsyncByteStream):
+    # the request is in flight until its (streamed) response is closed
+    def __init__(self, stream, done):
+        self._stream = stream
+        self._done = done
+
+    def __iter__(self):
+        yield from self._stream
+
+    async def __aiter__(self):
+        async for chunk in self._stream:
+            yield chunk
+
+    def _finish(self):
+        done, self._done = self._done, None
+        if done:
+            done()
+
+    def close(self):
+        try:
+            self._stream.close()
+        finally:
+            self._finish()
+
+    async def aclose(self):
+        try:
+            await self._stream.aclose()
+        finally:
+            self._finish()
+
+
+_CONNECT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout)
+
+
+class _Attempts:
+    """The endpoints tried by one request, a connection error moves it to the next one"""
+
+    def __init__(self, balancer: EndpointBalancer, request: httpx.Request):
+        self.balancer = balancer
+        self.request = request
+        self.url = balancer.endpoints[0].url
+        self.tried = []
+
+    def next(self) -> Endpoint:
+        endpoint = self.balancer.acquire(exclude=self.tried)
+        self.balancer.route(self.request, self.url, endpoint)
+        self.url = endpoint.url
+        self.started = monotonic()
+        return endpoint
+
+    def failed(self, endpoint: Endpoint, error: httpx.TransportError) -> bool:
+        self.balancer.release(endpoint)
+        self.balancer.record(endpoint, ok=False)
+        self.tried.append(endpoint)
+        # nothing was sent yet, another endpoint can take the request
+        return isinstance(error, _CONNECT_ERRORS) and len(self.tried) < len(
+            self.balancer.endpoints
+        )
+
+    def done(self, endpoint: Endpoint, response: httpx.Response) -> httpx.Response:
+        self.balancer.record(
+            endpoint, response.status_code < 500, monotonic() - self.started
+        )
+        response.stream = _BalancedStream(
+            response.stream, lambda: self.balancer.release(endpoint)
+        )
+        return response
+
+
+class BalancedTransport(httpx.BaseTransport):
+    def __init__(self, balancer: EndpointBalancer):
+        self.balancer = balancer
+
+    def handle_request(self, request):
+        attempts = _Attempts(self.balancer, request)
+        while True:
+            endpoint = attempts.next()
+            transport = connection_pools.transport(endpoint.url)
+            try:
+                response = transport.handle_request(request)
+            except httpx.TransportError as e:
+                if attempts.failed(endpoint, e):
+                    continue
+                raise
+            except BaseException:
+                self.balancer.release(endpoint)
+                raise
+            return attempts.done(endpoint, response)
+
+    def close(self):
+        pass
+
+
+class AsyncBalancedTransport(httpx.AsyncBaseTransport):
+    def __init__(self, balancer: EndpointBalancer):
+        self.balancer = balancer
+
+    async def handle_async_request(self, request):
+        attempts = _Attempts(self.balancer, request)
+        while True:
+            endpoint = attempts.next()
+            transport = connection_pools.async_transport(endpoint.url)
+            try:
+                response = await transport.handle_async_request(request)
+            except httpx.TransportError as e:
+                if attempts.failed(endpoint, e):
+                    continue
+                raise
+            except BaseException:
+                self.balancer.release(endpoint)
+                raise
+            return attempts.done(endpoint, response)
+
+    async def aclose(self):
+        pass
+
+
+@lru_cache
+def get_balancer(urls: tuple[str, ...]) -> EndpointBalancer:
+    return EndpointBalancer(list(urls))
+
+
+def balanced_clients(urls: list[str]) -> dict:
+    """The http clients of an OpenAI SDK spreading the requests between `urls`"""
+    balancer = get_balancer(tuple(urls))
+    return {
+        "http_client": httpx.Client(
+            transport=BalancedTransport(balancer), timeout=DEFAULT_TIMEOUT
+        ),
+        "http_async_client": httpx.AsyncClient(
+            transport=AsyncBalancedTransport(balancer), timeout=DEFAULT_TIMEOUT
+        ),
+    }
@@ -0,0 +1,145 @@
+import asyncio
+from time import monotonic
+from langchain_core.runnables import Runnable
+from shy_sh.settings import settings
+from shy_sh.stats import stats
+
+_CONNECTION_ERRORS = {
+    "APIConnectionError",
+    "APITimeoutError",
+    "TransportError",
+    "ConnectionError",
+    "TimeoutError",
+}
+
+
+def failover_reason(error: BaseException) -> str | None:
+    """Why the request can move to the next model, None if it would fail there too"""
+    status = getattr(error, "status_code", None)
+    if status == 429:
+        return "rate_limit"
+    if isinstance(status, int) and status >= 500:
+        return "server_error"
+    if _CONNECTION_ERRORS & {c.__name__ for c in type(error).__mro__}:
+        return "connection"
+    return None
+
+
+def _record_failover(reason: str):
+    stats.add("llm.failovers")
+    stats.add(f"llm.failovers.{reason}")
+
+
+class _Attempt:
+    def __init__(self, entry: tuple[str, Runnable], input, config, hedge=False):
+        self.entry = entry
+        self.hedge = hedge
+        self.stream = entry[1].astream(input, config)
+        self.first = asyncio.ensure_future(anext(self.stream))
+        self.started = monotonic()
+
+    async def close(self):
+        self.first.cancel()
+        # the generator can't be closed while the task is still inside it
+        await asyncio.wait([self.first])
+        try:
+            await self.stream.aclose()
+        except Exception:
+            pass
+
+
+class FailoverLLM(Runnable):
+    """
+    Streams the response of the first model of the chain that answers.
+
+    The request moves to the next model when the first token doesn't arrive
+    within `failover.first_token_timeout` seconds or the provider fails with
+    a rate limit, a server or a connection error before the first token.
+    With `failover.hedge_after` a duplicate request (to the next model, or
+    to the same one without fallbacks) races the slow one and the first to
+    answer wins, the other stream is closed.
+    """
+
+    def __init__(self, entries: list[tuple[str, Runnable]]):
+        self.entries = entries
+
+    def invoke(self, input, config=None, **kwargs):
+        for i, (_, runnable) in enumerate(self.entries):
+            try:
+                return runnable.invoke(input, config, **kwargs)
+            except Exception as e:
+                reason = failover_reason(e)
+                if reason is None or i == len(self.entries) - 1:
+                    raise
+                _record_failover(reason)
+
+    async def astream(self, input, config=None, **kwargs):
+        timeout = settings.failover.first_token_timeout
+        hedge_after = settings.failover.hedge_after
+        queue = list(self.entries)
+        attempts = [_Attempt(queue.pop(0), input, config)]
+        hedged = hedge_after is None
+        winner = None
+        try:
+            while winner is None:
+                winner = await self._race(attempts, queue, input, config, hedged)
+                if winner is not None:
+                    break
+                now = monotonic()
+                if not hedged and now >= attempts[0].started + hedge_after:
+                    hedged = True
+                    entry = queue.pop(0) if queue else attempts[0].entry
+                    attempts.append(_Attempt(entry, input, config, hedge=True))
+                    stats.add("llm.hedges")
+                for attempt in list(attempts):
+                    if not (queue and timeout) or now < attempt.started + timeout:
+                        continue
+                    attempts.remove(attempt)
+                    await attempt.close()
+                    _record_failover("deadline")
+                    if not attempts:
+                        attempts.append(_Attempt(queue.pop(0), input, config))
+
+            if winner.hedge:
+                stats.add("llm.hedge_wins")
+            while attempts:
+                await attempts.pop().close()
+            if isinstance(winner.first.exception(), StopAsyncIteration):
+                return
+            yield winner.first.result()
+            async for chunk in winner.stream:
+                yield chunk
+        finally:
+            for attempt in [*attempts, *([winner] if winner else [])]:
+                await attempt.close()
+
+    async def _race(self, attempts, queue, input, config, hedged):
+        """Waits the first token of an attempt until the next deadline or hedge"""
+        timeout = settings.failover.first_token_timeout
+        deadlines = []
+        if queue and timeout:
+            deadlines += [a.started + timeout for a in attempts]
+        if not hedged:
+            deadlines.append(attempts[0].started + settings.failover.hedge_after)
+        wait = max(min(deadlines) - monotonic(), 0) if deadlines else None
+        done, _ = await asyncio.wait(
+            [a.first for a in attempts],
+            timeout=wait,
+            return_when=asyncio.FIRST_COMPLETED,
+        )
+        for attempt in [a for a in attempts if a.first in done]:
+            attempts.remove(attempt)
+            error = attempt.first.exception()
+            if error is None or isinstance(error, StopAsyncIteration):
+                return attempt
+            await attempt.close()
+            reason = failover_reason(error)
+            if attempts:
+                # another request is still racing
+                _record_failover(reason or "error")
+                continue
+            if reason is None or not queue:
+                raise error
+            _record_failover(reason)
+            attempts.append(_Attempt(queue.pop(0), input, config))
+        return None
@@ -1,5 +1,10 @@
-from shy_sh.settings import settings, BaseLLMSchema
+from threading import Thread
 from functools import lru_cache
+from shy_sh.settings import settings, BaseLLMSchema
+from shy_sh.agents.capabilities import get_model_capabilities, ollama_host
+
+OPENAI_BASE_URL = "https://llm.prtl.cc"
+GROQ_BASE_URL = "https://api.groq.com"
 
 
 @lru_cache
@@ -7,22 +12,35 @@ def get_llm():
     return _get_llm(settings.llm)
 
 
+@lru_cache
+def get_fallback_llms():
+    return [_get_llm(llm_config) for llm_config in settings.llm.fallbacks]
+
+
 def _get_llm(llm_config: BaseLLMSchema):
     llm = None
     match llm_config.provider:
         case "openai":
             from langchain_openai import ChatOpenAI
 
+            base_urls = get_base_urls(llm_config)
             llm = ChatOpenAI(
                 model=llm_config.name,
                 temperature=llm_config.temperature,
                 api_key=llm_config.api_key,
-                base_url="https://llm.prtl.cc",
+                base_url=base_urls[0],
+                stream_usage=True,
+                **_http_clients(*base_urls),
             )
         case "ollama":
             from langchain_ollama import ChatOllama
 
-            llm = ChatOllama(model=llm_config.name, temperature=llm_config.temperature)
+            llm = ChatOllama(
+                model=llm_config.name,
+                temperature=llm_config.temperature,
+                **_ollama_options(llm_config),
+            )
+            _use_shared_pools(llm)
 
         case "groq":
             from langchain_groq import ChatGroq
@@ -31,6 +49,7 @@ def _get_llm(llm_config: BaseLLMSchema):
                 model=llm_config.name,
                 temperature=llm_config.temperature,
                 api_key=llm_config.api_key,
+                **_http_clients(GROQ_BASE_URL),
             )
 
         case "anthropic":
@@ -73,34 +92,116 @@ def _get_llm(llm_config: BaseLLMSchema):
     return llm
 
 
-DEFAULT_CONTEXT_LEN = 8192
-LLM_CONTEXT_WINDOWS = {
-    "openai": {
-        "default": DEFAULT_CONTEXT_LEN * 4,
-    },
-    "ollama": {
-        "default": DEFAULT_CONTEXT_LEN,
-    },
-    "groq": {
-        "default": DEFAULT_CONTEXT_LEN,
-    },
-    "anthropic": {
-        "default": DEFAULT_CONTEXT_LEN * 4,
-    },
-    "google": {
-        "default": DEFAULT_CONTEXT_LEN * 4,
-    },
-    "aws": {
-        "default": DEFAULT_CONTEXT_LEN * 4,
-    },
-}
+def get_base_urls(llm_config: BaseLLMSchema) -> list[str]:
+    base_url = llm_config.base_url or OPENAI_BASE_URL
+    return [base_url] if isinstance(base_url, str) else base_url
 
 
-def get_llm_context():
-    provider = LLM_CONTEXT_WINDOWS.get(settings.llm.provider, None)
-    if not provider:
-        return DEFAULT_CONTEXT_LEN
-    return provider.get(
-        settings.llm.name,
-        provider.get("default", DEFAULT_CONTEXT_LEN),
+def get_llm_endpoints(llm_config: BaseLLMSchema | None = None) -> list[str]:
+    """The endpoints of the provider if its client uses the shared connection pools"""
+    llm_config = llm_config or settings.llm
+    match llm_config.provider:
+        case "openai":
+            return get_base_urls(llm_config)
+        case "groq":
+            return [GROQ_BASE_URL]
+        case "ollama":
+            return [ollama_host()]
+    return []
+
+
+def _http_clients(base_url: str, *replicas: str) -> dict:
+    from shy_sh.agents.transport import connection_pools
+
+    if replicas:
+        from shy_sh.agents.endpoints import balanced_clients
+
+        return balanced_clients([base_url, *replicas])
+    return {
+        "http_client": connection_pools.client(base_url),
+        "http_async_client": connection_pools.async_client(base_url),
+    }
+
+
+def _use_shared_pools(llm):
+    # ChatOllama passes the same `client_kwargs` to its sync and async client,
+    # they can't share a transport so the clients are replaced
+    from ollama import Client, AsyncClient
+    from shy_sh.agents.transport import connection_pools
+
+    host = llm.base_url or ollama_host()
+    kwargs = llm.client_kwargs or {}
+    llm._client = Client(host, transport=connection_pools.transport(host), **kwargs)
+    llm._async_client = AsyncClient(
+        host, transport=connection_pools.async_transport(host), **kwargs
     )
+
+
+def warm_up_connections():
+    """Connects to the provider in background so the first request doesn't wait for the handshakes"""
+    from shy_sh.agents.transport import connection_pools
+
+    if not settings.http.warm_up:
+        return
+    for llm_config in [settings.llm, *settings.llm.fallbacks]:
+        for endpoint in get_llm_endpoints(llm_config):
+            connection_pools.warm_up(endpoint)
+
+
+def get_llm_context():
+    return get_model_capabilities().context
+
+
+def get_llm_max_output():
+    return get_model_capabilities().max_output
+
+
+def get_output_reserve():
+    """Tokens of the context window kept free for the model response"""
+    return min(get_llm_max_output(), get_llm_context() // 4)
+
+
+def _ollama_options(llm_config: BaseLLMSchema) -> dict:
+    # the server must use the same context window as the budgets of shy,
+    # a different num_ctx would also reload the model
+    options = {
+        "num_ctx": get_model_capabilities(llm_config).context,
+        "keep_alive": settings.ollama.keep_alive,
+        "num_thread": settings.ollama.num_thread,
+        "num_gpu": settings.ollama.num_gpu,
+    }
+    return {k: v for k, v in options.items() if v is not None}
+
+
+_warm_up = {"started": False}
+
+
+def warm_up_model():
+    """Loads the local model in background so the first request doesn't wait for it"""
+    if settings.llm.provider != "ollama" or not settings.ollama.warm_up:
+        return
+    _warm_up["started"] = True
+    Thread(target=_preload_ollama, daemon=True).start()
+
+
+def is_warmed_up() -> bool:
+    return _warm_up["started"]
+
+
+def _preload_ollama():
+    import httpx
+    from shy_sh.agents.transport import connection_pools
+
+    host = ollama_host()
+    options = _ollama_options(settings.llm)
+    keep_alive = options.pop("keep_alive", None)
+    # a chat request without messages only loads the model
+    request = {"model": settings.llm.name, "messages": [], "options": options}
+    if keep_alive is not None:
+        request["keep_alive"] = keep_alive
+    try:
+        connection_pools.client(host).post(
+            f"{host}/api/chat", json=request, timeout=120
+        )
+    except httpx.HTTPError:
+        pass
@@ -1,11 +1,15 @@
 import re
+import os
 import json
+from pathlib import Path
 from time import strftime
-from uuid import uuid4
+from concurrent.futures import ThreadPoolExecutor
 from langchain_core.messages import HumanMessage, AIMessage, ToolMessage
-from shy_sh.settings import settings
+from shy_sh.settings import settings, ProbeSchema, CACHE_DIR
 from shy_sh.utils import detect_shell, detect_os, run_shell
 from shy_sh.agents.tools import tools
+from shy_sh.agents.llms import get_llm, warm_up_connections
+from shy_sh.agents.streaming import ReactToolParser
 from shy_sh.models import ToolRequest
 
 
@@ -24,28 +28,46 @@ def get_graph_inputs(
     }
 
 
+REACT_TOOL_KEY = "react_tool"
+
+
 def parse_react_tool(message):
-    start_idx = message.content.index("{")
-    if start_idx < 0:
+    """
+    Returns the ReAct tool request of the message, the result is stored in its
+    `additional_kwargs` so the next stages don't parse the content again
+    """
+    if REACT_TOOL_KEY not in message.additional_kwargs:
+        tool = _parse_react_tool_content(message.content)
+        set_react_tool(message, tool)
+    tool = message.additional_kwargs[REACT_TOOL_KEY]
+    if tool is None:
         raise ValueError("No tool call found")
-    end_idx = start_idx + 1
-    open_brackets = 1
-    while open_brackets > 0 and end_idx < len(message.content):
-        if message.content[end_idx] == "{":
-            open_brackets += 1
-        elif message.content[end_idx] == "}":
-            open_brackets -= 1
-        end_idx += 1
-    maybe_tool = message.content[start_idx:end_idx]
+    return ToolRequest.model_validate(tool)
+
+
+def set_react_tool(message, tool: ToolRequest | None):
+    message.additional_kwargs[REACT_TOOL_KEY] = tool.model_dump() if tool else None
+
+
+def _parse_react_tool_content(content: str) -> ToolRequest | None:
+    tool = ReactToolParser().feed(content)
+    if tool is not None:
+        return tool
+    # the models sometimes write invalid JSON, like unescaped backslashes
+    start_idx = content.find("{")
+    if start_idx < 0:
+        return None
+    end_idx = content.rfind("}") + 1 or len(content)
+    maybe_tool = content[start_idx:end_idx]
     try:
         return ToolRequest.model_validate_json(maybe_tool)
-    except Exception:
-        try:
-            maybe_tool = message.content[start_idx : message.content.rindex("}") + 1]
-            return ToolRequest.model_validate_json(maybe_tool)
-        except Exception:
-            maybe_tool = re.sub(r"\\(?!\\)", r"\\\\", maybe_tool)
-            return ToolRequest.model_validate_json(maybe_tool)
+    except ValueError:
+        pass
+    try:
+        maybe_tool = re.sub(r"\\(?!\\)", r"\\\\", maybe_tool)
+        return ToolRequest.model_validate_json(maybe_tool)
+    except ValueError:
+        return None
 
 
 def has_tool_calls(message):
@@ -62,28 +84,19 @@ def has_tool_calls(message):
 
 def run_few_shot_examples():
     shell = detect_shell()
-    os = detect_os()
-    actions = [
-        {
-            "tool": "shell",
-            "arg": "echo %cd%" if shell in ["powershell", "cmd"] else "pwd",
-            "thoughts": "I'm checking the current working directory",
-        },
-        {
-            "tool": "shell",
-            "arg": "git rev-parse --abbrev-ref HEAD",
-            "thoughts": "I'm checking if it's a git repository",
-        },
-    ]
+    system = detect_os()
+    actions = get_probes()
+    responses = run_probes(actions)
     result = []
     result.append(
         HumanMessage(
-            content=f"You are on {os} system using {shell} as shell. Check your tools"
+            content=f"You are on {system} system using {shell} as shell. Check your tools"
         )
     )
-    for action in actions:
-        uid = str(uuid4())
-        ai_message, response = _run_example(action, uid)
+    for i, (action, response) in enumerate(zip(actions, responses)):
+        # a stable id keeps the examples identical for the prompt caching
+        uid = f"probe_{i}"
+        ai_message = _example_message(action, uid)
         result.append(ai_message)
         if settings.llm.agent_pattern == "react":
             result.append(HumanMessage(content=f"Tool response:\n{response}"))
@@ -93,7 +106,145 @@ def run_few_shot_examples():
     return result
 
 
-def _run_example(action, uid):
+PROBE_OUTPUT = "The output is in the context of the next question"
+
+
+def split_probe_outputs(examples: list) -> tuple[list, str]:
+    """
+    The examples with a fixed output for the probes, so they can stay in the
+    cached prompt prefix, and the live outputs to send with the question
+    """
+    static, outputs, command = [], [], None
+    for message in examples:
+        if isinstance(message, AIMessage):
+            command = _example_command(message)
+        elif command is not None and isinstance(message, ToolMessage):
+            outputs.append(f"$ {command}\n{message.content}")
+            message = message.model_copy(update={"content": PROBE_OUTPUT})
+            command = None
+        elif command is not None and isinstance(message, HumanMessage):
+            output = message.content.removeprefix("Tool response:\n")
+            outputs.append(f"$ {command}\n{output}")
+            content = f"Tool response:\n{PROBE_OUTPUT}"
+            message = message.model_copy(update={"content": content})
+            command = None
+        static.append(message)
+    return static, "\n".join(outputs)
+
+
+def _example_command(message) -> str | None:
+    if message.tool_calls:
+        return message.tool_calls[0]["args"].get("arg")
+    try:
+        return parse_react_tool(message).arg
+    except ValueError:
+        return None
+
+
+def get_probes():
+    probes = settings.bootstrap.probes
+    if probes is None:
+        shell = detect_shell()
+        probes = [
+            ProbeSchema(
+                arg="echo %cd%" if shell in ["powershell", "cmd"] else "pwd",
+                thoughts="I'm checking the current working directory",
+            ),
+            ProbeSchema(
+                arg="git rev-parse --abbrev-ref HEAD",
+                thoughts="I'm checking if it's a git repository",
+            ),
+        ]
+    return [
+        {"tool": "shell", "arg": p.arg, "thoughts": p.thoughts, "cache": p.cache}
+        for p in [*probes, *settings.bootstrap.extra_probes]
+    ]
+
+
+def run_probes(actions):
+    """
+    Run the bootstrap probes concurrently while the LLM client is built,
+    the outputs are cached per working directory
+    """
+    cache = _load_probes_cache() if settings.bootstrap.cache else {}
+    cwd = os.getcwd()
+    fingerprint = _probes_fingerprint(cwd)
+    cached = cache.get(cwd, {})
+    if cached.get("fingerprint") != fingerprint:
+        cached = {"fingerprint": fingerprint, "outputs": {}}
+
+    with ThreadPoolExecutor(max_workers=len(actions) + 1) as executor:
+        executor.submit(_warm_up_llm)
+        futures = [
+            (
+                None
+                if action["cache"] and action["arg"] in cached["outputs"]
+                else executor.submit(run_shell, action["arg"])
+            )
+            for action in actions
+        ]
+        responses = []
+        for action, future in zip(actions, futures):
+            if future is None:
+                responses.append(cached["outputs"][action["arg"]])
+                continue
+            response = future.result()
+            if action["cache"]:
+                cached["outputs"][action["arg"]] = response
+            responses.append(response)
+
+    if settings.bootstrap.cache:
+        cache.pop(cwd, None)
+        cache[cwd] = cached
+        _save_probes_cache(cache)
+    return responses
+
+
+def _warm_up_llm():
+    try:
+        get_llm()
+    except Exception:
+        return
+    warm_up_connections()
+
+
+PROBES_CACHE_FILE = CACHE_DIR / "probes.json"
+PROBES_CACHE_MAX_ENTRIES = 200
+
+
+def _probes_fingerprint(cwd):
+    fingerprint = [detect_shell(), os.stat(cwd).st_mtime_ns]
+    path = Path(cwd)
+    for folder in [path, *path.parents]:
+        git = folder / ".git"
+        if git.exists():
+            head = git / "HEAD" if git.is_dir() else git
+            fingerprint.append(head.stat().st_mtime_ns)
+            break
+    return fingerprint
+
+
+def _load_probes_cache():
+    try:
+        with open(PROBES_CACHE_FILE) as f:
+            return json.load(f)
+    except Exception:
+        return {}
+
+
+def _save_probes_cache(cache):
+    try:
+        os.makedirs(PROBES_CACHE_FILE.parent, exist_ok=True)
+        cache = dict(list(cache.items())[-PROBES_CACHE_MAX_ENTRIES:])
+        tmp_file = PROBES_CACHE_FILE.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp_file, "w") as f:
+            json.dump(cache, f)
+        os.replace(tmp_file, PROBES_CACHE_FILE)
+    except OSError:
+        pass
+
+
+def _example_message(action, uid):
     ai_message = AIMessage(
         content="",
         tool_calls=[
@@ -106,9 +257,11 @@ def _run_example(action, uid):
         ],
     )
     if settings.llm.agent_pattern == "react":
-        ai_message.content = json.dumps(action)
+        ai_message.content = json.dumps(
+            {k: action[k] for k in ("tool", "arg", "thoughts")}
+        )
         ai_message.tool_calls = []
-    return ai_message, run_shell(action["arg"])
+    return ai_message
 
 
 def _format_tools():
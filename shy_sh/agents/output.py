@@ -0,0 +1,173 @@
+import re
+from rich import print
+from shy_sh.settings import settings
+from shy_sh.utils import live_output
+from shy_sh.agents.llms import get_llm_context, get_output_reserve
+from shy_sh.agents.tokens import get_tokenizer, token_ledger
+
+MIN_BUDGET = 500
+# occurrences of the same kind of line kept before the others are dropped
+MAX_REPEATS = 3
+# tokens reserved for the notes added to the reduced output
+NOTES_RESERVE = 50
+
+ERROR_RE = re.compile(
+    r"error|fail|fatal|exception|traceback|panic|abort|denied|"
+    r"not found|no such|cannot|can't|unable|invalid|segmentation fault",
+    re.IGNORECASE,
+)
+_QUOTED_RE = re.compile(r"'[^'\n]*'|\"[^\"\n]*\"|`[^`\n]*`")
+_NO_DIGITS = str.maketrans("", "", "0123456789")
+
+
+def tool_output_budget(state) -> int:
+    """Tokens available for a tool result given what the conversation already uses"""
+    context = get_llm_context()
+    used = token_ledger.total(
+        state["history"] + state["tool_history"], get_output_reserve()
+    )
+    budget = min((context - used) // 2, context // 4)
+    if settings.output.max_tokens:
+        budget = min(budget, settings.output.max_tokens)
+    return max(budget, MIN_BUDGET)
+
+
+def fit_tool_output(result: str, budget: int, capture=None) -> str:
+    reduced = reduce_output(result, budget)
+    if reduced is not result and live_output.get():
+        print("\n🐳 [bold red]Output too long! It will be reduced[/bold red]")
+    if capture and capture.entry and (reduced is not result or capture.dropped_bytes):
+        entry = capture.entry
+        reduced += (
+            f"\n[The full output is stored as {entry.id} ({entry.line_count} lines),"
+            " use the read_output tool to read the missing parts]"
+        )
+    return reduced
+
+
+def fits_budget(text: str, budget: int) -> bool:
+    if len(text) <= budget:
+        return True
+    # even the densest text has less than a token every 8 chars
+    if len(text) > budget * 8:
+        return False
+    return get_tokenizer().count(text) <= budget
+
+
+def reduce_output(text: str, budget: int) -> str:
+    """
+    Fits a command output in `budget` tokens.
+
+    Repeated and near-duplicate lines (same text apart from numbers and
+    quoted names) are collapsed into counts, then the lines that look
+    like errors are kept first and the rest of the budget is split between
+    the head and the tail of the output. The dropped parts are noted inline.
+    Returns the same object if the text already fits.
+    """
+    if fits_budget(text, budget):
+        return text
+
+    count = get_tokenizer().count
+    budget = max(budget - NOTES_RESERVE, 1)
+    max_line = max(budget, 200)
+    lines, collapsed = _collapse(text.splitlines(), max_line)
+    errors = [i for i, line in enumerate(lines) if ERROR_RE.search(line)]
+
+    chosen = set()
+    used = 0
+
+    def take(i):
+        nonlocal used
+        cost = count(lines[i]) + 1
+        if used + cost > budget:
+            return False
+        chosen.add(i)
+        used += cost
+        return True
+
+    for i in errors:
+        if used >= budget // 2 or not take(i):
+            break
+    head_limit = used + (budget - used) * 2 // 5
+    head = 0
+    while head < len(lines) and used < head_limit:
+        if head not in chosen and not take(head):
+            break
+        head += 1
+    tail = len(lines) - 1
+    while tail >= head:
+        if tail not in chosen and not take(tail):
+            break
+        tail -= 1
+
+    result = []
+    omitted = 0
+    gap = 0
+    for i, line in enumerate(lines):
+        if i not in chosen:
+            gap += 1
+            continue
+        if gap:
+            result.append(f"...({gap} lines omitted)...")
+            omitted += gap
+            gap = 0
+        result.append(line)
+    if gap:
+        result.append(f"...({gap} lines omitted)...")
+        omitted += gap
+
+    result.append(
+        f"\n[Output reduced to fit {budget} tokens: "
+        f"{collapsed} repeated lines collapsed, {omitted} lines omitted]"
+    )
+    return "\n".join(result)
+
+
+def _signatures(lines: list[str]) -> list[str]:
+    # runs once on the whole text, per line regexes are too slow on big outputs
+    text = _QUOTED_RE.sub("''", "\n".join(lines)).translate(_NO_DIGITS)
+    return [" ".join(line.split()) for line in text.split("\n")]
+
+
+def _shorten(line: str, max_len: int) -> str:
+    if len(line) <= max_len:
+        return line
+    half = max_len // 2
+    return f"{line[:half]}...({len(line) - 2 * half} chars)...{line[-half:]}"
+
+
+def _collapse(lines: list[str], max_line: int):
+    """
+    Collapses runs of similar lines and drops the lines of a kind already
+    seen MAX_REPEATS times, the dropped kinds are summarized at the end
+    """
+    signatures = _signatures(lines)
+    result = []
+    seen = {}
+    dropped = {}
+    collapsed = 0
+    i = 0
+    while i < len(lines):
+        sig = signatures[i]
+        run = i + 1
+        while run < len(lines) and signatures[run] == sig:
+            run += 1
+        size = run - i
+        seen[sig] = seen.get(sig, 0) + 1
+        if sig and seen[sig] > MAX_REPEATS:
+            if sig not in dropped:
+                dropped[sig] = [lines[i], 0]
+            dropped[sig][1] += size
+            collapsed += size
+        else:
+            result.append(_shorten(lines[i], max_line))
+            if size > 1:
+                result.append(f"...({size - 1} similar lines)...")
+                collapsed += size - 1
+        i = run
+
+    for example, n in sorted(dropped.values(), key=lambda d: -d[1]):
+        result.append(
+            f"...({n} more lines like: {_shorten(example, max_line // 4)})..."
+        )
+    return result, collapsed
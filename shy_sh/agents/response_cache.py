@@ -0,0 +1,117 @@
+import os
+import json
+import hashlib
+from time import time
+from langchain_core.runnables import RunnableGenerator
+from langchain_core.output_parsers import StrOutputParser
+from shy_sh.settings import settings, CACHE_DIR
+
+RESPONSES_CACHE_DIR = CACHE_DIR / "responses"
+
+
+class ResponseCache:
+    """
+    Content addressed cache of the LLM responses, one file per response.
+    The entries expire after `ttl` seconds and the least recently used ones
+    are evicted when the cache grows over `max_bytes`.
+    """
+
+    def __init__(self, directory=RESPONSES_CACHE_DIR):
+        self.directory = directory
+
+    def key(self, name: str, messages: list) -> str:
+        llm = settings.llm
+        data = {
+            "chain": name,
+            "provider": llm.provider,
+            "model": llm.name,
+            "temperature": llm.temperature,
+            "language": settings.language,
+            "messages": [[m.type, m.content] for m in messages],
+        }
+        return hashlib.sha256(
+            json.dumps(data, sort_keys=True, default=str).encode()
+        ).hexdigest()
+
+    def _path(self, key: str):
+        return self.directory / f"{key}.json"
+
+    def get(self, key: str) -> str | None:
+        path = self._path(key)
+        try:
+            with open(path) as f:
+                entry = json.load(f)
+            if time() - entry["created"] > settings.response_cache.ttl:
+                os.unlink(path)
+                return None
+            # the mtime tracks the last use for the LRU eviction
+            os.utime(path)
+            return entry["response"]
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def put(self, key: str, response: str):
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            path = self._path(key)
+            tmp_file = path.with_suffix(f".{os.getpid()}.tmp")
+            with open(tmp_file, "w") as f:
+                json.dump({"created": time(), "response": response}, f)
+            os.replace(tmp_file, path)
+            self.evict()
+        except OSError:
+            pass
+
+    def evict(self):
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".json"):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        size = sum(e[1] for e in entries)
+        for _, entry_size, path in sorted(entries):
+            if size <= settings.response_cache.max_bytes:
+                break
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+            size -= entry_size
+
+
+response_cache = ResponseCache()
+
+
+def is_cacheable() -> bool:
+    config = settings.response_cache
+    return config.enabled and (config.force or not settings.llm.temperature)
+
+
+def cached_chain(name: str, prompt, llm):
+    """
+    `prompt | llm | StrOutputParser()` with the responses cached on disk.
+    The key is computed on the prompt rendered without the timestamp, a hit
+    is streamed back as a single chunk.
+    """
+    chain = prompt | llm | StrOutputParser()
+
+    def stream(input_chunks):
+        inputs = next(input_chunks)
+        if not is_cacheable():
+            yield from chain.stream(inputs)
+            return
+
+        messages = prompt.invoke({**inputs, "timestamp": ""}).to_messages()
+        key = response_cache.key(name, messages)
+        response = response_cache.get(key)
+        if response is not None:
+            yield response
+            return
+
+        parts = []
+        for chunk in chain.stream(inputs):
+            parts.append(chunk)
+            yield chunk
+        response_cache.put(key, "".join(parts))
+
+    return RunnableGenerator(stream, name=name)
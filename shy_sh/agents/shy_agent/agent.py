@@ -1,8 +1,18 @@
+import sqlite3
 from rich import print
 from shy_sh.agents.shy_agent.graph import shy_agent_graph
-from shy_sh.agents.misc import get_graph_inputs, run_few_shot_examples
+from shy_sh.agents.shy_agent.runtime import runtime
+from shy_sh.agents.misc import (
+    get_graph_inputs,
+    has_tool_calls,
+    run_few_shot_examples,
+)
+from shy_sh.agents.tokens import preload_tokenizer
+from shy_sh.agents.llms import get_llm_context, warm_up_model
+from shy_sh.sessions import session_store
+from shy_sh.settings import settings
 from shy_sh.utils import save_history
-from langchain_core.messages import HumanMessage
+from langchain_core.messages import AIMessage, HumanMessage
 
 
 class ShyAgent:
@@ -10,22 +20,74 @@ class ShyAgent:
         self,
         interactive=False,
         ask_before_execute=True,
+        session_id=None,
     ):
         self.interactive = interactive
         self.ask_before_execute = ask_before_execute
         self.history = []
+        self.session_id = session_id
+        if session_id is not None:
+            self._restore_session()
+        # the model loads while the probes run
+        warm_up_model()
+        if settings.llm.preload_tokenizer:
+            preload_tokenizer()
         self.examples = run_few_shot_examples()
 
+    def _restore_session(self):
+        max_tokens = settings.sessions.restore_tokens or get_llm_context() // 2
+        try:
+            self.history = session_store.load(self.session_id, max_tokens)
+        except sqlite3.Error as e:
+            print(f"🚨 [bold red]Can't load the session: {e}[/]")
+            return
+        print(
+            f"[bold italic dark_orange]Session {self.session_id} resumed "
+            f"({len(self.history)} messages)[/]"
+        )
+
+    def _save(self, messages: list, new_turn=False):
+        if not settings.sessions.enabled or not messages:
+            return
+        try:
+            if self.session_id is None:
+                session_store.compact(settings.sessions.max_bytes)
+                self.session_id = session_store.create(messages[0].content)
+            session_store.append(self.session_id, messages, new_turn=new_turn)
+        except sqlite3.Error:
+            pass
+
     def _run(self, task: str):
         self.history.append(HumanMessage(content=task))
+        self._save(self.history[-1:], new_turn=True)
         inputs = get_graph_inputs(
             history=self.history,
             examples=self.examples,
             ask_before_execute=self.ask_before_execute,
         )
 
-        res = shy_agent_graph.invoke(inputs)
-        self.history += res["tool_history"]
+        try:
+            runtime.run(self._arun(inputs))
+        except KeyboardInterrupt:
+            self._drop_pending_tool_calls()
+            print("\n🛑 [bold red]Interrupted[/bold red]")
+
+    async def _arun(self, inputs):
+        # the steps are saved as they complete, an interrupted run keeps them
+        async for update in shy_agent_graph.astream(inputs, stream_mode="updates"):
+            for values in update.values():
+                messages = (values or {}).get("tool_history", [])
+                self.history += messages
+                self._save(messages)
+
+    def _drop_pending_tool_calls(self):
+        if isinstance(self.history[-1], AIMessage) and has_tool_calls(self.history[-1]):
+            self.history.pop()
+            if settings.sessions.enabled and self.session_id is not None:
+                try:
+                    session_store.pop(self.session_id)
+                except sqlite3.Error:
+                    pass
 
     def start(self, task: str):
         if task:
@@ -1,11 +1,16 @@
-from langchain_core.messages import AIMessage
+from time import perf_counter
+from contextlib import aclosing
 from shy_sh.settings import settings
+from shy_sh.stats import stats
 from shy_sh.models import State
-from shy_sh.agents.llms import get_llm_context
-from shy_sh.utils import count_tokens, syntax
+from shy_sh.agents.tokens import get_tokenizer
+from shy_sh.agents.llms import is_warmed_up
+from shy_sh.agents.shy_agent.summary import history_summarizer
+from shy_sh.agents.streaming import StreamAccumulator, ReactToolParser
+from shy_sh.utils import syntax
 from shy_sh.agents.chains.shy_agent import shy_agent_chain
-from shy_sh.agents.misc import has_tool_calls
-from rich.live import Live
+from shy_sh.agents.misc import has_tool_calls, set_react_tool
+from shy_sh.render import StreamRenderer
 
 console_theme = {
     "lexer": "console",
@@ -16,54 +21,86 @@ console_theme = {
 loading_str = "⏱️ Loading..."
 
 
-def chatbot(state: State):
-    final_message = None
-    history = _compress_history(state["history"], state["tool_history"])
-    with Live(vertical_overflow="visible") as live:
-        live.update(loading_str)
-        for chunk in shy_agent_chain.stream({**state, "history": history}):
-            final_message = chunk if final_message is None else final_message + chunk
-            message = _parse_chunk_message(final_message)
-            if _maybe_have_tool_calls(final_message, message):
-                live.update(loading_str)
-            else:
-                live.update(
-                    syntax(f"🤖: {message}"),
-                    refresh=True,
-                )
-        message = _parse_chunk_message(final_message)
-        ai_message = AIMessage(
-            content=message, tool_calls=getattr(final_message, "tool_calls", [])
-        )
+async def chatbot(state: State):
+    stream = StreamAccumulator()
+    react = settings.llm.agent_pattern == "react"
+    early_stop = react and settings.early_stop
+    tool_parser = ReactToolParser()
+    tool_closed_at = None
+    history = await history_summarizer.compress(state["history"], state["tool_history"])
+    with StreamRenderer(prefix="🤖: ") as renderer:
+        renderer.show(loading_str)
+        started_at = perf_counter()
+        chunks = shy_agent_chain.astream({**state, "history": history})
+        async with aclosing(chunks):
+            async for chunk in chunks:
+                if not stream.chunks:
+                    _record_ttft(perf_counter() - started_at)
+                delta = stream.add(chunk)
+                if react and not tool_closed_at and tool_parser.feed(delta):
+                    tool_closed_at = perf_counter()
+                    if early_stop:
+                        break
+                if _maybe_have_tool_calls(stream):
+                    renderer.show(loading_str)
+                else:
+                    renderer.write(delta)
+        message = stream.text
+        ai_message = stream.message()
+        _record_usage(ai_message.usage_metadata)
+        if tool_parser.result:
+            set_react_tool(ai_message, tool_parser.result)
+            _record_tool_turn(message[tool_parser.end :], tool_closed_at, early_stop)
+            if early_stop:
+                ai_message.content = message = message[: tool_parser.end]
         has_tools = has_tool_calls(ai_message)
-        if not message or (settings.llm.agent_pattern == "react" and has_tools):
-            live.update("")
+        if not message or (react and has_tools):
+            renderer.show("")
         else:
-            live.update(syntax(f"\n🤖: {message}"))
+            renderer.show(syntax(f"\n🤖: {message}"))
     return {"tool_history": [ai_message]}
 
 
-def _maybe_have_tool_calls(message, parsed_message):
-    return (
-        not message.content
-        or getattr(message, "tool_calls", None)
-        or (parsed_message.startswith("{") and settings.llm.agent_pattern == "react")
-    )
+_first_request = {"done": False}
+
+
+def _record_ttft(seconds: float):
+    """Time to first token, the first request of the process shows the warm-up effect"""
+    stats.add("llm.ttft.seconds", seconds)
+    stats.add("llm.ttft.calls")
+    if not _first_request["done"]:
+        _first_request["done"] = True
+        mode = "warm_up" if is_warmed_up() else "cold"
+        stats.add(f"llm.first_ttft.{mode}.seconds", seconds)
+        stats.add(f"llm.first_ttft.{mode}.calls")
 
 
-def _parse_chunk_message(chunk):
-    if isinstance(chunk.content, list):
-        return "".join(c.get("text") for c in chunk.content if c.get("type") == "text")
-    else:
-        return chunk.content
+def _record_usage(usage):
+    """The cached input tokens show the hit rate of the provider prompt cache"""
+    if not usage:
+        return
+    details = usage.get("input_token_details") or {}
+    stats.add("llm.input_tokens", usage.get("input_tokens", 0))
+    stats.add("llm.output_tokens", usage.get("output_tokens", 0))
+    stats.add("llm.cache_read_tokens", details.get("cache_read") or 0)
+    stats.add("llm.cache_creation_tokens", details.get("cache_creation") or 0)
 
 
-def _compress_history(history, tool_history):
-    max_len = get_llm_context()
-    tokens = count_tokens(history + tool_history)
-    while tokens > max_len:
-        history = history[2:]
-        if not history:
-            break
-        tokens = count_tokens(history + tool_history)
-    return history
+def _record_tool_turn(trailing_text, tool_closed_at, early_stop):
+    """
+    The tokens streamed after the tool request are what the early stop saves,
+    with the early stop enabled only the rest of the last chunk is left
+    """
+    stats.add("react.tool_turns")
+    if early_stop:
+        stats.add("react.early_stops")
+    stats.add("react.trailing_tokens", get_tokenizer().count(trailing_text))
+    stats.add("react.trailing_seconds", perf_counter() - tool_closed_at)
+
+
+def _maybe_have_tool_calls(stream: StreamAccumulator):
+    return (
+        not stream.raw_content
+        or stream.has_tool_calls
+        or (stream.first_text.startswith("{") and settings.llm.agent_pattern == "react")
+    )
@@ -1,38 +1,134 @@
+import asyncio
+import pyperclip
 from uuid import uuid4
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
 from langchain_core.messages import ToolMessage, HumanMessage
-from rich import print
-from shy_sh.models import State
+from rich import print, get_console
+from shy_sh.models import State, ToolMeta
 from shy_sh.agents.tools import tools_by_name
+from shy_sh.agents.tools.parallel import is_parallel_safe
 from shy_sh.settings import settings
+from shy_sh.utils import ask_confirm, live_output
 from shy_sh.agents.misc import parse_react_tool
+from shy_sh.agents.shy_agent.runtime import run_in_main_thread
 
 
-def tools_handler(state: State):
+async def tools_handler(state: State):
     last_message = state["tool_history"][-1]
     t_calls = _get_tool_calls(last_message)
 
     tool_answers = []
-    for t_call in t_calls:
-        try:
-            t = tools_by_name[t_call["name"]]
-            message = t.invoke(
-                {
-                    **t_call,
-                    "args": {"state": state, **t_call["args"]},
-                }
-            )
-        except Exception as e:
-            print(f"[bold red]🚨 Tool error: {e}[/bold red]")
-            message = ToolMessage(f"Tool error: {e}", tool_call_id=t_call["id"])
-
-        if settings.llm.agent_pattern == "react":
-            m = HumanMessage(content=f"Tool response:\n{message.content}")
-            m.artifact = getattr(message, "artifact", None)
-            message = m
-        tool_answers.append(message)
+    for batch in _batches(t_calls):
+        if tool_answers and _stops_execution(tool_answers[-1]):
+            tool_answers += [_interrupted(t_call) for t_call in batch]
+        elif len(batch) > 1:
+            tool_answers += await _run_parallel(batch, state)
+        else:
+            # the tools prompt the user and drive the terminal
+            tool_answers.append(await run_in_main_thread(_invoke, batch[0], state))
+
+    if settings.llm.agent_pattern == "react":
+        tool_answers = [_to_react_message(message) for message in tool_answers]
     return {"tool_history": tool_answers}
 
 
+def _invoke(t_call, state):
+    try:
+        t = tools_by_name[t_call["name"]]
+        return t.invoke({**t_call, "args": {"state": state, **t_call["args"]}})
+    except Exception as e:
+        print(f"[bold red]🚨 Tool error: {e}[/bold red]")
+        return ToolMessage(f"Tool error: {e}", tool_call_id=t_call["id"])
+
+
+def _invoke_quietly(t_call, state):
+    live_output.set(False)
+    return _invoke(t_call, state)
+
+
+def _batches(t_calls):
+    """Groups the consecutive parallel-safe calls, the others run one by one"""
+    batches = []
+    for t_call in t_calls:
+        if (
+            settings.parallel_tools > 1
+            and batches
+            and is_parallel_safe(t_call)
+            and is_parallel_safe(batches[-1][-1])
+        ):
+            batches[-1].append(t_call)
+        else:
+            batches.append([t_call])
+    return batches
+
+
+async def _run_parallel(batch, state):
+    commands = [c["args"]["arg"] for c in batch if c["name"] == "shell"]
+    if commands and state["ask_before_execute"]:
+        denied = await run_in_main_thread(_confirm_commands, commands)
+        if denied:
+            content, meta = denied
+            return [
+                ToolMessage(content, artifact=meta, tool_call_id=c["id"]) for c in batch
+            ]
+
+    state = {**state, "ask_before_execute": False}
+    loop = asyncio.get_running_loop()
+    futures = [
+        loop.run_in_executor(_executor(), _invoke_quietly, t_call, state)
+        for t_call in batch
+    ]
+    # the outputs are shown in call order as soon as each one is ready
+    messages = []
+    for t_call, future in zip(batch, futures):
+        message = await future
+        if t_call["name"] == "shell":
+            print(f"🛠️ [bold green] {t_call['args']['arg']} [/bold green]\n")
+            get_console().print(message.content, markup=False, highlight=False)
+            print()
+        messages.append(message)
+    return messages
+
+
+def _confirm_commands(commands):
+    for command in commands:
+        print(f"🛠️ [bold green] {command} [/bold green]")
+    confirm = ask_confirm(explain=False)
+    print()
+    if confirm == "n":
+        return "Command interrupted by the user", ToolMeta(
+            stop_execution=True, skip_print=True
+        )
+    elif confirm == "c":
+        pyperclip.copy("\n".join(commands))
+        return "Commands copied to the clipboard!", ToolMeta(stop_execution=True)
+
+
+@lru_cache
+def _executor():
+    return ThreadPoolExecutor(settings.parallel_tools, thread_name_prefix="shy-tool")
+
+
+def _stops_execution(message):
+    artifact = getattr(message, "artifact", None)
+    return isinstance(artifact, ToolMeta) and artifact.stop_execution
+
+
+def _interrupted(t_call):
+    return ToolMessage(
+        "Command interrupted by the user",
+        artifact=ToolMeta(stop_execution=True, skip_print=True),
+        tool_call_id=t_call["id"],
+    )
+
+
+def _to_react_message(message):
+    m = HumanMessage(content=f"Tool response:\n{message.content}")
+    m.artifact = getattr(message, "artifact", None)
+    return m
+
+
 def _get_react_tool_calls(message):
     react_tool = parse_react_tool(message)
     return [
@@ -0,0 +1,114 @@
+import asyncio
+from queue import Queue, Empty
+from threading import Thread, Lock
+from functools import partial
+from concurrent.futures import Future, CancelledError
+
+
+class AgentRuntime:
+    """
+    Runs the agent coroutine on an event loop thread while the main thread
+    keeps the terminal: the tools (prompts, ptys) are sent back to it with
+    `run_in_main_thread`. Ctrl-C on the main thread cancels the coroutine,
+    the in-flight LLM streams are closed and `run` raises KeyboardInterrupt.
+    The loop lives for the whole process so the connections pooled by the
+    async HTTP clients are reused between the runs.
+    """
+
+    def __init__(self):
+        self._jobs = Queue()
+        self._loop = None
+        self._loop_lock = Lock()
+        self._task = None
+        self._running = False
+        self._cancelled = False
+
+    @property
+    def active(self) -> bool:
+        return self._running
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        with self._loop_lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                Thread(target=self._loop.run_forever, daemon=True).start()
+            return self._loop
+
+    def spawn(self, coro) -> Future:
+        """Runs a coroutine in background on the agent loop"""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run(self, coro):
+        self._cancelled = False
+        self._running = True
+        # a queue for each run, the end of a cancelled run can't stop the next one
+        jobs = self._jobs = Queue()
+        future = self.spawn(self._main(coro))
+        future.add_done_callback(lambda _: jobs.put(None))
+        try:
+            self._serve_jobs(jobs)
+        except BaseException:
+            self.cancel()
+            raise
+        finally:
+            self._running = False
+            self._task = None
+
+        try:
+            result = future.result()
+        except (asyncio.CancelledError, CancelledError):
+            raise KeyboardInterrupt()
+        if self._cancelled:
+            raise KeyboardInterrupt()
+        return result
+
+    async def _main(self, coro):
+        self._task = asyncio.current_task()
+        if self._cancelled:
+            self._task.cancel()
+        return await coro
+
+    def _serve_jobs(self, jobs: Queue):
+        while True:
+            try:
+                # a timeout keeps the wait interruptible on every platform
+                job = jobs.get(timeout=0.2)
+            except Empty:
+                continue
+            except KeyboardInterrupt:
+                self.cancel()
+                continue
+            if job is None:
+                return
+            fn, future = job
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(fn())
+            except KeyboardInterrupt:
+                future.set_exception(asyncio.CancelledError())
+                self.cancel()
+            except BaseException as e:
+                future.set_exception(e)
+
+    def cancel(self):
+        self._cancelled = True
+        if self._loop and self._task:
+            self._loop.call_soon_threadsafe(self._task.cancel)
+
+    def submit(self, fn) -> Future:
+        future = Future()
+        self._jobs.put((fn, future))
+        return future
+
+
+runtime = AgentRuntime()
+
+
+async def run_in_main_thread(fn, *args, **kwargs):
+    """Runs a blocking call on the main thread, or in a worker thread if the agent is not running in the runtime"""
+    fn = partial(fn, *args, **kwargs)
+    if not runtime.active:
+        return await asyncio.to_thread(fn)
+    return await asyncio.wrap_future(runtime.submit(fn))
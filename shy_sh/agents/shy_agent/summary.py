@@ -0,0 +1,181 @@
+import asyncio
+from threading import Thread, Lock
+from concurrent.futures import Future
+from langchain_core.messages import AIMessage, HumanMessage
+from shy_sh.settings import settings
+from shy_sh.stats import stats
+from shy_sh.agents.llms import get_llm_context, get_output_reserve
+from shy_sh.agents.tokens import token_ledger
+
+SUMMARY_PREFIX = "Summary of the earlier conversation:\n"
+TOOL_RESPONSE_PREFIX = "Tool response:"
+MAX_MESSAGE_CHARS = 2000
+
+
+def is_question(message) -> bool:
+    """A message of the user that starts a turn (the react tool responses are human messages too)"""
+    return isinstance(message, HumanMessage) and not (
+        isinstance(message.content, str)
+        and message.content.startswith((TOOL_RESPONSE_PREFIX, SUMMARY_PREFIX))
+    )
+
+
+def split_turns(messages: list) -> list[list]:
+    """Splits the messages in turns, each one starts with a question of the user"""
+    turns = []
+    for message in messages:
+        if not turns or is_question(message):
+            turns.append([])
+        turns[-1].append(message)
+    return turns
+
+
+class HistorySummarizer:
+    """
+    Folds the oldest turns of the history into a running summary instead of
+    dropping them when the context fills up.
+
+    When the history passes the high-water mark the oldest turns (always
+    whole, so the tool calls stay with their responses) are summarized in a
+    background thread together with the current summary, the next calls use
+    the summary followed by the remaining turns. The summary is kept across
+    the turns, each eviction costs one small call with only the new turns.
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self._summary: HumanMessage | None = None
+        self._covered = 0
+        self._last = None
+        self._pending: Future | None = None
+        self._pending_end = (0, None)
+        # bumped when the conversation changes, a running summary of the
+        # previous one is then discarded
+        self._generation = 0
+
+    def _is_valid(self, history: list) -> bool:
+        ends = [self._pending_end] if self._pending is not None else []
+        if self._summary is not None:
+            ends.append((self._covered, self._last))
+        return all(n <= len(history) and history[n - 1] is m for n, m in ends)
+
+    def _reset(self):
+        self._summary, self._covered, self._last = None, 0, None
+        self._pending = None
+        self._generation += 1
+
+    def _view(self, history: list) -> list:
+        with self._lock:
+            if not self._is_valid(history):
+                # a different conversation (e.g. a resumed session)
+                self._reset()
+            if self._summary is None:
+                return history
+            return [self._summary, *history[self._covered :]]
+
+    async def compress(self, history: list, tool_history: list, offset=None) -> list:
+        max_len = get_llm_context()
+        if offset is None:
+            offset = get_output_reserve()
+        view = self._view(history)
+        tokens = token_ledger.total(view, 0) + token_ledger.total(tool_history, offset)
+        pending = self._pending
+        if (
+            settings.history.summarize
+            and tokens > max_len * settings.history.high_water
+        ):
+            pending = self._start(history)
+        if tokens > max_len and pending is not None:
+            try:
+                await asyncio.wrap_future(pending)
+            except Exception:
+                pass
+            view = self._view(history)
+            tokens = token_ledger.total(view, 0) + token_ledger.total(
+                tool_history, offset
+            )
+        if tokens > max_len:
+            view = _drop_oldest_turns(view, tokens - max_len)
+        return view
+
+    def _start(self, history: list) -> Future | None:
+        with self._lock:
+            if self._pending is not None:
+                return self._pending
+            covered = self._covered if self._summary is not None else 0
+            turns = split_turns(history[covered:])
+            keep = max(settings.history.keep_turns, 1)
+            evicted = [m for turn in turns[:-keep] for m in turn]
+            if not evicted:
+                return None
+            summary = self._summary.content[len(SUMMARY_PREFIX) :] if covered else ""
+            self._pending = future = Future()
+            self._pending_end = (covered + len(evicted), evicted[-1])
+            generation = self._generation
+
+        def run():
+            try:
+                text = _summarize(summary, evicted)
+            except Exception as e:
+                with self._lock:
+                    if self._pending is future:
+                        self._pending = None
+                future.set_exception(e)
+                return
+            stats.add("history.summaries")
+            stats.add("history.summarized_messages", len(evicted))
+            with self._lock:
+                if self._generation == generation:
+                    self._summary = HumanMessage(content=SUMMARY_PREFIX + text)
+                    self._covered = covered + len(evicted)
+                    self._last = evicted[-1]
+                if self._pending is future:
+                    self._pending = None
+            future.set_result(text)
+
+        Thread(target=run, daemon=True).start()
+        return future
+
+
+history_summarizer = HistorySummarizer()
+
+
+def _summarize(summary: str, messages: list) -> str:
+    from shy_sh.agents.chains.summarize import summarize_chain
+
+    return summarize_chain.invoke(
+        {
+            "summary": summary or "(empty)",
+            "messages": _transcript(messages),
+            "max_words": settings.history.summary_words,
+        }
+    ).strip()
+
+
+def _transcript(messages: list) -> str:
+    lines = []
+    for message in messages:
+        content = message.content
+        if not isinstance(content, str):
+            content = str(content)
+        if len(content) > MAX_MESSAGE_CHARS:
+            content = content[:MAX_MESSAGE_CHARS] + "...(truncated)"
+        if isinstance(message, AIMessage):
+            role = "Assistant"
+            for tc in message.tool_calls:
+                content += f"\n[{tc['name']}: {tc['args'].get('arg', tc['args'])}]"
+        elif is_question(message):
+            role = "User"
+        else:
+            role = "Tool"
+        lines.append(f"{role}: {content}")
+    return "\n\n".join(lines)
+
+
+def _drop_oldest_turns(view: list, excess: int) -> list:
+    """Last resort when the summary is not enough, the last turn is always kept"""
+    head = view[:1] if view and not is_question(view[0]) else []
+    turns = split_turns(view[len(head) :])
+    while excess > 0 and len(turns) > 1:
+        excess -= token_ledger.total(turns.pop(0), 0)
+    return [*head, *[m for turn in turns for m in turn]]
@@ -0,0 +1,97 @@
+from threading import Thread, Condition
+from langchain_core.callbacks import BaseCallbackHandler
+from shy_sh.stats import stats
+from shy_sh.agents.tokens import get_tokenizer, token_ledger
+
+
+class _TokenCounter(BaseCallbackHandler):
+    def __init__(self):
+        self.calls = 0
+        self.input_tokens = 0
+
+    def on_chat_model_start(self, serialized, messages, **kwargs):
+        self.calls += 1
+        self.input_tokens += sum(token_ledger.total(m, offset=0) for m in messages)
+
+    def on_llm_start(self, serialized, prompts, **kwargs):
+        self.calls += 1
+        self.input_tokens += sum(get_tokenizer().count(p) for p in prompts)
+
+
+class SpeculativeStream:
+    """
+    Streams a chain in a background thread before knowing if the result will
+    be needed. Iterating it replays the chunks received so far and then follows
+    the stream, closing it before iterating cancels the request.
+    The tokens spent are recorded in the stats as used or wasted.
+    """
+
+    def __init__(self, name: str, runnable, inputs: dict):
+        self.name = name
+        self._chunks = []
+        self._error = None
+        self._done = False
+        self._used = False
+        self._closed = False
+        self._cond = Condition()
+        self._counter = _TokenCounter()
+        stats.add(f"speculation.{name}.started")
+        Thread(target=self._run, args=(runnable, inputs), daemon=True).start()
+
+    def _run(self, runnable, inputs):
+        try:
+            for chunk in runnable.stream(inputs, {"callbacks": [self._counter]}):
+                with self._cond:
+                    if self._closed and not self._used:
+                        break
+                    self._chunks.append(chunk)
+                    self._cond.notify_all()
+        except Exception as e:
+            self._error = e
+        finally:
+            with self._cond:
+                self._done = True
+                self._cond.notify_all()
+
+    def __iter__(self):
+        self._used = True
+        sent = 0
+        while True:
+            with self._cond:
+                while sent == len(self._chunks) and not self._done:
+                    self._cond.wait()
+                chunks = self._chunks[sent:]
+                done = self._done and sent + len(chunks) == len(self._chunks)
+            sent += len(chunks)
+            yield from chunks
+            if done:
+                break
+        if self._error:
+            raise self._error
+
+    def close(self):
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            text = "".join(self._chunks)
+        tokens = self._counter.input_tokens
+        if self._counter.calls:
+            tokens += get_tokenizer().count(text)
+        outcome = "used" if self._used else "cancelled"
+        stats.add(f"speculation.{self.name}.{outcome}")
+        stats.add(f"speculation.tokens.{'used' if self._used else 'wasted'}", tokens)
+
+
+class Prefetch:
+    """Named speculative streams started together"""
+
+    def __init__(self, **streams: SpeculativeStream):
+        self.streams = streams
+
+    def get(self, name: str) -> SpeculativeStream | None:
+        return self.streams.get(name)
+
+    def cancel(self):
+        for stream in self.streams.values():
+            stream.close()
@@ -0,0 +1,181 @@
+import re
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.messages.ai import add_usage
+from shy_sh.models import ToolRequest
+
+
+class StreamAccumulator:
+    """
+    Collects the chunks streamed by a chat model in linear time.
+
+    The text deltas are appended to a list and joined only when the text is
+    requested, the tool call deltas are merged by index as they arrive.
+    """
+
+    def __init__(self):
+        self._parts: list[str] = []
+        self._text = ""
+        self._tool_call_chunks: dict = {}
+        self._tool_calls: list = []
+        self.first_text = ""
+        self.raw_content = False
+        self.usage_metadata = None
+        self.response_metadata = {}
+        self.chunks = 0
+
+    def add(self, chunk) -> str:
+        """Add a streamed chunk and return the text delta it contains"""
+        self.chunks += 1
+        delta = _chunk_text(chunk.content)
+        if chunk.content:
+            self.raw_content = True
+        if delta:
+            self._parts.append(delta)
+            if not self.first_text:
+                self.first_text = delta
+
+        for i, tc in enumerate(getattr(chunk, "tool_call_chunks", None) or []):
+            index = tc.get("index")
+            key = index if index is not None else tc.get("id") or i
+            merged = self._tool_call_chunks.setdefault(
+                key, {"name": "", "args": [], "id": None, "index": index}
+            )
+            merged["name"] += tc.get("name") or ""
+            merged["args"].append(tc.get("args") or "")
+            merged["id"] = merged["id"] or tc.get("id")
+        if not isinstance(chunk, AIMessageChunk) and getattr(chunk, "tool_calls", None):
+            self._tool_calls.extend(chunk.tool_calls)
+
+        usage = getattr(chunk, "usage_metadata", None)
+        if usage:
+            self.usage_metadata = add_usage(self.usage_metadata, usage)
+        self.response_metadata.update(getattr(chunk, "response_metadata", None) or {})
+        return delta
+
+    @property
+    def text(self) -> str:
+        if self._parts:
+            self._text += "".join(self._parts)
+            self._parts.clear()
+        return self._text
+
+    @property
+    def has_tool_calls(self) -> bool:
+        return bool(self._tool_call_chunks or self._tool_calls)
+
+    @property
+    def tool_calls(self) -> list:
+        if not self._tool_call_chunks:
+            return list(self._tool_calls)
+        chunk = AIMessageChunk(
+            content="",
+            tool_call_chunks=[
+                {**tc, "args": "".join(tc["args"])}
+                for tc in self._tool_call_chunks.values()
+            ],
+        )
+        return [*self._tool_calls, *chunk.tool_calls]
+
+    def message(self) -> AIMessage:
+        return AIMessage(
+            content=self.text,
+            tool_calls=self.tool_calls,
+            usage_metadata=self.usage_metadata,
+            response_metadata=self.response_metadata,
+        )
+
+
+def _chunk_text(content) -> str:
+    if isinstance(content, list):
+        return "".join(
+            c.get("text", "")
+            for c in content
+            if isinstance(c, dict) and c.get("type") == "text"
+        )
+    return content or ""
+
+
+# the characters that change the state of the scan inside an object
+_JSON_SIGNIFICANT = re.compile(r'[{}"\\]')
+
+
+class ReactToolParser:
+    """
+    Incremental scanner for the ReAct tool request in the streamed text.
+
+    The deltas are scanned once, keeping the nesting depth and the string and
+    escape state between them, so braces and quotes inside the JSON strings
+    are handled. Every top level object is validated when it closes and the
+    first valid `ToolRequest` is kept in `result`, `end` is the position in
+    the whole text right after it.
+    """
+
+    def __init__(self):
+        self.result: ToolRequest | None = None
+        self.end = 0
+        self._offset = 0
+        self._parts: list[str] = []
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+
+    def feed(self, delta: str) -> ToolRequest | None:
+        pos = 0
+        size = len(delta)
+        if self.result is not None:
+            return self.result
+        while self.result is None and pos < size:
+            if self._depth == 0:
+                start = delta.find("{", pos)
+                if start < 0:
+                    break
+                self._parts = []
+                self._depth = 1
+                pos = start + 1
+                segment = start
+            else:
+                segment = pos
+            pos = self._scan(delta, pos)
+            if self._depth:
+                self._parts.append(delta[segment:])
+                break
+            self._parts.append(delta[segment:pos])
+            self._validate("".join(self._parts))
+            if self.result is not None:
+                self.end = self._offset + pos
+        self._offset += size
+        return self.result
+
+    def _scan(self, delta: str, pos: int) -> int:
+        """Scans until the current object closes, returns the position after it"""
+        if self._escape:
+            self._escape = False
+            pos += 1
+        while True:
+            match = _JSON_SIGNIFICANT.search(delta, pos)
+            if not match:
+                return len(delta)
+            char = match.group()
+            pos = match.end()
+            if self._in_string:
+                if char == "\\":
+                    if pos == len(delta):
+                        self._escape = True
+                        return pos
+                    pos += 1
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char == "{":
+                self._depth += 1
+            elif char == "}":
+                self._depth -= 1
+                if not self._depth:
+                    return pos
+
+    def _validate(self, candidate: str):
+        try:
+            self.result = ToolRequest.model_validate_json(candidate)
+        except ValueError:
+            pass
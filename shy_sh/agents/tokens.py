@@ -0,0 +1,174 @@
+import threading
+from collections import OrderedDict
+from shy_sh.settings import settings
+
+# Tokens added by the chat format around each message
+MESSAGE_OVERHEAD = 3
+
+
+class Tokenizer:
+    """Exact tokenizer backed by a local tiktoken encoding"""
+
+    def __init__(self, encoding_name: str):
+        from tiktoken import get_encoding
+
+        self.name = encoding_name
+        self._encoding = get_encoding(encoding_name)
+
+    def count(self, text: str) -> int:
+        return len(self._encoding.encode_ordinary(text))
+
+
+class EstimatedTokenizer:
+    """
+    Tokenizer for models without a local vocabulary, the count of a reference
+    encoding is scaled by a factor calibrated on the model family.
+    If the reference encoding can't be loaded (e.g. offline) it falls back
+    to the characters count.
+    """
+
+    def __init__(self, encoding_name: str, factor: float, chars_per_token=4.0):
+        self.factor = factor
+        self.chars_per_token = chars_per_token
+        try:
+            self._reference = Tokenizer(encoding_name)
+            self.name = f"{encoding_name}*{factor}"
+        except Exception:
+            self._reference = None
+            self.name = f"chars/{chars_per_token / factor:.2f}"
+
+    def count(self, text: str) -> int:
+        if self._reference is None:
+            return round(len(text) * self.factor / self.chars_per_token)
+        return round(self._reference.count(text) * self.factor)
+
+
+# model name prefix -> (encoding, calibration factor), factor None means exact
+MODEL_TOKENIZERS = [
+    ("gpt-4o", "o200k_base", None),
+    ("chatgpt-4o", "o200k_base", None),
+    ("gpt-4.1", "o200k_base", None),
+    ("gpt-4.5", "o200k_base", None),
+    ("gpt-5", "o200k_base", None),
+    ("o1", "o200k_base", None),
+    ("o3", "o200k_base", None),
+    ("o4", "o200k_base", None),
+    ("gpt-4", "cl100k_base", None),
+    ("gpt-3.5", "cl100k_base", None),
+    ("llama3", "cl100k_base", 1.0),
+    ("llama-3", "cl100k_base", 1.0),
+    ("meta-llama-3", "cl100k_base", 1.0),
+    ("qwen", "cl100k_base", 1.0),
+    ("deepseek", "cl100k_base", 1.05),
+    ("claude", "cl100k_base", 1.15),
+    ("anthropic.claude", "cl100k_base", 1.15),
+    ("gemini", "o200k_base", 1.0),
+    ("gemma", "o200k_base", 1.05),
+    ("phi", "cl100k_base", 1.1),
+    ("mistral", "cl100k_base", 1.2),
+    ("mixtral", "cl100k_base", 1.2),
+    ("codellama", "cl100k_base", 1.25),
+    ("llama2", "cl100k_base", 1.25),
+    ("llama-2", "cl100k_base", 1.25),
+]
+PROVIDER_TOKENIZERS = {
+    "openai": ("o200k_base", None),
+    "anthropic": ("cl100k_base", 1.15),
+    "google": ("o200k_base", 1.0),
+}
+DEFAULT_TOKENIZER = ("o200k_base", 1.0)
+
+
+def normalize_model_name(name: str):
+    name = name.lower().rsplit("/", 1)[-1]
+    # aws bedrock ids: us.meta.llama3-1-8b-instruct-v1:0
+    for vendor in ("us.", "eu.", "apac.", "meta.", "mistral.", "cohere.", "amazon."):
+        name = name.removeprefix(vendor)
+    return name
+
+
+def resolve_tokenizer(provider: str, model: str):
+    name = normalize_model_name(model)
+    for prefix, encoding, factor in MODEL_TOKENIZERS:
+        if name.startswith(prefix):
+            return encoding, factor
+    return PROVIDER_TOKENIZERS.get(provider, DEFAULT_TOKENIZER)
+
+
+_tokenizers = {}
+_tokenizers_lock = threading.Lock()
+
+
+def get_tokenizer(provider: str | None = None, model: str | None = None):
+    provider = provider or settings.llm.provider
+    model = model or settings.llm.name
+    key = (provider, model)
+    tokenizer = _tokenizers.get(key)
+    if tokenizer is None:
+        with _tokenizers_lock:
+            tokenizer = _tokenizers.get(key)
+            if tokenizer is None:
+                encoding, factor = resolve_tokenizer(provider, model)
+                try:
+                    if factor is None:
+                        tokenizer = Tokenizer(encoding)
+                    else:
+                        tokenizer = EstimatedTokenizer(encoding, factor)
+                except Exception:
+                    tokenizer = EstimatedTokenizer(encoding, 1.0)
+                _tokenizers[key] = tokenizer
+    return tokenizer
+
+
+def preload_tokenizer():
+    """Load the tokenizer of the configured model in background"""
+    thread = threading.Thread(target=get_tokenizer, daemon=True)
+    thread.start()
+    return thread
+
+
+class TokenLedger:
+    """
+    Cache of the token count of each message, keyed by the message content.
+    The ledger lives for the whole process so an interactive session encodes
+    every message only once.
+    """
+
+    def __init__(self, max_entries: int = 4096):
+        self.max_entries = max_entries
+        self._tokenizer_name = None
+        self._counts: OrderedDict[str, int] = OrderedDict()
+
+    def _encode_len(self, text: str) -> int:
+        return get_tokenizer().count(text)
+
+    def count(self, message) -> int:
+        tokenizer_name = get_tokenizer().name
+        if tokenizer_name != self._tokenizer_name:
+            # the model changed, the cached counts are not valid anymore
+            self._counts.clear()
+            self._tokenizer_name = tokenizer_name
+        content = message.content
+        if not isinstance(content, str):
+            content = str(content)
+        tokens = self._counts.get(content)
+        if tokens is None:
+            tokens = self._encode_len(content) + MESSAGE_OVERHEAD
+            self._counts[content] = tokens
+            if len(self._counts) > self.max_entries:
+                self._counts.popitem(last=False)
+        else:
+            self._counts.move_to_end(content)
+        return tokens
+
+    def counts(self, messages: list) -> list[int]:
+        return [self.count(m) for m in messages]
+
+    def total(self, messages: list, offset: int = 2000) -> int:
+        return sum(self.counts(messages)) + offset
+
+    def clear(self):
+        self._counts.clear()
+
+
+token_ledger = TokenLedger()
@@ -0,0 +1,116 @@
+import re
+import shlex
+from shy_sh.utils import detect_shell
+
+# tools that only read and never prompt the user
+PARALLEL_SAFE_TOOLS = {"shell_history", "read_output"}
+
+READ_ONLY_COMMANDS = set("""
+    basename cat cut date df dirname du echo egrep fgrep file find free grep
+    head id jq ls lsblk md5sum nproc printenv ps pwd readlink realpath
+    rg sha1sum sha256sum sort stat tail tr tree type uname uniq uptime wc whereis
+    which whoami
+    """.split())
+READ_ONLY_GIT_COMMANDS = set(
+    "blame describe diff log ls-files remote rev-parse shortlog show status".split()
+)
+# options that make an otherwise read-only command write, run or never end,
+# matched by prefix (`--output=x`), by abbreviation (`--out x`) and inside the
+# bundled short flags (`-ro`)
+UNSAFE_ARGS = {
+    "find": {
+        "-delete",
+        "-exec",
+        "-execdir",
+        "-ok",
+        "-okdir",
+        "-fls",
+        "-fprint",
+        "-fprint0",
+        "-fprintf",
+    },
+    "sort": {"-o", "--output", "--compress-program"},
+    "tail": {"-f", "-F", "--follow"},
+    "tree": {"-o"},
+    "rg": {"--pre", "--pre-glob"},
+    "date": {"-s", "--set"},
+    "diff": {"--output"},
+    "log": {"--output"},
+    "show": {"--output"},
+    "remote": {
+        "add",
+        "remove",
+        "rm",
+        "rename",
+        "set-url",
+        "set-head",
+        "set-branches",
+        "prune",
+        "update",
+    },
+}
+# commands writing to their second positional argument
+OUTPUT_FILE_COMMANDS = {"uniq"}
+
+# redirections, subshells, process substitutions, background jobs, multiple
+# lines and variable assignments
+_UNSAFE_SYNTAX = re.compile(r"[>`\n\r]|[$<]\(|(?<![&|])&(?![&|])|^\s*\w+=")
+_SEPARATORS = re.compile(r"\|\|?|&&|;")
+
+
+def is_parallel_safe(tool_call) -> bool:
+    name = tool_call["name"]
+    if name in PARALLEL_SAFE_TOOLS:
+        return True
+    if name == "shell":
+        return is_read_only_command(tool_call["args"].get("arg", ""))
+    return False
+
+
+def is_read_only_command(cmd: str) -> bool:
+    """
+    True if every command of the pipeline only reads, doesn't need a tty and
+    terminates on its own. Anything unknown is considered unsafe.
+    """
+    if detect_shell() in ["powershell", "cmd"]:
+        return False
+    if not cmd.strip() or _UNSAFE_SYNTAX.search(cmd):
+        return False
+    for part in _SEPARATORS.split(cmd):
+        try:
+            args = shlex.split(part)
+        except ValueError:
+            return False
+        if not args or not _is_read_only(args):
+            return False
+    return True
+
+
+def _is_read_only(args: list[str]) -> bool:
+    command, args = args[0], args[1:]
+    if command == "git":
+        if not args or args[0] not in READ_ONLY_GIT_COMMANDS:
+            return False
+        command, args = args[0], args[1:]
+    elif command not in READ_ONLY_COMMANDS:
+        return False
+    if command in OUTPUT_FILE_COMMANDS:
+        if len([a for a in args if not a.startswith("-") or a == "-"]) > 1:
+            return False
+    unsafe = UNSAFE_ARGS.get(command, set())
+    return not any(_is_unsafe_arg(arg, unsafe) for arg in args)
+
+
+def _is_unsafe_arg(arg: str, unsafe: set[str]) -> bool:
+    for option in unsafe:
+        if not option.startswith("-") or len(option) > 2:
+            # subcommands and long options
+            if arg == option or option.startswith("-") and arg.startswith(option):
+                return True
+            # getopt accepts the unambiguous prefixes of the long options
+            name = arg.split("=")[0]
+            if option.startswith("--") and len(name) > 2 and option.startswith(name):
+                return True
+        elif arg.startswith("-") and not arg.startswith("--") and option[1] in arg:
+            return True
+    return False
@@ -4,13 +4,15 @@ import pyperclip
 from typing import Annotated
 from tempfile import NamedTemporaryFile
 from rich import print
-from rich.live import Live
 from langgraph.prebuilt import InjectedState
 from langchain.tools import tool
 from shy_sh.models import State, ToolMeta
-from shy_sh.utils import ask_confirm, tools_to_human, syntax, run_python, parse_code
+from shy_sh.capture import OutputCapture
+from shy_sh.utils import ask_confirm, tools_to_human, run_python, parse_code
+from shy_sh.render import StreamRenderer
 from shy_sh.agents.chains.python_expert import pyexpert_chain
 from shy_sh.agents.chains.explain import explain
+from shy_sh.agents.output import fit_tool_output, fits_budget, tool_output_budget
 
 
 @tool(response_format="content_and_artifact")
@@ -22,13 +24,11 @@ def python_expert(arg: str, state: Annotated[State, InjectedState]):
         "history": tools_to_human(state["history"] + state["tool_history"]),
         "input": arg,
     }
-    code = ""
-    with Live(vertical_overflow="visible") as live:
+    with StreamRenderer(lexer="python", theme="command") as renderer:
         for chunk in pyexpert_chain.stream(inputs):
-            code += chunk
-            live.update(syntax(code, "python", "command"))
-        code = parse_code(code)
-        live.update(syntax(code.strip(), "python", "command"))
+            renderer.write(chunk)
+        code = parse_code(renderer.text)
+        renderer.update(code.strip())
 
     confirm = "y"
     if state["ask_before_execute"]:
@@ -52,39 +52,25 @@ def python_expert(arg: str, state: Annotated[State, InjectedState]):
         if ret:
             return ret
 
+    capture = OutputCapture.from_settings(code)
     if sys.version_info >= (3, 11):
         with NamedTemporaryFile("w+", suffix=".py", delete_on_close=False) as file:
             file.write(code)
             file.close()
             os.chmod(file.name, 0o755)
-            result = run_python(file.name)
-
-            if len(result) > 20000:
-                print("\n🐳 [bold red]Output too long! It will be truncated[/bold red]")
-                result = (
-                    result[:9000]
-                    + "\n...(OUTPUT TOO LONG TRUNCATED!)...\n"
-                    + result[-9000:]
-                )
-
+            result = run_python(file.name, capture)
     else:
-        with NamedTemporaryFile("w+", suffix=ext, delete=False) as file:
+        with NamedTemporaryFile("w+", suffix=".py", delete=False) as file:
             file.write(code)
             file.close()
             os.chmod(file.name, 0o755)
-            result = run_python(file.name)
-
-            if len(result) > 20000:
-                print("\n🐳 [bold red]Output too long! It will be truncated[/bold red]")
-                result = (
-                    result[:9000]
-                    + "\n...(OUTPUT TOO LONG TRUNCATED!)...\n"
-                    + result[-9000:]
-                )
+            result = run_python(file.name, capture)
             os.unlink(file.name)
 
+    budget = tool_output_budget(state)
+    result = fit_tool_output(result, budget, capture)
     ret = f"\nScript executed:\n```python\n{code.strip()}\n```\n\nOutput:\n{result}"
-    if len(ret) > 20000:
+    if not fits_budget(ret, budget):
         ret = f"Output:\n{result}"
     return (
         ret,
@@ -0,0 +1,45 @@
+import re
+from typing import Annotated
+from rich import print
+from langgraph.prebuilt import InjectedState
+from langchain.tools import tool
+from shy_sh.models import State, ToolMeta
+from shy_sh.output_store import output_store
+from shy_sh.agents.output import fit_tool_output, tool_output_budget
+
+DEFAULT_LINES = 100
+
+
+@tool(response_format="content_and_artifact")
+def read_output(arg: str, state: Annotated[State, InjectedState]):
+    """to read a part of a previous command output that was too long and was reduced, without running the command again, the arg is the output id followed by a line range (e.g. "out-1 200-300") or by grep and a python regex (e.g. "out-1 grep error|warning")"""
+    print(f"📄 [bold yellow]Reading {arg}...[/bold yellow]\n")
+    parts = arg.strip().split(maxsplit=2)
+    entry = output_store.get(parts[0]) if parts else None
+    if entry is None:
+        ids = ", ".join(output_store.ids()) or "none"
+        return f"Output not found, available outputs: {ids}", ToolMeta()
+
+    if len(parts) > 1 and parts[1] == "grep":
+        try:
+            lines = entry.grep(parts[2] if len(parts) > 2 else "")
+        except re.error as e:
+            return f"Invalid pattern: {e}", ToolMeta()
+    else:
+        try:
+            start, end = _parse_range(" ".join(parts[1:]))
+        except ValueError:
+            return "Invalid line range, use the format start-end", ToolMeta()
+        lines = enumerate(entry.lines(start, end), max(start, 1))
+
+    result = "\n".join(f"{n}: {line}" for n, line in lines) or "No lines found"
+    result = fit_tool_output(result, tool_output_budget(state))
+    return f"{entry.id} has {entry.line_count} lines\n{result}", ToolMeta()
+
+
+def _parse_range(text: str):
+    if not text:
+        return 1, DEFAULT_LINES
+    start, _, end = re.sub(r"\s", "", text).replace(":", "-").partition("-")
+    start = int(start)
+    return start, int(end) if end else start + DEFAULT_LINES - 1
@@ -5,15 +5,22 @@ from langgraph.prebuilt import InjectedState
 from langchain.tools import tool
 from questionary import select, Style, Choice
 from shy_sh.models import State, ToolMeta
+from shy_sh.capture import OutputCapture
 from shy_sh.utils import (
     ask_confirm,
     run_command,
     tools_to_human,
     detect_shell,
     detect_os,
+    live_output,
 )
-from shy_sh.agents.chains.explain import explain
-from shy_sh.agents.chains.alternative_commands import get_alternative_commands
+from shy_sh.agents.chains.explain import explain, prefetch_explain
+from shy_sh.agents.output import fit_tool_output, tool_output_budget
+from shy_sh.agents.chains.alternative_commands import (
+    get_alternative_commands,
+    prefetch_alternative_commands,
+)
+from shy_sh.agents.speculation import Prefetch
 from shy_sh.settings import settings
 
 _text_style = {
@@ -40,11 +47,29 @@ _select_style = {
 @tool(response_format="content_and_artifact")
 def shell(arg: str, state: Annotated[State, InjectedState]):
     """to execute a shell command in the terminal, useful for every task that requires to interact with the current system or local files, do not pass multiple lines commands, avoid to install new packages if not explicitly requested"""
-    print(f"🛠️ [bold green] {arg} [/bold green]")
+    if live_output.get():
+        print(f"🛠️ [bold green] {arg} [/bold green]")
+    prefetch = Prefetch()
+    if state["ask_before_execute"] and settings.speculative:
+        prefetch = Prefetch(
+            explain=prefetch_explain(_explain_inputs(arg, state)),
+            alternatives=prefetch_alternative_commands(
+                _alternatives_inputs(arg, state)
+            ),
+        )
+    try:
+        return _shell(arg, state, prefetch)
+    finally:
+        prefetch.cancel()
+
+
+def _shell(arg: str, state: State, prefetch: Prefetch):
     result = ""
     confirm = "y"
     if state["ask_before_execute"]:
         confirm = ask_confirm(alternatives=True)
+        if confirm in ["y", "n", "c"]:
+            prefetch.cancel()
     print()
     if confirm == "n":
         return "Command interrupted by the user", ToolMeta(
@@ -54,7 +79,7 @@ def shell(arg: str, state: Annotated[State, InjectedState]):
         pyperclip.copy(arg)
         return "Command copied to the clipboard!", ToolMeta(stop_execution=True)
     elif confirm == "a":
-        r = _select_alternative_command(arg, state)
+        r = _select_alternative_command(arg, state, prefetch.get("alternatives"))
         print()
         if r == "None":
             return "Command interrupted by the user", ToolMeta(
@@ -66,15 +91,13 @@ def shell(arg: str, state: Annotated[State, InjectedState]):
         arg = r
         result += f"The user decided to execute this alternative command `{arg}`\n\n"
     elif confirm == "e":
-        inputs = {
-            "task": state["history"][-1].content,
-            "script_type": "shell command",
-            "script": arg,
-            "timestamp": state["timestamp"],
-        }
-        ret = explain(inputs, ask_alternative=True)
+        ret = explain(
+            _explain_inputs(arg, state),
+            ask_alternative=True,
+            prefetched=prefetch.get("explain"),
+        )
         if ret == "alternative":
-            r = _select_alternative_command(arg, state)
+            r = _select_alternative_command(arg, state, prefetch.get("alternatives"))
             print()
             if r == "None":
                 return "Command interrupted by the user", ToolMeta(
@@ -87,25 +110,33 @@ def shell(arg: str, state: Annotated[State, InjectedState]):
         elif ret:
             return ret
 
-    result += run_command(arg)
-
-    if len(result) > 20000:
-        print("\n🐳 [bold red]Output too long! It will be truncated[/bold red]")
-        result = (
-            result[:9000] + "\n...(OUTPUT TOO LONG TRUNCATED!)...\n" + result[-9000:]
-        )
+    capture = OutputCapture.from_settings(arg)
+    result += run_command(arg, capture)
+    result = fit_tool_output(result, tool_output_budget(state), capture)
     return result, ToolMeta()
 
 
-def _select_alternative_command(arg, state):
-    inputs = {
+def _explain_inputs(arg, state):
+    return {
+        "task": state["history"][-1].content,
+        "script_type": "shell command",
+        "script": arg,
+        "timestamp": state["timestamp"],
+    }
+
+
+def _alternatives_inputs(arg, state):
+    return {
         "timestamp": state["timestamp"],
         "shell": detect_shell(),
         "system": detect_os(),
         "history": tools_to_human(state["history"] + state["tool_history"]),
         "cmd": arg,
     }
-    cmds = get_alternative_commands(inputs)
+
+
+def _select_alternative_command(arg, state, prefetched=None):
+    cmds = get_alternative_commands(_alternatives_inputs(arg, state), prefetched)
     r = select(
         (
             "Pick the command to copy to the clipboard"
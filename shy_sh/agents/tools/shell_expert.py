@@ -4,14 +4,16 @@ import pyperclip
 from typing import Annotated
 from tempfile import NamedTemporaryFile
 from rich import print
-from rich.live import Live
 from langgraph.prebuilt import InjectedState
 from langchain.tools import tool
 from shy_sh.models import State, ToolMeta
+from shy_sh.capture import OutputCapture
 from shy_sh.utils import ask_confirm, detect_shell, detect_os, parse_code
 from shy_sh.agents.chains.shell_expert import shexpert_chain
-from shy_sh.utils import run_command, tools_to_human, syntax
+from shy_sh.utils import run_command, tools_to_human
+from shy_sh.render import StreamRenderer
 from shy_sh.agents.chains.explain import explain
+from shy_sh.agents.output import fit_tool_output, fits_budget, tool_output_budget
 
 
 @tool(response_format="content_and_artifact")
@@ -27,14 +29,12 @@ def shell_expert(arg: str, state: Annotated[State, InjectedState]):
         "timestamp": state["timestamp"],
         "history": tools_to_human(state["history"] + state["tool_history"]),
     }
-    code = ""
-    with Live(vertical_overflow="visible") as live:
+    with StreamRenderer(theme="command") as renderer:
         for chunk in shexpert_chain.stream(inputs):
-            code += chunk  # type: ignore
-            live.update(syntax(code, theme="command"))
+            renderer.write(chunk)  # type: ignore
 
-        code = parse_code(code)
-        live.update(syntax(code.strip(), theme="command"))
+        code = parse_code(renderer.text)
+        renderer.update(code.strip())
 
     confirm = "y"
     if state["ask_before_execute"]:
@@ -64,38 +64,24 @@ def shell_expert(arg: str, state: Annotated[State, InjectedState]):
     elif shell == "powershell":
         ext = ".ps1"
 
+    capture = OutputCapture.from_settings(code)
     if sys.version_info >= (3, 11):
         with NamedTemporaryFile("w+", suffix=ext, delete_on_close=False) as file:
             file.write(code)
             file.close()
             os.chmod(file.name, 0o755)
-            result = run_command(file.name)
-
-            if len(result) > 20000:
-                print("\n🐳 [bold red]Output too long! It will be truncated[/bold red]")
-                result = (
-                    result[:9000]
-                    + "\n...(OUTPUT TOO LONG TRUNCATED!)...\n"
-                    + result[-9000:]
-                )
-
+            result = run_command(file.name, capture)
     else:
         with NamedTemporaryFile("w+", suffix=ext, delete=False) as file:
             file.write(code)
             file.close()
             os.chmod(file.name, 0o755)
-            result = run_command(file.name)
-
-            if len(result) > 20000:
-                print("\n🐳 [bold red]Output too long! It will be truncated[/bold red]")
-                result = (
-                    result[:9000]
-                    + "\n...(OUTPUT TOO LONG TRUNCATED!)...\n"
-                    + result[-9000:]
-                )
+            result = run_command(file.name, capture)
             os.unlink(file.name)
     print()
+    budget = tool_output_budget(state)
+    result = fit_tool_output(result, budget, capture)
     ret = f"Script executed:\n{code}\n\nOutput:\n{result}"
-    if len(ret) > 20000:
+    if not fits_budget(ret, budget):
         ret = f"Output:\n{result}"
     return ret, ToolMeta()
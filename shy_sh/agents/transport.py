@@ -0,0 +1,142 @@
+import asyncio
+from threading import Lock, Thread
+from weakref import WeakKeyDictionary
+from urllib.parse import urlsplit
+import httpx
+from shy_sh.settings import settings
+from shy_sh.stats import stats
+
+# the SDKs set their own timeouts on each request, this is for the plain requests
+DEFAULT_TIMEOUT = httpx.Timeout(600, connect=10)
+WARM_UP_TIMEOUT = 10
+
+
+def origin(url: str) -> str:
+    parts = urlsplit(url if "://" in url else f"http://{url}")
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+def http2_enabled() -> bool:
+    if not settings.http.http2:
+        return False
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+class _SharedTransport(httpx.BaseTransport):
+    """A pool that stays open when one of the clients using it is closed"""
+
+    def __init__(self, pool: httpx.HTTPTransport):
+        self.pool = pool
+
+    def handle_request(self, request):
+        return self.pool.handle_request(request)
+
+    def close(self):
+        pass
+
+
+class _LoopTransport(httpx.AsyncBaseTransport):
+    """
+    An async connection pool for each event loop, the connections can't be
+    shared between loops (the agent runs on one loop for the whole process).
+    Like `_SharedTransport` it stays open when a client is closed.
+    """
+
+    def __init__(self, make_pool):
+        self._make_pool = make_pool
+        self._pools = WeakKeyDictionary()
+
+    def _pool(self) -> httpx.AsyncHTTPTransport:
+        loop = asyncio.get_running_loop()
+        pool = self._pools.get(loop)
+        if pool is None:
+            pool = self._pools[loop] = self._make_pool()
+        return pool
+
+    async def handle_async_request(self, request):
+        return await self._pool().handle_async_request(request)
+
+    async def aclose(self):
+        pass
+
+
+class ConnectionPools:
+    """
+    One keep-alive (and HTTP/2 when h2 is installed) connection pool per
+    endpoint, shared by every client of the process: the LLM clients, the
+    internal chains and the requests to the Ollama server. The pools can be
+    warmed up at startup so the first request doesn't pay the DNS, TCP and
+    TLS handshakes after the user typed the prompt.
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self._transports = {}
+
+    def _limits(self) -> httpx.Limits:
+        return httpx.Limits(
+            max_connections=settings.http.max_connections,
+            max_keepalive_connections=settings.http.max_connections,
+            keepalive_expiry=settings.http.keepalive_expiry,
+        )
+
+    def transport(self, url: str) -> httpx.BaseTransport:
+        return self._get(
+            ("sync", origin(url)),
+            lambda: _SharedTransport(
+                httpx.HTTPTransport(http2=http2_enabled(), limits=self._limits())
+            ),
+        )
+
+    def async_transport(self, url: str) -> httpx.AsyncBaseTransport:
+        return self._get(
+            ("async", origin(url)),
+            lambda: _LoopTransport(
+                lambda: httpx.AsyncHTTPTransport(
+                    http2=http2_enabled(), limits=self._limits()
+                )
+            ),
+        )
+
+    def _get(self, key, factory):
+        with self._lock:
+            if key not in self._transports:
+                self._transports[key] = factory()
+            return self._transports[key]
+
+    def client(self, url: str, **kwargs) -> httpx.Client:
+        kwargs.setdefault("timeout", DEFAULT_TIMEOUT)
+        return httpx.Client(transport=self.transport(url), **kwargs)
+
+    def async_client(self, url: str, **kwargs) -> httpx.AsyncClient:
+        kwargs.setdefault("timeout", DEFAULT_TIMEOUT)
+        return httpx.AsyncClient(transport=self.async_transport(url), **kwargs)
+
+    def warm_up(self, url: str):
+        """Opens the connections to the endpoint in background"""
+        from shy_sh.agents.shy_agent.runtime import runtime
+
+        Thread(target=self._connect, args=(url,), daemon=True).start()
+        runtime.spawn(self._aconnect(url))
+
+    def _connect(self, url: str):
+        try:
+            self.client(url, timeout=WARM_UP_TIMEOUT).head(origin(url))
+            stats.add("http.warm_ups")
+        except httpx.HTTPError:
+            stats.add("http.warm_up_errors")
+
+    async def _aconnect(self, url: str):
+        try:
+            client = self.async_client(url, timeout=WARM_UP_TIMEOUT)
+            await client.head(origin(url))
+            stats.add("http.warm_ups")
+        except httpx.HTTPError:
+            stats.add("http.warm_up_errors")
+
+
+connection_pools = ConnectionPools()
@@ -0,0 +1,124 @@
+from time import monotonic
+from shy_sh.settings import settings
+from shy_sh.output_store import output_store
+
+
+class OutputCapture:
+    """
+    Memory bounded sink for the output of a command.
+
+    It keeps the first `head_bytes` and the last `tail_bytes` of the stream
+    and counts what was dropped in the middle, optionally the whole stream is
+    spilled to the session output store. The budget (`max_bytes`, `max_seconds`) tells
+    the caller when the command should be stopped.
+    """
+
+    def __init__(
+        self,
+        head_bytes: int = 64 * 1024,
+        tail_bytes: int = 64 * 1024,
+        spill: bool = False,
+        max_bytes: int | None = None,
+        max_seconds: float | None = None,
+        command: str = "",
+    ):
+        self.head_bytes = head_bytes
+        self.tail_bytes = tail_bytes
+        self.max_bytes = max_bytes
+        self.max_seconds = max_seconds
+        self.head = bytearray()
+        self.tail = bytearray()
+        self.total_bytes = 0
+        self.total_lines = 0
+        self.limit_reason = None
+        self.started_at = monotonic()
+        self.entry = output_store.create(command) if spill else None
+
+    @classmethod
+    def from_settings(cls, command: str = ""):
+        output = settings.output
+        return cls(
+            head_bytes=output.head_bytes,
+            tail_bytes=output.tail_bytes,
+            spill=output.spill,
+            max_bytes=output.max_bytes,
+            max_seconds=output.max_seconds,
+            command=command,
+        )
+
+    @property
+    def output_id(self) -> str | None:
+        return self.entry.id if self.entry else None
+
+    def write(self, data: bytes | str):
+        if isinstance(data, str):
+            data = data.encode()
+        self.total_bytes += len(data)
+        self.total_lines += data.count(b"\n")
+        if self.entry:
+            self.entry.write(data)
+
+        free = self.head_bytes - len(self.head)
+        if free > 0:
+            self.head += data[:free]
+            data = data[free:]
+        if data:
+            self.tail += data[-self.tail_bytes :]
+            excess = len(self.tail) - self.tail_bytes
+            if excess > 0:
+                # bytearray deletes from the front in constant time
+                del self.tail[:excess]
+
+    @property
+    def dropped_bytes(self) -> int:
+        return self.total_bytes - len(self.head) - len(self.tail)
+
+    @property
+    def dropped_lines(self) -> int:
+        return max(
+            self.total_lines - self.head.count(b"\n") - self.tail.count(b"\n"), 0
+        )
+
+    def remaining_time(self) -> float | None:
+        if self.max_seconds is None:
+            return None
+        return max(self.max_seconds - (monotonic() - self.started_at), 0)
+
+    def exceeded(self) -> str | None:
+        """Returns the reason why the command should be stopped, if any"""
+        if self.limit_reason:
+            return self.limit_reason
+        if self.max_bytes is not None and self.total_bytes > self.max_bytes:
+            self.limit_reason = f"more than {self.max_bytes} bytes of output"
+        elif self.max_seconds is not None and not self.remaining_time():
+            self.limit_reason = f"running for more than {self.max_seconds} seconds"
+        return self.limit_reason
+
+    def close(self):
+        if self.entry:
+            self.entry.finish()
+            output_store.trim()
+
+    def text(self) -> str:
+        if not self.dropped_bytes:
+            return _decode(bytes(self.head + self.tail))
+        head = _decode(bytes(self.head))
+        tail = bytes(self.tail)
+        # skip the utf-8 continuation bytes of a character cut by the ring buffer
+        start = 0
+        while start < min(len(tail), 4) and 0x80 <= tail[start] < 0xC0:
+            start += 1
+        return (
+            head
+            + f"\n...({self.dropped_bytes} bytes, {self.dropped_lines} lines not captured)...\n"
+            + _decode(tail[start:])
+        )
+
+
+def _decode(data: bytes) -> str:
+    from shy_sh.utils import decode_output2
+
+    try:
+        return decode_output2(data)
+    except Exception:
+        return data.decode(errors="replace")
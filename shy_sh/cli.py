@@ -0,0 +1,139 @@
+import typer
+from typing import Optional, Annotated
+from importlib.metadata import version
+from rich import print
+from time import strftime
+
+# Settings and the heavy modules (langchain, langgraph, tiktoken, provider SDKs)
+# are imported inside the command branches that need them, keep this module
+# light so that `shy --version`, `shy --configure` and friends start fast.
+
+
+def exec(
+    prompt: Annotated[Optional[list[str]], typer.Argument(allow_dash=False)] = None,
+    interactive: Annotated[
+        Optional[bool],
+        typer.Option(
+            "-i",
+            help="Interactive mode [default false if a prompt is passed]",
+        ),
+    ] = False,
+    no_ask: Annotated[
+        Optional[bool],
+        typer.Option(
+            "-x",
+            help="Do not ask for confirmation before executing scripts",
+        ),
+    ] = False,
+    explain: Annotated[
+        Optional[bool],
+        typer.Option(
+            "-e",
+            help="Explain the given shell command",
+        ),
+    ] = False,
+    configure: Annotated[
+        Optional[bool], typer.Option("--configure", help="Configure LLM")
+    ] = False,
+    display_version: Annotated[
+        Optional[bool], typer.Option("--version", help="Show version")
+    ] = False,
+    daemon: Annotated[
+        Optional[bool],
+        typer.Option(
+            "--daemon",
+            help="Start a background server that keeps the agent warm between calls",
+        ),
+    ] = False,
+    show_stats: Annotated[
+        Optional[bool], typer.Option("--stats", help="Show usage stats")
+    ] = False,
+    list_sessions: Annotated[
+        Optional[bool], typer.Option("--sessions", help="List the saved sessions")
+    ] = False,
+    resume: Annotated[
+        Optional[bool],
+        typer.Option(
+            "--resume",
+            help="Resume the last session, or the one whose id is the first word of the prompt",
+        ),
+    ] = False,
+):
+    if display_version:
+        print(f"Version: {version(__package__ or 'shy-sh')}")
+        return
+    if show_stats:
+        from shy_sh.stats import print_stats
+
+        print_stats()
+        return
+    if list_sessions:
+        from shy_sh.sessions import print_sessions
+
+        print_sessions()
+        return
+    if daemon:
+        from shy_sh.daemon import serve
+
+        serve()
+        return
+    from shy_sh.settings import settings, configure_yaml
+
+    if configure:
+        configure_yaml()
+        return
+    session_id = None
+    if resume:
+        session_id, prompt = _resume_session(prompt or [])
+    task = " ".join(prompt or [])
+    print(f"[bold italic dark_orange]{settings.llm.provider} - {settings.llm.name}[/]")
+    if explain:
+        from shy_sh.agents.chains.explain import explain as do_explain
+
+        if not task:
+            print("🚨 [bold red]No command provided[/]")
+        do_explain(
+            {
+                "task": "explain this shell command",
+                "script_type": "shell command",
+                "script": task,
+                "script_type": "shell command",
+                "timestamp": strftime("%Y-%m-%d %H:%M:%S"),
+            },
+            ask_execute=False,
+        )
+        return
+
+    if not task:
+        interactive = True
+    else:
+        print(f"\n✨: {task}\n")
+    from shy_sh.agents.shy_agent.agent import ShyAgent
+    from shy_sh.output_store import output_store
+    from shy_sh.utils import load_history
+
+    load_history()
+    try:
+        ShyAgent(
+            interactive=interactive,
+            ask_before_execute=not no_ask,
+            session_id=session_id,
+        ).start(task)
+    except Exception as e:
+        print(f"🚨 [bold red]{e}[/bold red]")
+    finally:
+        # the temporary files of the spilled outputs
+        output_store.close()
+
+
+def _resume_session(prompt: list[str]):
+    from shy_sh.sessions import session_store
+
+    # `shy --resume 12 ...` resumes the session 12, a first word that isn't a
+    # session id belongs to the prompt
+    if prompt and prompt[0].isdigit() and session_store.get(int(prompt[0])):
+        return int(prompt[0]), prompt[1:]
+    session_id = session_store.latest()
+    if session_id is None:
+        print("🚨 [bold red]No session to resume[/]")
+    return session_id, prompt
@@ -0,0 +1,262 @@
+"""
+Warm background server for `shy`.
+
+`shy --daemon` imports the agent, builds the LLM client, loads the tokenizer
+and then waits on a per-user unix socket. Every `shy` call connects to it,
+sends argv, cwd, env and its stdin/stdout/stderr file descriptors and the
+daemon forks a child that runs the command directly on the client terminal.
+Each child is a separate process, so concurrent terminals get isolated
+sessions while sharing the warm parent state.
+
+The client side only uses the standard library, it must stay cheap to import.
+"""
+
+import os
+import sys
+import json
+import time
+import signal
+import socket
+import struct
+import select
+import tempfile
+import threading
+
+_HEADER = struct.Struct("!I")
+_EXIT_CODE = struct.Struct("!i")
+_FORWARDED_SIGNALS = ("SIGINT", "SIGTERM", "SIGHUP", "SIGQUIT")
+
+
+def is_supported():
+    return os.name == "posix" and hasattr(socket, "send_fds")
+
+
+def socket_path():
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR")
+    if not runtime_dir:
+        runtime_dir = os.path.join(tempfile.gettempdir(), f"shy-{os.getuid()}")
+        os.makedirs(runtime_dir, mode=0o700, exist_ok=True)
+    return os.path.join(runtime_dir, "shy-daemon.sock")
+
+
+def _is_private(path):
+    try:
+        st = os.stat(os.path.dirname(path))
+    except FileNotFoundError:
+        return False
+    return st.st_uid == os.getuid() and not st.st_mode & 0o077
+
+
+def forward(argv: list[str], fds: tuple[int, int, int] = (0, 1, 2)):
+    """
+    Run the command on the daemon, returns the exit code or None if there is no
+    daemon listening (the caller falls back to run in process)
+    """
+    if not is_supported() or os.environ.get("SHY_NO_DAEMON"):
+        return None
+    path = socket_path()
+    if not os.path.exists(path) or not _is_private(path):
+        return None
+    conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        conn.connect(path)
+    except OSError:
+        conn.close()
+        return None
+
+    with conn:
+        header = json.dumps(
+            {"argv": argv, "cwd": os.getcwd(), "env": dict(os.environ)}
+        ).encode()
+        socket.send_fds(conn, [_HEADER.pack(len(header)) + header], list(fds))
+
+        def forward_signal(signum, _):
+            try:
+                conn.sendall(bytes([signum]))
+            except OSError:
+                pass
+
+        handlers = {}
+        for name in _FORWARDED_SIGNALS:
+            signum = getattr(signal, name)
+            handlers[signum] = signal.signal(signum, forward_signal)
+        try:
+            data = _recv_exactly(conn, _EXIT_CODE.size)
+        finally:
+            for signum, handler in handlers.items():
+                signal.signal(signum, handler)
+    if data is None:
+        return 1
+    return _EXIT_CODE.unpack(data)[0]
+
+
+def _recv_exactly(conn, size):
+    data = b""
+    while len(data) < size:
+        try:
+            chunk = conn.recv(size - len(data))
+        except InterruptedError:
+            continue
+        if not chunk:
+            return None
+        data += chunk
+    return data
+
+
+def _recv_request(conn):
+    msg, fds, _, _ = socket.recv_fds(conn, 1024 * 1024, 3)
+    (size,) = _HEADER.unpack(msg[: _HEADER.size])
+    body = msg[_HEADER.size :]
+    while len(body) < size:
+        chunk = conn.recv(size - len(body))
+        if not chunk:
+            raise ConnectionError("Truncated request")
+        body += chunk
+    return json.loads(body), fds
+
+
+def _warm_up():
+    from shy_sh.agents.shy_agent.agent import ShyAgent  # noqa: F401
+    from shy_sh.agents.llms import get_llm
+    from shy_sh.agents.tokens import get_tokenizer
+
+    for step in (get_llm, get_tokenizer):
+        try:
+            step()
+        except Exception:
+            pass
+
+
+def _reload_settings():
+    from shy_sh.settings import settings, Settings
+    from shy_sh.agents.llms import get_llm, get_fallback_llms
+
+    # the config can be overridden by a ./shy.yml in the client cwd
+    fresh = Settings()
+    if fresh.llm != settings.llm:
+        get_llm.cache_clear()
+        get_fallback_llms.cache_clear()
+    for key in fresh.model_dump().keys():
+        setattr(settings, key, getattr(fresh, key))
+
+
+def _run_client(conn):
+    request, fds = _recv_request(conn)
+    os.setsid()
+    for target, fd in zip((0, 1, 2), fds):
+        os.dup2(fd, target)
+        os.close(fd)
+    sys.stdin = open(0, "r", closefd=False)
+    sys.stdout = open(1, "w", buffering=1, errors="replace", closefd=False)
+    sys.stderr = open(2, "w", buffering=1, errors="replace", closefd=False)
+    os.chdir(request["cwd"])
+    os.environ.clear()
+    os.environ.update(request["env"])
+
+    def relay_signals():
+        while data := conn.recv(1):
+            os.kill(os.getpid(), data[0])
+
+    threading.Thread(target=relay_signals, daemon=True).start()
+
+    import rich
+    import typer
+    from shy_sh.cli import exec
+    from shy_sh.utils import load_history
+
+    rich.reconfigure()
+    _reload_settings()
+    load_history()
+    sys.argv = ["shy", *request["argv"]]
+    exit_code = 0
+    try:
+        typer.run(exec)
+    except SystemExit as e:
+        exit_code = e.code if isinstance(e.code, int) else int(bool(e.code))
+    except KeyboardInterrupt:
+        exit_code = 130
+    except BaseException:
+        import traceback
+
+        traceback.print_exc()
+        exit_code = 1
+    return exit_code
+
+
+def _serve_child(conn):
+    exit_code = 1
+    try:
+        exit_code = _run_client(conn)
+    finally:
+        try:
+            from shy_sh.stats import stats
+
+            # os._exit skips the atexit hooks
+            stats.flush()
+        except Exception:
+            pass
+        try:
+            sys.stdout.flush()
+            sys.stderr.flush()
+            conn.sendall(_EXIT_CODE.pack(exit_code))
+        except Exception:
+            pass
+        os._exit(exit_code)
+
+
+def serve(idle_timeout: int | None = None):
+    from rich import print
+    from shy_sh.settings import settings
+
+    if not is_supported():
+        print("🚨 [bold red]The daemon is not supported on this platform[/]")
+        return
+    if idle_timeout is None:
+        idle_timeout = settings.daemon.idle_timeout
+    path = socket_path()
+    null = os.open(os.devnull, os.O_RDWR)
+    try:
+        already_running = forward(["--version"], (null, null, null)) is not None
+    finally:
+        os.close(null)
+    if already_running:
+        print(f"🚨 [bold red]A daemon is already listening on {path}[/]")
+        return
+    if os.path.exists(path):
+        os.unlink(path)
+
+    _warm_up()
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(path)
+    os.chmod(path, 0o600)
+    server.listen(16)
+    print(f"[bold green]🚀 shy daemon listening on {path}[/]")
+
+    children = set()
+    last_activity = time.monotonic()
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    try:
+        while True:
+            ready, _, _ = select.select([server], [], [], 1)
+            if ready:
+                conn, _ = server.accept()
+                pid = os.fork()
+                if pid == 0:
+                    server.close()
+                    _serve_child(conn)
+                conn.close()
+                children.add(pid)
+            for pid in list(children):
+                if os.waitpid(pid, os.WNOHANG)[0]:
+                    children.discard(pid)
+            if children or ready:
+                last_activity = time.monotonic()
+            elif time.monotonic() - last_activity > idle_timeout:
+                print("[bold yellow]💤 shy daemon idle, shutting down[/]")
+                break
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+        if os.path.exists(path):
+            os.unlink(path)
@@ -0,0 +1,149 @@
+import re
+import mmap
+import tempfile
+from array import array
+from bisect import bisect_right
+from threading import Lock
+from collections import OrderedDict
+from shy_sh.settings import settings
+
+
+class OutputEntry:
+    """
+    Full output of a command, spilled to an anonymous temporary file that is
+    memory mapped on read. The offset of each line is indexed while writing
+    so any line range can be sliced without scanning the file.
+    """
+
+    def __init__(self, id: str, command: str = ""):
+        self.id = id
+        self.command = command
+        self.size = 0
+        self._file = tempfile.TemporaryFile(prefix="shy-output-")
+        self._offsets = array("Q", [0])
+        self._mmap = None
+        self.finished = False
+
+    def write(self, data: bytes):
+        self._file.write(data)
+        i = data.find(b"\n")
+        while i != -1:
+            self._offsets.append(self.size + i + 1)
+            i = data.find(b"\n", i + 1)
+        self.size += len(data)
+
+    def finish(self):
+        """The command ended, no more writes"""
+        self._file.flush()
+        self.finished = True
+
+    def close(self):
+        """Releases the temporary file and its memory map"""
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        self._file.close()
+
+    @property
+    def line_count(self) -> int:
+        if self.size > self._offsets[-1]:
+            return len(self._offsets)
+        return len(self._offsets) - 1
+
+    def _map(self):
+        if self._mmap is None or len(self._mmap) < self.size:
+            self._file.flush()
+            if self._mmap is not None:
+                self._mmap.close()
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._mmap
+
+    def _line(self, data, index: int) -> str:
+        start = self._offsets[index]
+        end = self._offsets[index + 1] if index + 1 < len(self._offsets) else self.size
+        return data[start:end].decode(errors="replace").rstrip("\r\n")
+
+    def lines(self, start: int, end: int) -> list[str]:
+        """Lines from `start` to `end` included, counting from 1"""
+        start = max(start, 1)
+        end = min(end, self.line_count)
+        if not self.size or start > end:
+            return []
+        data = self._map()
+        return [self._line(data, i - 1) for i in range(start, end + 1)]
+
+    def grep(self, pattern: str, max_matches: int = 100) -> list[tuple[int, str]]:
+        """Numbered lines matching the regex `pattern`"""
+        if not self.size:
+            return []
+        regex = re.compile(pattern.encode(), re.MULTILINE)
+        data = self._map()
+        matches = []
+        last = -1
+        for match in regex.finditer(data):
+            index = bisect_right(self._offsets, match.start()) - 1
+            if index == last:
+                continue
+            last = index
+            matches.append((index + 1, self._line(data, index)))
+            if len(matches) >= max_matches:
+                break
+        return matches
+
+
+class OutputStore:
+    """
+    Outputs of the commands executed in this session, by id. Over
+    `output.store_max_entries` or `output.store_max_bytes` the least recently
+    used outputs of the finished commands are closed and forgotten.
+    """
+
+    def __init__(self):
+        self._entries: OrderedDict[str, OutputEntry] = OrderedDict()
+        self._count = 0
+        self._lock = Lock()
+
+    def create(self, command: str = "") -> OutputEntry:
+        with self._lock:
+            self._evict(settings.output.store_max_entries - 1)
+            self._count += 1
+            entry = OutputEntry(f"out-{self._count}", command)
+            self._entries[entry.id] = entry
+        return entry
+
+    def get(self, id: str) -> OutputEntry | None:
+        with self._lock:
+            entry = self._entries.get(id)
+            if entry is not None:
+                self._entries.move_to_end(id)
+            return entry
+
+    def ids(self) -> list[str]:
+        return list(self._entries)
+
+    def trim(self):
+        with self._lock:
+            self._evict(settings.output.store_max_entries)
+
+    def _evict(self, max_entries: int):
+        size = sum(e.size for e in self._entries.values())
+        for entry in list(self._entries.values()):
+            if (
+                len(self._entries) <= max_entries
+                and size <= settings.output.store_max_bytes
+            ):
+                break
+            if not entry.finished:
+                continue
+            del self._entries[entry.id]
+            size -= entry.size
+            entry.close()
+
+    def close(self):
+        with self._lock:
+            for entry in self._entries.values():
+                entry.close()
+            self._entries.clear()
+
+
+output_store = OutputStore()
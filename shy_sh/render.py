@@ -0,0 +1,109 @@
+from time import monotonic
+from rich.live import Live
+from rich.syntax import Syntax
+from shy_sh.settings import settings
+from shy_sh.utils import get_lexer, get_theme
+
+
+class StreamSyntax(Syntax):
+    """
+    Syntax that caches the highlight of the complete lines, while streaming
+    only the new lines and the last incomplete one are highlighted again.
+    The new lines are lexed without the state left by the previous ones (e.g.
+    inside a multiline string), with `incremental` off the whole code is
+    highlighted again so the final output is always exact.
+    """
+
+    def __init__(self, code: str, lexer: str, theme: str):
+        super().__init__(code, get_lexer(lexer), word_wrap=True, **get_theme(theme))
+        self.incremental = True
+        self._head_code = ""
+        self._head_text = None
+
+    def highlight(self, code, line_range=None):
+        cut = code.rfind("\n") + 1
+        if not self.incremental or line_range or self._stylized_ranges or not cut:
+            return super().highlight(code, line_range)
+
+        head = code[:cut]
+        if self._head_text is None or not head.startswith(self._head_code):
+            self._head_text = super().highlight(head)
+        elif len(head) > len(self._head_code):
+            self._head_text.append_text(super().highlight(head[len(self._head_code) :]))
+        self._head_code = head
+
+        text = self._head_text.copy()
+        if cut < len(code):
+            text.append_text(super().highlight(code[cut:]))
+        return text
+
+
+class StreamRenderer:
+    """
+    Live display for streamed text, tokens are coalesced and the screen is
+    refreshed at most `render.max_fps` times per second
+    """
+
+    def __init__(
+        self,
+        prefix: str = "",
+        lexer: str = "console",
+        theme: str = "response",
+        max_fps: float | None = None,
+    ):
+        self.prefix = prefix
+        self.max_fps = max_fps or settings.render.max_fps
+        self._syntax = StreamSyntax(prefix, lexer, theme)
+        self._parts: list[str] = []
+        self._text = ""
+        self._last_frame = 0.0
+        self._dirty = False
+        self._shown = None
+        self._live = Live(vertical_overflow="visible", auto_refresh=False)
+
+    def __enter__(self):
+        self._live.__enter__()
+        return self
+
+    def __exit__(self, *args):
+        if self._dirty or self._shown is self._syntax:
+            # the last frame stays in the scrollback, it gets a full highlight
+            self._syntax.incremental = False
+            self.refresh()
+        return self._live.__exit__(*args)
+
+    @property
+    def text(self) -> str:
+        if self._parts:
+            self._text += "".join(self._parts)
+            self._parts.clear()
+        return self._text
+
+    def write(self, delta: str):
+        """Append a streamed delta, the screen is refreshed if a frame is due"""
+        if not delta:
+            return
+        self._parts.append(delta)
+        self._dirty = True
+        if monotonic() - self._last_frame >= 1 / self.max_fps:
+            self.refresh()
+
+    def update(self, text: str):
+        """Replace the whole text and refresh the screen"""
+        self._parts.clear()
+        self._text = text
+        self.refresh()
+
+    def show(self, renderable):
+        """Show something else (e.g. a loading message) in place of the text"""
+        self._dirty = False
+        if renderable is not self._shown:
+            self._shown = renderable
+            self._live.update(renderable, refresh=True)
+
+    def refresh(self):
+        self._syntax.code = self.prefix + self.text
+        self._live.update(self._syntax, refresh=True)
+        self._shown = self._syntax
+        self._last_frame = monotonic()
+        self._dirty = False
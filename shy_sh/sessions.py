@@ -0,0 +1,232 @@
+import os
+import json
+import sqlite3
+from time import time
+from pathlib import Path
+from threading import Lock
+from shy_sh.models import ToolMeta
+
+SESSIONS_DB = Path("~/.config/shy/sessions.db").expanduser()
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    title TEXT NOT NULL,
+    cwd TEXT NOT NULL,
+    created REAL NOT NULL,
+    updated REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    session_id INTEGER NOT NULL REFERENCES sessions(id) ON DELETE CASCADE,
+    turn INTEGER NOT NULL,
+    tokens INTEGER NOT NULL,
+    data TEXT NOT NULL,
+    artifact TEXT
+);
+CREATE INDEX IF NOT EXISTS messages_session ON messages(session_id, id);
+"""
+
+
+class SessionStore:
+    """
+    Conversations saved in SQLite as they are produced, one row per message
+    with its token count, so a session can be resumed by loading only the
+    last turns that fit the token budget.
+    A turn starts with a question of the user and contains all the tool calls
+    and responses needed to answer it.
+    """
+
+    def __init__(self, path=SESSIONS_DB):
+        self.path = path
+        self._db = None
+        self._lock = Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._db is None:
+            os.makedirs(self.path.parent, exist_ok=True)
+            # the messages are appended from the agent loop thread
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db.execute("PRAGMA foreign_keys = ON")
+            self._db.executescript(_SCHEMA)
+        return self._db
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    def create(self, title: str) -> int:
+        with self._lock:
+            db = self._connect()
+            now = time()
+            with db:
+                cursor = db.execute(
+                    "INSERT INTO sessions (title, cwd, created, updated) VALUES (?, ?, ?, ?)",
+                    (title[:100], os.getcwd(), now, now),
+                )
+            return cursor.lastrowid
+
+    def append(self, session_id: int, messages: list, new_turn=False):
+        """Saves the messages, the first one starts a new turn if `new_turn`"""
+        from shy_sh.agents.tokens import token_ledger
+
+        with self._lock:
+            db = self._connect()
+            with db:
+                (turn,) = db.execute(
+                    "SELECT COALESCE(MAX(turn), -1) FROM messages WHERE session_id = ?",
+                    (session_id,),
+                ).fetchone()
+                rows = []
+                for i, message in enumerate(messages):
+                    if new_turn and i == 0 or turn < 0:
+                        turn += 1
+                    data, artifact = _dump(message)
+                    tokens = token_ledger.count(message)
+                    rows.append((session_id, turn, tokens, data, artifact))
+                db.executemany(
+                    "INSERT INTO messages (session_id, turn, tokens, data, artifact) VALUES (?, ?, ?, ?, ?)",
+                    rows,
+                )
+                db.execute(
+                    "UPDATE sessions SET updated = ? WHERE id = ?", (time(), session_id)
+                )
+
+    def pop(self, session_id: int):
+        """Removes the last message of the session"""
+        with self._lock:
+            db = self._connect()
+            with db:
+                db.execute(
+                    "DELETE FROM messages WHERE id = (SELECT MAX(id) FROM messages WHERE session_id = ?)",
+                    (session_id,),
+                )
+
+    def load(self, session_id: int, max_tokens: int) -> list:
+        """The last whole turns of the session that fit in `max_tokens`"""
+        with self._lock:
+            db = self._connect()
+            turns = db.execute(
+                "SELECT turn, SUM(tokens) FROM messages WHERE session_id = ? "
+                "GROUP BY turn ORDER BY turn DESC",
+                (session_id,),
+            ).fetchall()
+            first_turn = None
+            tokens = 0
+            for turn, turn_tokens in turns:
+                tokens += turn_tokens
+                if tokens > max_tokens:
+                    break
+                first_turn = turn
+            if first_turn is None:
+                return []
+            rows = db.execute(
+                "SELECT data, artifact FROM messages WHERE session_id = ? AND turn >= ? ORDER BY id",
+                (session_id, first_turn),
+            ).fetchall()
+        return [_load(data, artifact) for data, artifact in rows]
+
+    def get(self, session_id: int) -> dict | None:
+        return next(iter(self.list(session_id=session_id)), None)
+
+    def latest(self, cwd: str | None = None) -> int | None:
+        with self._lock:
+            row = (
+                self._connect()
+                .execute(
+                    "SELECT id FROM sessions WHERE ? IS NULL OR cwd = ? "
+                    "ORDER BY updated DESC, id DESC LIMIT 1",
+                    (cwd, cwd),
+                )
+                .fetchone()
+            )
+        return row[0] if row else None
+
+    def list(self, limit: int = 20, session_id: int | None = None) -> list[dict]:
+        with self._lock:
+            rows = (
+                self._connect()
+                .execute(
+                    "SELECT s.id, s.title, s.cwd, s.updated, COUNT(m.id), "
+                    "COALESCE(SUM(m.tokens), 0) FROM sessions s "
+                    "LEFT JOIN messages m ON m.session_id = s.id "
+                    "WHERE ? IS NULL OR s.id = ? "
+                    "GROUP BY s.id ORDER BY s.updated DESC, s.id DESC LIMIT ?",
+                    (session_id, session_id, limit),
+                )
+                .fetchall()
+            )
+        keys = ("id", "title", "cwd", "updated", "messages", "tokens")
+        return [dict(zip(keys, row)) for row in rows]
+
+    def compact(self, max_bytes: int):
+        """Deletes the least recently updated sessions until the data fits in `max_bytes`"""
+        with self._lock:
+            db = self._connect()
+            sizes = db.execute(
+                "SELECT s.id, COALESCE(SUM(LENGTH(m.data) + COALESCE(LENGTH(m.artifact), 0)), 0) "
+                "FROM sessions s LEFT JOIN messages m ON m.session_id = s.id "
+                "GROUP BY s.id ORDER BY s.updated, s.id"
+            ).fetchall()
+            size = sum(s for _, s in sizes)
+            if size <= max_bytes:
+                return
+            removed = []
+            for session_id, session_size in sizes[:-1]:
+                if size <= max_bytes:
+                    break
+                removed.append((session_id,))
+                size -= session_size
+            with db:
+                db.executemany("DELETE FROM sessions WHERE id = ?", removed)
+            db.execute("VACUUM")
+
+
+session_store = SessionStore()
+
+
+def _dump(message) -> tuple[str, str | None]:
+    from langchain_core.messages import message_to_dict
+
+    data = message_to_dict(message)
+    data["data"].pop("artifact", None)
+    artifact = getattr(message, "artifact", None)
+    if isinstance(artifact, ToolMeta):
+        artifact = artifact.model_dump_json()
+    else:
+        artifact = None
+    return json.dumps(data), artifact
+
+
+def _load(data: str, artifact: str | None):
+    from langchain_core.messages import messages_from_dict
+
+    (message,) = messages_from_dict([json.loads(data)])
+    if artifact:
+        message.artifact = ToolMeta.model_validate_json(artifact)
+    return message
+
+
+def print_sessions():
+    from rich import print
+    from rich.table import Table
+    from datetime import datetime
+
+    sessions = session_store.list()
+    if not sessions:
+        print("[bold yellow]No sessions saved yet[/]")
+        return
+    table = Table("Id", "Updated", "Messages", "Tokens", "Directory", "Title")
+    for s in sessions:
+        updated = datetime.fromtimestamp(s["updated"]).strftime("%Y-%m-%d %H:%M")
+        table.add_row(
+            str(s["id"]),
+            updated,
+            str(s["messages"]),
+            f"{s['tokens']:,}",
+            s["cwd"],
+            s["title"],
+        )
+    print(table)
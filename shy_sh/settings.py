@@ -1,5 +1,4 @@
 import os
-import yaml
 
 from typing import Type, Any, Literal
 
@@ -10,7 +9,6 @@ from pydantic_settings import (
 )
 from pydantic import BaseModel
 from pathlib import Path
-from questionary import confirm, text, select, password, Style
 
 
 class BaseLLMSchema(BaseModel):
@@ -18,10 +16,115 @@ class BaseLLMSchema(BaseModel):
     name: str
     api_key: str = ""
     temperature: float = 0.0
+    # OpenAI compatible endpoints (openai provider), a list spreads the requests
+    base_url: str | list[str] | None = None
 
 
 class LLMSchema(BaseLLMSchema):
     agent_pattern: Literal["function_call", "react"] = "react"
+    preload_tokenizer: bool = True
+    # override the model capabilities detected or found in the built-in table
+    context_window: int | None = None
+    max_output_tokens: int | None = None
+    # tried in order when the model is slow, rate-limited or failing
+    fallbacks: list[BaseLLMSchema] = []
+
+
+class DaemonSchema(BaseModel):
+    idle_timeout: int = 1800
+
+
+class ProbeSchema(BaseModel):
+    arg: str
+    thoughts: str = ""
+    cache: bool = True
+
+
+class BootstrapSchema(BaseModel):
+    probes: list[ProbeSchema] | None = None
+    extra_probes: list[ProbeSchema] = []
+    cache: bool = True
+
+
+class RenderSchema(BaseModel):
+    max_fps: float = 15
+
+
+class OutputSchema(BaseModel):
+    head_bytes: int = 64 * 1024
+    tail_bytes: int = 64 * 1024
+    spill: bool = True
+    max_bytes: int | None = None
+    max_seconds: float | None = None
+    limit_action: Literal["terminate", "kill"] = "terminate"
+    max_tokens: int | None = None
+    # outputs kept for read_output, the least recently read are dropped
+    store_max_entries: int = 50
+    store_max_bytes: int = 256 * 1024 * 1024
+
+
+class ResponseCacheSchema(BaseModel):
+    enabled: bool = True
+    # cache also when the temperature is above zero
+    force: bool = False
+    max_bytes: int = 20 * 1024 * 1024
+    ttl: int = 30 * 24 * 60 * 60
+
+
+class SessionsSchema(BaseModel):
+    enabled: bool = True
+    # the oldest sessions are deleted when the saved messages exceed it
+    max_bytes: int = 50 * 1024 * 1024
+    # tokens of history loaded on resume, default half of the context window
+    restore_tokens: int | None = None
+
+
+class HistorySchema(BaseModel):
+    # summarize the oldest turns instead of dropping them when the context fills up
+    summarize: bool = True
+    # fraction of the context window that starts the summarization
+    high_water: float = 0.6
+    # the most recent turns are never summarized
+    keep_turns: int = 2
+    summary_words: int = 300
+
+
+class OllamaSchema(BaseModel):
+    # how long the model stays loaded after a request (e.g. "30m", -1 forever)
+    keep_alive: str | int | None = "30m"
+    # default: the model context window up to 8192 tokens
+    num_ctx: int | None = None
+    num_thread: int | None = None
+    # 0 runs on the CPU only
+    num_gpu: int | None = None
+    # load the model in background while the agent starts
+    warm_up: bool = True
+
+
+class HttpSchema(BaseModel):
+    # used only if the h2 package is installed
+    http2: bool = True
+    max_connections: int = 10
+    # seconds an idle connection is kept open
+    keepalive_expiry: float = 60
+    # open the connection to the provider in background while the agent starts
+    warm_up: bool = True
+
+
+class EndpointsSchema(BaseModel):
+    # how the requests are spread when llm.base_url is a list
+    balancing: Literal["least_outstanding", "round_robin"] = "least_outstanding"
+    # consecutive failures (connection errors, 5xx) that eject an endpoint
+    eject_after: int = 2
+    # seconds between the health checks of an ejected endpoint
+    health_check_interval: float = 10
+
+
+class FailoverSchema(BaseModel):
+    # seconds to wait for the first token before moving to the next fallback
+    first_token_timeout: float | None = 20
+    # seconds after which a duplicate request races the slow one
+    hedge_after: float | None = None
 
 
 class _Settings(BaseModel):
@@ -29,6 +132,21 @@ class _Settings(BaseModel):
 
     language: str = ""
     safe_mode: bool = False
+    speculative: bool = False
+    parallel_tools: int = 4
+    early_stop: bool = True
+    prompt_cache: bool = True
+    daemon: DaemonSchema = DaemonSchema()
+    bootstrap: BootstrapSchema = BootstrapSchema()
+    render: RenderSchema = RenderSchema()
+    output: OutputSchema = OutputSchema()
+    response_cache: ResponseCacheSchema = ResponseCacheSchema()
+    sessions: SessionsSchema = SessionsSchema()
+    history: HistorySchema = HistorySchema()
+    ollama: OllamaSchema = OllamaSchema()
+    http: HttpSchema = HttpSchema()
+    endpoints: EndpointsSchema = EndpointsSchema()
+    failover: FailoverSchema = FailoverSchema()
 
 
 class Settings(BaseSettings, _Settings):
@@ -52,6 +170,7 @@ class Settings(BaseSettings, _Settings):
 
 
 settings = Settings()
+CACHE_DIR = Path("~/.config/shy/cache").expanduser()
 PROVIDERS = ["ollama", "openai", "google", "anthropic", "groq", "aws"]
 
 
@@ -69,25 +188,30 @@ def get_or_create_settings_path():
     return file_name
 
 
-_text_style = {
-    "qmark": "",
-    "style": Style.from_dict(
-        {
-            "selected": "fg:darkorange noreverse",
-            "question": "fg:ansigreen nobold",
-            "highlighted": "fg:darkorange",
-            "text": "fg:darkorange",
-            "answer": "fg:darkorange nobold",
-            "instruction": "fg:darkorange",
-        }
-    ),
-}
+def _text_style():
+    from questionary import Style
+
+    return {
+        "qmark": "",
+        "style": Style.from_dict(
+            {
+                "selected": "fg:darkorange noreverse",
+                "question": "fg:ansigreen nobold",
+                "highlighted": "fg:darkorange",
+                "text": "fg:darkorange",
+                "answer": "fg:darkorange nobold",
+                "instruction": "fg:darkorange",
+            }
+        ),
+    }
+
 
-_select_style = {
-    "pointer": "►",
-    "instruction": " ",
-    **_text_style,
-}
+def _select_style():
+    return {
+        "pointer": "►",
+        "instruction": " ",
+        **_text_style(),
+    }
 
 
 def _try_float(x):
@@ -99,17 +223,20 @@ def _try_float(x):
 
 
 def configure_yaml():
+    import yaml
+    from questionary import confirm, text, select, password
+
     provider = select(
         message="Provider:",
         choices=PROVIDERS,
         default=settings.llm.provider,
-        **_select_style,
+        **_select_style(),
     ).unsafe_ask()
     if provider != "ollama":
         api_key = password(
             message="API Key:",
             default=settings.llm.api_key,
-            **_text_style,
+            **_text_style(),
         ).unsafe_ask()
     else:
         api_key = settings.llm.api_key
@@ -118,13 +245,13 @@ def configure_yaml():
         message="Agent Pattern:",
         choices=["function_call", "react"],
         default=settings.llm.agent_pattern,
-        **_select_style,
+        **_select_style(),
     ).unsafe_ask()
     temperature = text(
         message="Temperature:",
         default=str(settings.llm.temperature),
         validate=lambda x: _try_float(x),
-        **_text_style,
+        **_text_style(),
     ).unsafe_ask()
 
     llm = {
@@ -135,20 +262,29 @@ def configure_yaml():
         "agent_pattern": agent_pattern,
     }
 
-    language = text("Language:", default=settings.language, **_text_style).unsafe_ask()
+    language = text(
+        "Language:", default=settings.language, **_text_style()
+    ).unsafe_ask()
     safe_mode = confirm(
         "Safe Mode:",
         default=settings.safe_mode,
-        **_text_style,
+        **_text_style(),
     ).unsafe_ask()
 
     file_name = get_or_create_settings_path()
 
+    # keep the settings that are not handled by this wizard
+    config = {}
+    if os.path.exists(file_name):
+        with open(file_name) as f:
+            config = yaml.safe_load(f) or {}
+    config["llm"] = {**config.get("llm", {}), **llm}
+
     with open(file_name, "w") as f:
         f.write(
             yaml.dump(
                 {
-                    "llm": llm,
+                    **config,
                     "language": language,
                     "safe_mode": safe_mode,
                 }
@@ -159,6 +295,8 @@ def configure_yaml():
 
 
 def input_model(provider: str, api_key: str, default_model: str | None = None):
+    from questionary import text, select
+
     try:
         match provider:
             case "ollama":
@@ -170,18 +308,20 @@ def input_model(provider: str, api_key: str, default_model: str | None = None):
                     message="Model:",
                     choices=model_list,
                     default=default_model if default_model in model_list else None,
-                    **_select_style,
+                    **_select_style(),
                 ).unsafe_ask()
             case "openai":
                 from openai import OpenAI
+                from shy_sh.agents.llms import get_base_urls
 
-                r = OpenAI(api_key=api_key).models.list()
+                base_url = get_base_urls(settings.llm)[0]
+                r = OpenAI(api_key=api_key, base_url=base_url).models.list()
                 model_list = [l.id for l in r.data]
                 return select(
                     message="Model:",
                     choices=model_list,
                     default=default_model if default_model in model_list else None,
-                    **_select_style,
+                    **_select_style(),
                 ).unsafe_ask()
             case "google":
                 from google.generativeai.client import glm
@@ -195,7 +335,7 @@ def input_model(provider: str, api_key: str, default_model: str | None = None):
                     message="Model:",
                     choices=model_list,
                     default=default_model if default_model in model_list else None,
-                    **_select_style,
+                    **_select_style(),
                 ).unsafe_ask()
             case "anthropic":
                 import requests
@@ -210,7 +350,7 @@ def input_model(provider: str, api_key: str, default_model: str | None = None):
                     message="Model:",
                     choices=model_list,
                     default=default_model if default_model in model_list else None,
-                    **_select_style,
+                    **_select_style(),
                 ).unsafe_ask()
             case "groq":
                 from groq import Client
@@ -221,7 +361,7 @@ def input_model(provider: str, api_key: str, default_model: str | None = None):
                     message="Model:",
                     choices=model_list,
                     default=default_model if default_model in model_list else None,
-                    **_select_style,
+                    **_select_style(),
                 ).unsafe_ask()
             case "aws":
                 from boto3 import client
@@ -240,9 +380,9 @@ def input_model(provider: str, api_key: str, default_model: str | None = None):
                     message="Model:",
                     choices=model_list,
                     default=default_model if default_model in model_list else None,
-                    **_select_style,
+                    **_select_style(),
                 ).unsafe_ask()
             case _:
                 raise ValueError("Invalid provider")
     except Exception:
-        return text(message="Model:", **_text_style).unsafe_ask()
+        return text(message="Model:", **_text_style()).unsafe_ask()
@@ -0,0 +1,95 @@
+import os
+import json
+import atexit
+from pathlib import Path
+from threading import Lock
+from collections import Counter
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # windows
+    fcntl = None
+
+STATS_FILE = Path("~/.config/shy/stats.json").expanduser()
+
+
+class Stats:
+    """
+    Persistent counters (tokens spent, cache hits, latencies...), the values
+    are kept in memory and added to the stats file when the process exits
+    """
+
+    def __init__(self, path=STATS_FILE):
+        self.path = path
+        self._pending = Counter()
+        self._lock = Lock()
+
+    def add(self, name: str, value: float = 1):
+        with self._lock:
+            self._pending[name] += value
+
+    def _load(self) -> dict:
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, Counter()
+        if not pending:
+            return
+        # the daemon children and the other shells flush the same file
+        with _file_lock(self.path):
+            values = Counter(self._load())
+            values.update(pending)
+            try:
+                tmp_file = self.path.with_suffix(f".{os.getpid()}.tmp")
+                with open(tmp_file, "w") as f:
+                    json.dump(dict(sorted(values.items())), f, indent=2)
+                os.replace(tmp_file, self.path)
+            except OSError:
+                pass
+
+    def values(self) -> dict:
+        values = Counter(self._load())
+        with self._lock:
+            values.update(self._pending)
+        return dict(sorted(values.items()))
+
+
+@contextmanager
+def _file_lock(path: Path):
+    lock = None
+    try:
+        os.makedirs(path.parent, exist_ok=True)
+        lock = open(path.with_suffix(".lock"), "a")
+        if fcntl is not None:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+    except OSError:
+        pass
+    try:
+        yield
+    finally:
+        if lock is not None:
+            lock.close()
+
+
+stats = Stats()
+atexit.register(stats.flush)
+
+
+def print_stats():
+    from rich import print
+    from rich.table import Table
+
+    values = stats.values()
+    if not values:
+        print("[bold yellow]No stats collected yet[/]")
+        return
+    table = Table("Stat", "Value", title=f"shy stats ({stats.path})")
+    for name, value in values.items():
+        table.add_row(name, f"{value:,.3f}".rstrip("0").rstrip("."))
+    print(table)
@@ -1,14 +1,19 @@
 import re
 import os
+import codecs
 import platform
 import subprocess
+from queue import Queue, Empty
+from threading import Thread, Timer
+from functools import lru_cache
+from contextvars import ContextVar
 from typing import Literal
-from tiktoken import get_encoding
-from rich.prompt import Prompt
-from rich.syntax import Syntax
-from langchain_core.messages import HumanMessage, ToolMessage, AIMessage
 from shy_sh.settings import settings
 
+# False while a tool runs in a parallel batch, the output is only captured
+# and the tools handler prints it when the tool is done
+live_output = ContextVar("live_output", default=True)
+
 try:
     import readline
 except Exception:
@@ -16,6 +21,7 @@ except Exception:
 
 
 RL_HISTORY_FILE = os.path.expanduser("~/.config/shy/.history")
+STOP_GRACE_SECONDS = 2
 
 
 def load_history():
@@ -40,6 +46,8 @@ def clear_history():
 
 
 def ask_confirm(explain=True, alternatives=False) -> Literal["y", "n", "c", "e", "a"]:
+    from rich.prompt import Prompt
+
     clear_history()
     choices = ["n", "c", "no", "copy"]
     if explain:
@@ -82,12 +90,32 @@ PRINT_THEMES = {
 
 
 def syntax(text: str, lexer: str = "console", theme: str = "response"):
-    return Syntax(
-        text,
-        lexer,
-        word_wrap=True,
-        **PRINT_THEMES.get(theme, {}),  # type: ignore
-    )
+    from rich.syntax import Syntax
+
+    return Syntax(text, get_lexer(lexer), word_wrap=True, **get_theme(theme))
+
+
+@lru_cache
+def get_lexer(name: str):
+    from pygments.lexers import get_lexer_by_name
+    from pygments.util import ClassNotFound
+
+    try:
+        return get_lexer_by_name(name, stripnl=False, ensurenl=True, tabsize=4)
+    except ClassNotFound:
+        return name
+
+
+@lru_cache
+def _get_syntax_theme(name: str):
+    from rich.syntax import Syntax, DEFAULT_THEME
+
+    return Syntax.get_theme(name or DEFAULT_THEME)
+
+
+def get_theme(theme: str):
+    options = PRINT_THEMES.get(theme, {})
+    return {**options, "theme": _get_syntax_theme(options.get("theme"))}
 
 
 def decode_output(process):
@@ -128,62 +156,210 @@ def run_shell(cmd: str):
     return decode_output(result)
 
 
-def run_pty(cmd: str):
+def run_pty(cmd: str, capture=None):
     import pty
+    import tty
+    import select
+    from shy_sh.capture import OutputCapture
 
     if cmd == "history" or cmd.startswith("history "):
-        return get_shell_history()
-    stdout = b""
+        return 0, get_shell_history()
+    capture = capture or OutputCapture.from_settings(cmd)
+    shell = detect_raw_shell()
+    pid, master_fd = pty.fork()
+    if pid == pty.CHILD:
+        os.execlp(shell, shell, "-c", cmd)
 
-    def read(fd):
-        nonlocal stdout
-        ret = os.read(fd, 1024)
-        stdout += ret
-        return ret
+    try:
+        mode = tty.tcgetattr(pty.STDIN_FILENO)
+        tty.setraw(pty.STDIN_FILENO)
+        restore = True
+    except tty.error:
+        restore = False
+
+    fds = [master_fd, pty.STDIN_FILENO]
+    stopped = False
+    try:
+        while True:
+            timeout = None if stopped else capture.remaining_time()
+            rfds, _, _ = select.select(fds, [], [], timeout)
+            if master_fd in rfds:
+                try:
+                    data = os.read(master_fd, 64 * 1024)
+                except OSError:
+                    data = b""
+                if not data:
+                    break
+                os.write(pty.STDOUT_FILENO, data)
+                capture.write(data)
+            if pty.STDIN_FILENO in rfds:
+                data = os.read(pty.STDIN_FILENO, 1024)
+                if not data:
+                    fds.remove(pty.STDIN_FILENO)
+                while data:
+                    data = data[os.write(master_fd, data) :]
+            if not stopped and capture.exceeded():
+                stopped = True
+                _stop_process_group(pid)
+    finally:
+        if restore:
+            tty.tcsetattr(pty.STDIN_FILENO, tty.TCSAFLUSH, mode)
+        os.close(master_fd)
+        capture.close()
+    _, status = os.waitpid(pid, 0)
+    return os.waitstatus_to_exitcode(status), capture.text()
+
+
+def _stop_process_group(pid: int):
+    import signal
+
+    sig = signal.SIGTERM
+    if settings.output.limit_action == "kill":
+        sig = signal.SIGKILL
+    try:
+        os.killpg(pid, sig)
+    except OSError:
+        return
+    if sig == signal.SIGTERM:
+        # the commands ignoring SIGTERM are killed after a grace period
+        timer = Timer(STOP_GRACE_SECONDS, _kill_process_group, (pid,))
+        timer.daemon = True
+        timer.start()
 
-    ret_code = pty.spawn([detect_raw_shell(), "-c", cmd], read)
-    return ret_code, decode_output2(stdout)
 
+def _kill_process_group(pid: int):
+    import signal
 
-def stream_shell(cmd: str):
-    if cmd == "history" or cmd.startswith("history "):
-        return get_shell_history()
-    result = subprocess.Popen(
-        cmd,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE,
-        shell=True,
-    )
-    while result.poll() is None:
-        chunk = b""
-        if result.stdout is not None and result.stdout.readable():
-            chunk += result.stdout.read(1)
-        yield decode_output2(chunk)
-    remaining = b""
-    if result.stdout is not None and result.stdout.readable():
-        remaining += result.stdout.read()
-    if result.stderr is not None and result.stderr.readable():
-        remaining += result.stderr.read()
-
-    if remaining:
-        yield decode_output2(remaining)
-
-
-def run_command(cmd: str):
-    if detect_shell() in ["powershell", "cmd"]:
-        result = ""
-        for chunk in stream_shell(cmd):
-            print(chunk, end="", flush=True)
-            result += chunk
-        result = result or "Exit code: 0"
+    try:
+        os.killpg(pid, signal.SIGKILL)
+    except OSError:
+        pass
+
+
+class _OutputDecoder:
+    """Incremental utf-8 decoder that falls back to the console code page"""
+
+    def __init__(self):
+        self._decoder = codecs.getincrementaldecoder("utf-8")()
+
+    def decode(self, data: bytes, final=False) -> str:
+        try:
+            return self._decoder.decode(data, final)
+        except UnicodeDecodeError:
+            # windows
+            import ctypes
+
+            pending, _ = self._decoder.getstate()
+            oemCP = ctypes.windll.kernel32.GetConsoleOutputCP()
+            self._decoder = codecs.getincrementaldecoder("cp" + str(oemCP))(
+                errors="replace"
+            )
+            return self._decoder.decode(pending + data, final)
+
+
+class ShellStream:
+    """
+    Run a command and iterate over its decoded output while it runs.
+    stdout and stderr are drained concurrently in large chunks so the child
+    never blocks on a full pipe, the chunks are yielded in arrival order.
+    """
+
+    CHUNK_SIZE = 64 * 1024
+
+    def __init__(self, cmd: str, capture=None, stdin=None):
+        self.cmd = cmd
+        self.capture = capture
+        self.stdin = stdin
+        self.returncode = None
+        self._process = None
+
+    def stop(self):
+        if not self._process or self._process.poll() is not None:
+            return
+        if os.name != "nt":
+            _stop_process_group(self._process.pid)
+        elif settings.output.limit_action == "kill":
+            self._process.kill()
+        else:
+            self._process.terminate()
+
+    def _pump(self, name, pipe, queue):
+        try:
+            while data := pipe.read1(self.CHUNK_SIZE):
+                queue.put((name, data))
+        finally:
+            queue.put((name, None))
+
+    def __iter__(self):
+        if self.cmd == "history" or self.cmd.startswith("history "):
+            self.returncode = 0
+            yield get_shell_history()
+            return
+
+        self._process = process = subprocess.Popen(
+            self.cmd,
+            stdin=self.stdin,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            shell=True,
+            start_new_session=os.name != "nt",
+        )
+        chunks = Queue()
+        decoders = {}
+        for name, pipe in (("stdout", process.stdout), ("stderr", process.stderr)):
+            decoders[name] = _OutputDecoder()
+            Thread(target=self._pump, args=(name, pipe, chunks), daemon=True).start()
+
+        stopped = False
+        while decoders:
+            timeout = None
+            if self.capture and not stopped:
+                timeout = self.capture.remaining_time()
+            try:
+                name, data = chunks.get(timeout=timeout)
+            except Empty:
+                name, data = None, b""
+            if self.capture and not stopped and self.capture.exceeded():
+                stopped = True
+                self.stop()
+            if name is None:
+                continue
+            if data is None:
+                text = decoders.pop(name).decode(b"", final=True)
+            else:
+                text = decoders[name].decode(data)
+            if text:
+                yield text
+        self.returncode = process.wait()
+
+
+def stream_shell(cmd: str, capture=None, stdin=None):
+    return ShellStream(cmd, capture, stdin)
+
+
+def run_command(cmd: str, capture=None):
+    from shy_sh.capture import OutputCapture
+
+    capture = capture or OutputCapture.from_settings(cmd)
+    live = live_output.get()
+    if detect_shell() in ["powershell", "cmd"] or not live:
+        stream = stream_shell(cmd, capture, None if live else subprocess.DEVNULL)
+        for chunk in stream:
+            if live:
+                print(chunk, end="", flush=True)
+            capture.write(chunk)
+        capture.close()
+        ret_code, result = stream.returncode, capture.text()
     else:
-        ret_code, result = run_pty(cmd)
-        result = result or f"Exit code: {ret_code}"
+        ret_code, result = run_pty(cmd, capture)
+    result = result or f"Exit code: {ret_code}"
+    if capture.limit_reason:
+        result += f"\n\n(Command stopped after {capture.limit_reason})"
     return result
 
 
-def run_python(file: str):
-    return run_command(f"python {file}")
+def run_python(file: str, capture=None):
+    return run_command(f"python {file}", capture)
 
 
 def detect_raw_shell():
@@ -208,15 +384,15 @@ def detect_os():
     return system
 
 
-def count_tokens(
-    messages: list, encoding_name: str = "o200k_base", offset: int = 2000
-) -> int:
-    text = "\n".join(msg.content for msg in messages)
-    encoding = get_encoding(encoding_name)
-    return len(encoding.encode(text)) + offset
+def count_tokens(messages: list, offset: int = 2000) -> int:
+    from shy_sh.agents.tokens import token_ledger
+
+    return token_ledger.total(messages, offset)
 
 
 def tools_to_human(messages):
+    from langchain_core.messages import HumanMessage, ToolMessage, AIMessage
+
     return [
         (
             HumanMessage(msg.content)
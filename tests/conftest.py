@@ -1,7 +1,11 @@
 import pytest
 from typer import Typer
 from typer.testing import CliRunner
-from shy_sh.main import exec as main
+from shy_sh.cli import exec as main
+from shy_sh.agents.response_cache import response_cache
+from shy_sh.stats import stats
+from shy_sh.sessions import session_store
+from shy_sh.agents import capabilities, llms, transport
 from tests.utils import mock_settings
 
 
@@ -43,6 +47,36 @@ def mock_app_settings(request):
     )
 
 
+@pytest.fixture(autouse=True)
+def mock_response_cache(mocker, tmp_path):
+    mocker.patch.object(response_cache, "directory", tmp_path / "responses")
+
+
+@pytest.fixture(autouse=True)
+def mock_stats(mocker, tmp_path):
+    mocker.patch.object(stats, "path", tmp_path / "stats.json")
+    mocker.patch.object(stats, "_pending", stats._pending.__class__())
+
+
+@pytest.fixture(autouse=True)
+def mock_session_store(mocker, tmp_path):
+    mocker.patch.object(session_store, "path", tmp_path / "sessions.db")
+    mocker.patch.object(session_store, "_db", None)
+    yield
+    session_store.close()
+
+
+@pytest.fixture(autouse=True)
+def mock_model_capabilities(mocker, tmp_path):
+    # never ask a local ollama server or connect to the providers
+    mocker.patch.object(capabilities, "MODELS_CACHE_FILE", tmp_path / "models.json")
+    mocker.patch.object(capabilities, "ollama_host", return_value="http://ollama")
+    mocker.patch.object(capabilities, "discover_ollama", return_value=None)
+    mocker.patch.object(llms, "_preload_ollama")
+    mocker.patch.object(transport.connection_pools, "warm_up")
+    capabilities._get_model_capabilities.cache_clear()
+
+
 @pytest.fixture(autouse=True)
 def mock_readline(mocker):
     mocker.patch("readline.set_history_length")
@@ -0,0 +1,126 @@
+import httpx
+from shy_sh.agents import capabilities
+from shy_sh.agents.capabilities import (
+    resolve_capabilities,
+    get_model_capabilities,
+    discover_ollama,
+)
+from shy_sh.settings import settings
+from shy_sh.agents import llms, transport
+from shy_sh.agents.llms import get_llm_context, get_output_reserve
+from shy_sh.agents.llms import _preload_ollama as preload_ollama
+from tests.utils import mock_settings
+
+OLLAMA_SHOW = {
+    "parameters": 'stop "<|eot_id|>"\nnum_predict 2048',
+    "model_info": {"general.architecture": "llama", "llama.context_length": 131072},
+}
+
+
+def test_resolve_capabilities():
+    assert resolve_capabilities("openai", "gpt-4o-mini").context == 128_000
+    assert resolve_capabilities("openai", "gpt-4-0613").context == 8192
+    assert resolve_capabilities("anthropic", "claude-3-5-sonnet-latest").context == (
+        200_000
+    )
+    caps = resolve_capabilities("aws", "us.anthropic.claude-3-7-sonnet-20250219-v1:0")
+    assert caps.max_output == 64_000
+    assert resolve_capabilities("groq", "llama-3.3-70b-versatile").context == 131_072
+    assert resolve_capabilities("ollama", "llama3:8b").context == 8192
+    assert resolve_capabilities("groq", "unknown").context == 8192
+    assert resolve_capabilities("google", "unknown").context == 32_768
+
+
+def test_settings_override():
+    mock_settings(
+        {"llm": {"provider": "openai", "name": "gpt-4o", "context_window": 50_000}}
+    )
+    caps = get_model_capabilities()
+    assert (caps.context, caps.max_output) == (50_000, 16_384)
+    assert get_llm_context() == 50_000
+    assert get_output_reserve() == 12_500
+
+
+def _mock_ollama(mocker):
+    def get(url, **kwargs):
+        return httpx.Response(
+            200,
+            json={"models": [{"name": "llama3.2:latest", "digest": "abc"}]},
+            request=httpx.Request("GET", url),
+        )
+
+    def post(url, **kwargs):
+        return httpx.Response(200, json=OLLAMA_SHOW, request=httpx.Request("POST", url))
+
+    return mocker.patch("httpx.get", side_effect=get), mocker.patch(
+        "httpx.post", side_effect=post
+    )
+
+
+def test_discover_ollama_is_cached_by_digest(mocker):
+    get, post = _mock_ollama(mocker)
+
+    caps = discover_ollama("llama3.2")
+    assert (caps.context, caps.max_output) == (131_072, 2048)
+    assert discover_ollama("llama3.2") == caps
+    assert get.call_count == 2
+    assert post.call_count == 1
+    assert discover_ollama("other") is None
+
+
+def test_ollama_capabilities(mocker):
+    _mock_ollama(mocker)
+    mocker.patch.object(capabilities, "discover_ollama", discover_ollama)
+    mock_settings({"llm": {"provider": "ollama", "name": "llama3.2"}})
+    # the large windows are opt-in on ollama
+    assert get_llm_context() == 8192
+    assert get_model_capabilities().max_output == 2048
+
+    mock_settings(
+        {
+            "llm": {"provider": "ollama", "name": "llama3.2"},
+            "ollama": {"num_ctx": 16384},
+        }
+    )
+    assert get_llm_context() == 16_384
+
+
+def test_ollama_options(mocker):
+    mock_settings(
+        {
+            "llm": {"provider": "ollama", "name": "llama3.2"},
+            "ollama": {"keep_alive": -1, "num_gpu": 0},
+        }
+    )
+    llm = llms._get_llm(settings.llm)
+    assert (llm.num_ctx, llm.keep_alive, llm.num_gpu) == (8192, -1, 0)
+    assert llm.num_thread is None
+
+
+def test_warm_up_model(mocker):
+    mock_settings({"llm": {"provider": "ollama", "name": "llama3.2"}})
+    mocker.patch.object(llms, "ollama_host", return_value="http://ollama")
+    client = mocker.patch.object(transport.connection_pools, "client")
+    mocker.patch.dict(llms._warm_up, {"started": False})
+
+    llms.warm_up_model()
+    assert llms.is_warmed_up()
+    llms._preload_ollama.assert_called_once()
+
+    preload_ollama()
+    client.assert_called_once_with("http://ollama")
+    client.return_value.post.assert_called_once_with(
+        "http://ollama/api/chat",
+        json={
+            "model": "llama3.2",
+            "messages": [],
+            "options": {"num_ctx": 8192},
+            "keep_alive": "30m",
+        },
+        timeout=120,
+    )
+
+
+def test_ollama_not_running(mocker):
+    mocker.patch("httpx.get", side_effect=httpx.ConnectError("refused"))
+    assert discover_ollama("llama3.2") is None
@@ -0,0 +1,75 @@
+import sys
+import pytest
+from shy_sh.capture import OutputCapture
+from shy_sh.utils import run_pty, stream_shell
+
+
+def _python(code):
+    return f'"{sys.executable}" -c "{code}"'
+
+
+def test_capture_keeps_head_and_tail():
+    capture = OutputCapture(head_bytes=10, tail_bytes=10)
+    for i in range(1000):
+        capture.write(f"line {i:04}\n")
+    assert len(capture.head) == 10
+    assert len(capture.tail) == 10
+    assert capture.total_lines == 1000
+    assert capture.dropped_bytes == 1000 * 10 - 20
+    text = capture.text()
+    assert text.startswith("line 0000\n")
+    assert text.endswith("line 0999\n")
+    assert "bytes, 998 lines not captured" in text
+
+
+def test_capture_without_drops_is_lossless():
+    capture = OutputCapture(head_bytes=4, tail_bytes=16)
+    capture.write("h\xe9llo")
+    capture.write(" w\xf6rld")
+    assert capture.dropped_bytes == 0
+    assert capture.text() == "h\xe9llo w\xf6rld"
+
+
+def test_capture_spill():
+    capture = OutputCapture(head_bytes=2, tail_bytes=2, spill=True)
+    capture.write(b"0123456789")
+    capture.close()
+    assert capture.entry.lines(1, 1) == ["0123456789"]
+
+
+def test_capture_limits():
+    capture = OutputCapture(max_bytes=5)
+    capture.write(b"12345")
+    assert not capture.exceeded()
+    capture.write(b"6")
+    assert "more than 5 bytes" in capture.exceeded()
+    assert OutputCapture(max_seconds=0).exceeded()
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="pty is not available")
+def test_run_pty_stops_endless_output():
+    capture = OutputCapture(head_bytes=100, tail_bytes=100, max_bytes=100_000)
+    ret_code, output = run_pty(
+        _python("while True: print('y' * 1000)"),
+        capture,
+    )
+    assert capture.limit_reason
+    assert ret_code != 0
+    assert len(output) < 1000
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="pty is not available")
+def test_run_pty_exit_code():
+    ret_code, output = run_pty(_python("print('hello'); exit(3)"))
+    assert ret_code == 3
+    assert output.strip() == "hello"
+
+
+def test_stream_shell_time_limit():
+    capture = OutputCapture(max_seconds=0.5)
+    stream = stream_shell(
+        _python("import time; print('start', flush=True); time.sleep(30)"), capture
+    )
+    assert "start" in "".join(stream)
+    assert capture.limit_reason
+    assert stream.returncode != 0
@@ -0,0 +1,111 @@
+import asyncio
+from langchain_core.messages import AIMessageChunk
+from shy_sh.stats import stats
+from shy_sh.agents.misc import parse_react_tool
+from shy_sh.agents.shy_agent.nodes import chatbot
+from tests.utils import mock_settings
+
+STATE = {
+    "timestamp": "",
+    "lang_spec": "",
+    "ask_before_execute": True,
+    "tools_instructions": "",
+    "few_shot_examples": [],
+    "history": [],
+    "tool_history": [],
+}
+DELTAS = ['{"tool": "shell", ', '"arg": "ls"}\nTool', " response:", " invented"]
+
+
+class _Chain:
+    def __init__(self, deltas):
+        self.deltas = deltas
+        self.sent = 0
+        self.closed = False
+
+    async def astream(self, _):
+        try:
+            for delta in self.deltas:
+                self.sent += 1
+                yield AIMessageChunk(content=delta)
+        finally:
+            self.closed = True
+
+
+def _run_chatbot(mocker, deltas):
+    chain = _Chain(deltas)
+    mocker.patch.object(chatbot, "shy_agent_chain", chain)
+    result = asyncio.run(chatbot.chatbot(STATE))
+    return chain, result["tool_history"][0]
+
+
+def test_chatbot_stops_after_tool_request(mocker):
+    chain, message = _run_chatbot(mocker, DELTAS)
+
+    assert chain.sent == 2
+    assert chain.closed
+    assert message.content == '{"tool": "shell", "arg": "ls"}'
+    assert parse_react_tool(message).arg == "ls"
+    values = stats.values()
+    assert values["react.early_stops"] == 1
+    assert values["react.tool_turns"] == 1
+
+
+def test_chatbot_without_early_stop(mocker):
+    mock_settings({"early_stop": False})
+    chain, message = _run_chatbot(mocker, DELTAS)
+
+    assert chain.sent == len(DELTAS)
+    assert message.content == "".join(DELTAS)
+    values = stats.values()
+    assert "react.early_stops" not in values
+    assert values["react.trailing_tokens"] > 0
+
+
+def test_chatbot_final_answer(mocker):
+    chain, message = _run_chatbot(mocker, ["All ", "done {not a tool}"])
+
+    assert chain.sent == 2
+    assert message.content == "All done {not a tool}"
+    assert "react.tool_turns" not in stats.values()
+
+
+def test_react_stop_sequences():
+    from shy_sh.agents.chains.shy_agent import _supports_stop
+
+    assert _supports_stop()
+    mock_settings({"llm": {"provider": "openai", "name": "o3-mini"}})
+    assert not _supports_stop()
+
+
+def test_chatbot_records_cached_tokens(mocker):
+    chain = _Chain([])
+    usage = {
+        "input_tokens": 100,
+        "output_tokens": 5,
+        "total_tokens": 105,
+        "input_token_details": {"cache_read": 80},
+    }
+
+    async def astream(_):
+        yield AIMessageChunk(content="done", usage_metadata=usage)
+
+    chain.astream = astream
+    mocker.patch.object(chatbot, "shy_agent_chain", chain)
+    asyncio.run(chatbot.chatbot(STATE))
+
+    values = stats.values()
+    assert values["llm.input_tokens"] == 100
+    assert values["llm.cache_read_tokens"] == 80
+
+
+def test_chatbot_records_time_to_first_token(mocker):
+    mocker.patch.dict(chatbot._first_request, {"done": False})
+    mocker.patch.object(chatbot, "is_warmed_up", return_value=True)
+    _run_chatbot(mocker, ["hello"])
+    _run_chatbot(mocker, ["hello"])
+
+    values = stats.values()
+    assert values["llm.ttft.calls"] == 2
+    assert values["llm.first_ttft.warm_up.calls"] == 1
+    assert "llm.first_ttft.cold.calls" not in values
@@ -1,4 +1,6 @@
+import sys
 import yaml
+import subprocess
 from tests.utils import mock_llm
 
 
@@ -8,6 +10,24 @@ def test_version(exec):
     assert result.stdout.startswith("Version: ")
 
 
+def test_version_does_not_load_agent():
+    result = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            "import sys; from shy_sh.main import main; sys.argv = ['shy', '--version']\n"
+            "try:\n    main()\nexcept SystemExit:\n    pass\n"
+            "print(sorted({m.split('.')[0] for m in sys.modules}))",
+        ],
+        capture_output=True,
+        text=True,
+    )
+    assert result.returncode == 0
+    loaded = result.stdout.splitlines()[-1]
+    for module in ["langchain_core", "langgraph", "tiktoken", "questionary"]:
+        assert f"'{module}'" not in loaded
+
+
 def test_question(exec, mocker):
     with mock_llm(mocker):
         result = exec("how are you")
@@ -0,0 +1,62 @@
+import os
+import sys
+import time
+import pytest
+import subprocess
+from shy_sh.settings import settings, _Settings
+from shy_sh.agents import llms
+from shy_sh.daemon import forward, is_supported, socket_path, _reload_settings
+
+pytestmark = pytest.mark.skipif(not is_supported(), reason="unix sockets only")
+
+
+@pytest.fixture
+def runtime_dir(tmp_path, monkeypatch):
+    os.chmod(tmp_path, 0o700)
+    monkeypatch.setenv("XDG_RUNTIME_DIR", str(tmp_path))
+    return tmp_path
+
+
+def test_forward_without_daemon(runtime_dir):
+    assert forward(["--version"]) is None
+
+
+def test_forward_to_daemon(runtime_dir):
+    daemon = subprocess.Popen(
+        [sys.executable, "-m", "shy_sh.main", "--daemon"],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        for _ in range(300):
+            if os.path.exists(socket_path()):
+                break
+            time.sleep(0.1)
+        read_fd, write_fd = os.pipe()
+        null = os.open(os.devnull, os.O_RDWR)
+        exit_code = forward(["--version"], (null, write_fd, null))
+        os.close(write_fd)
+        os.close(null)
+        with os.fdopen(read_fd) as f:
+            output = f.read()
+
+        assert exit_code == 0
+        assert output.startswith("Version: ")
+    finally:
+        daemon.terminate()
+        daemon.wait(10)
+    assert not os.path.exists(socket_path())
+
+
+def test_reload_settings_clears_the_llms(mocker):
+    mocker.patch.object(llms, "_get_llm", side_effect=lambda config: config.name)
+    assert llms.get_fallback_llms() == []
+    config = settings.model_dump()
+    config["llm"]["fallbacks"] = [{"provider": "openai", "name": "o3"}]
+    mocker.patch("shy_sh.settings.Settings", return_value=_Settings(**config))
+
+    _reload_settings()
+    assert llms.get_llm() == "test"
+    assert llms.get_fallback_llms() == ["o3"]
+    llms.get_llm.cache_clear()
+    llms.get_fallback_llms.cache_clear()
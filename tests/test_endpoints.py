@@ -0,0 +1,103 @@
+import time
+import asyncio
+from shy_sh.agents import llms
+from shy_sh.agents.endpoints import EndpointBalancer, balanced_clients, get_balancer
+from shy_sh.agents.transport import connection_pools
+from shy_sh.settings import settings
+from shy_sh.stats import stats
+from tests.utils import mock_settings, stub_server
+
+
+def _wait(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def test_least_outstanding():
+    balancer = EndpointBalancer(["http://a", "http://b", "http://c"])
+    a, b, c = [balancer.acquire() for _ in range(3)]
+    assert [a.url, b.url, c.url] == ["http://a", "http://b", "http://c"]
+    balancer.release(b)
+    assert balancer.acquire() is b
+    balancer.release(a)
+    balancer.release(c)
+    # the ties go to the next endpoint of the rotation
+    assert balancer.acquire() is c
+    assert balancer.acquire() is a
+
+
+def test_round_robin(mocker):
+    mock_settings({"endpoints": {"balancing": "round_robin"}})
+    mocker.patch.object(connection_pools, "_transports", {})
+    with stub_server() as a, stub_server() as b:
+        client = balanced_clients([f"{a.url}/v1", f"{b.url}/v1/"])["http_client"]
+        for _ in range(4):
+            client.post(f"{a.url}/v1/chat/completions", json={}).raise_for_status()
+        assert a.requests == b.requests == ["POST /v1/chat/completions"] * 2
+        assert a.connections == b.connections == 1
+
+    balancer = get_balancer((f"{a.url}/v1", f"{b.url}/v1/"))
+    assert [e.outstanding for e in balancer.endpoints] == [0, 0]
+    name = a.url.removeprefix("http://")
+    assert stats._pending[f"llm.endpoints.{name}.requests"] == 2
+    assert stats._pending[f"llm.endpoints.{name}.seconds"] > 0
+
+
+def test_ejection_and_recovery(mocker):
+    mock_settings({"endpoints": {"eject_after": 2, "health_check_interval": 0.01}})
+    mocker.patch.object(connection_pools, "_transports", {})
+    with stub_server() as a, stub_server(status=500) as b:
+        balancer = EndpointBalancer([a.url, b.url])
+        mocker.patch("shy_sh.agents.endpoints.get_balancer", return_value=balancer)
+        client = balanced_clients([a.url, b.url])["http_client"]
+        statuses = [client.get(f"{a.url}/models").status_code for _ in range(8)]
+        assert statuses.count(500) == 2
+        assert balancer.endpoints[1].ejected
+
+        b.status = 200
+        _wait(lambda: not balancer.endpoints[1].ejected)
+        name = b.url.removeprefix("http://")
+        assert stats._pending[f"llm.endpoints.{name}.ejections"] == 1
+        assert stats._pending[f"llm.endpoints.{name}.recoveries"] == 1
+
+
+def test_connection_error_moves_to_next_endpoint(mocker):
+    mocker.patch.object(connection_pools, "_transports", {})
+    with stub_server() as a:
+        client = balanced_clients(["http://127.0.0.1:1/v1", f"{a.url}/v1"])[
+            "http_client"
+        ]
+        for _ in range(2):
+            response = client.post("http://127.0.0.1:1/v1/chat/completions", json={})
+            assert response.status_code == 200
+        assert a.requests == ["POST /v1/chat/completions"] * 2
+    assert stats._pending["llm.endpoints.127.0.0.1:1.errors"] == 2
+
+
+def test_openai_base_urls(mocker):
+    mocker.patch.object(connection_pools, "_transports", {})
+    with stub_server() as a, stub_server() as b:
+        mock_settings(
+            {
+                "llm": {
+                    "provider": "openai",
+                    "name": "gpt-4o",
+                    "api_key": "k",
+                    "base_url": [a.url, b.url],
+                }
+            }
+        )
+        assert llms.get_llm_endpoints() == [a.url, b.url]
+        llm = llms._get_llm(settings.llm)
+        assert llm.invoke("hi").content == "ok"
+        assert asyncio.run(llm.ainvoke("hi")).content == "ok"
+        assert len(a.requests) == len(b.requests) == 1
+
+
+def test_single_base_url():
+    mock_settings({"llm": {"provider": "openai", "name": "gpt-4o", "api_key": "k"}})
+    assert llms.get_llm_endpoints() == [llms.OPENAI_BASE_URL]
+    settings.llm.base_url = "http://localhost:8080/v1"
+    assert llms._get_llm(settings.llm).openai_api_base == "http://localhost:8080/v1"
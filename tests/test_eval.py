@@ -1,3 +1,4 @@
+import asyncio
 import pytest
 import warnings
 from langchain_core.messages import HumanMessage, AIMessage, ToolMessage
@@ -41,7 +42,7 @@ def run_graph(graph):
             examples=run_few_shot_examples(),
             ask_before_execute=False,
         )
-        return graph.invoke(inputs)["tool_history"]
+        return asyncio.run(graph.ainvoke(inputs))["tool_history"]
 
     return _run
 
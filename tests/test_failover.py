@@ -0,0 +1,198 @@
+import asyncio
+import pytest
+from langchain_core.messages import AIMessageChunk, HumanMessage
+from langchain_core.runnables import Runnable
+from shy_sh.agents.chains import shy_agent
+from shy_sh.agents.failover import FailoverLLM, failover_reason
+from shy_sh.stats import stats
+from tests.utils import mock_settings
+
+
+class _StatusError(Exception):
+    def __init__(self, status_code):
+        self.status_code = status_code
+
+
+class _Model(Runnable):
+    """Streams `chunks` after `delay` seconds, or fails with `error`"""
+
+    def __init__(self, chunks=("a", "b"), delay=0.0, error=None, delays=None):
+        self.chunks = chunks
+        self.delays = list(delays or [delay])
+        self.error = error
+        self.calls = 0
+        self.closed = 0
+
+    def invoke(self, input, config=None, **kwargs):
+        if self.error:
+            raise self.error
+        return AIMessageChunk(content="".join(self.chunks))
+
+    async def astream(self, input, config=None, **kwargs):
+        delay = self.delays[min(self.calls, len(self.delays) - 1)]
+        self.calls += 1
+        try:
+            await asyncio.sleep(delay)
+            if self.error:
+                raise self.error
+            for chunk in self.chunks:
+                yield AIMessageChunk(content=chunk)
+        finally:
+            self.closed += 1
+
+
+def _stream(llm):
+    async def run():
+        return [chunk.content async for chunk in llm.astream("hi")]
+
+    return asyncio.run(run())
+
+
+def test_failover_reason():
+    assert failover_reason(_StatusError(429)) == "rate_limit"
+    assert failover_reason(_StatusError(503)) == "server_error"
+    assert failover_reason(ConnectionRefusedError()) == "connection"
+    assert failover_reason(_StatusError(400)) is None
+    assert failover_reason(ValueError()) is None
+
+
+def test_first_token_deadline():
+    mock_settings({"failover": {"first_token_timeout": 0.05}})
+    primary, fallback = _Model(("slow",), delay=5), _Model(("fast",))
+    llm = FailoverLLM([("primary", primary), ("fallback", fallback)])
+
+    assert _stream(llm) == ["fast"]
+    assert primary.closed == 1
+    assert stats._pending["llm.failovers"] == 1
+    assert stats._pending["llm.failovers.deadline"] == 1
+
+
+def test_no_deadline_on_the_last_model():
+    mock_settings({"failover": {"first_token_timeout": 0.01}})
+    llm = FailoverLLM([("primary", _Model(("slow",), delay=0.1))])
+    assert _stream(llm) == ["slow"]
+    assert stats._pending["llm.failovers"] == 0
+
+
+@pytest.mark.parametrize(
+    "error, reason",
+    [
+        (_StatusError(429), "rate_limit"),
+        (_StatusError(500), "server_error"),
+        (ConnectionError(), "connection"),
+    ],
+)
+def test_failover_on_errors(error, reason):
+    llm = FailoverLLM([("primary", _Model(error=error)), ("fallback", _Model(("ok",)))])
+    assert _stream(llm) == ["ok"]
+    assert llm.invoke("hi").content == "ok"
+    assert stats._pending[f"llm.failovers.{reason}"] == 2
+
+
+def test_no_first_token_timeout():
+    mock_settings({"failover": {"first_token_timeout": None}})
+    llm = FailoverLLM(
+        [
+            ("primary", _Model(error=_StatusError(429))),
+            ("fallback", _Model(("slow",), delay=0.05)),
+            ("last", _Model(("last",))),
+        ]
+    )
+    assert _stream(llm) == ["slow"]
+    assert stats._pending["llm.failovers.rate_limit"] == 1
+
+    mock_settings({"failover": {"first_token_timeout": None, "hedge_after": 0.02}})
+    primary, fallback = _Model(("primary",), delay=0.1), _Model(("hedge",), delay=5)
+    llm = FailoverLLM([("primary", primary), ("fallback", fallback)])
+    assert _stream(llm) == ["primary"]
+    assert stats._pending["llm.hedges"] == 1
+    assert stats._pending["llm.failovers.deadline"] == 0
+
+
+def test_errors_without_failover():
+    llm = FailoverLLM(
+        [("primary", _Model(error=_StatusError(400))), ("fallback", _Model())]
+    )
+    with pytest.raises(_StatusError):
+        _stream(llm)
+    llm = FailoverLLM([("primary", _Model(error=_StatusError(429)))])
+    with pytest.raises(_StatusError):
+        _stream(llm)
+    assert stats._pending["llm.failovers"] == 0
+
+
+def test_hedged_request():
+    mock_settings({"failover": {"hedge_after": 0.05}})
+    # the duplicate of the same model answers first
+    model = _Model(("answer",), delays=[5, 0])
+    assert _stream(FailoverLLM([("primary", model)])) == ["answer"]
+    assert model.calls == model.closed == 2
+    assert stats._pending["llm.hedges"] == 1
+    assert stats._pending["llm.hedge_wins"] == 1
+
+
+def test_hedge_loses():
+    mock_settings({"failover": {"hedge_after": 0.02}})
+    primary, fallback = _Model(("primary",), delay=0.1), _Model(("hedge",), delay=5)
+    llm = FailoverLLM([("primary", primary), ("fallback", fallback)])
+    assert _stream(llm) == ["primary"]
+    assert fallback.closed == 1
+    assert stats._pending["llm.hedges"] == 1
+    assert stats._pending["llm.hedge_wins"] == 0
+
+
+def test_early_close_closes_the_stream():
+    primary = _Model(("a", "b", "c"))
+    llm = FailoverLLM([("primary", primary), ("fallback", _Model())])
+
+    async def run():
+        chunks = llm.astream("hi")
+        first = await anext(chunks)
+        await chunks.aclose()
+        return first.content
+
+    assert asyncio.run(run()) == "a"
+    assert primary.closed == 1
+
+
+def test_agent_chain_fallbacks(mocker):
+    mock_settings(
+        {
+            "llm": {
+                "provider": "anthropic",
+                "name": "claude-sonnet-4",
+                "agent_pattern": "react",
+                "fallbacks": [
+                    {"provider": "openai", "name": "o3"},
+                    {"provider": "anthropic", "name": "claude-3-5-haiku"},
+                ],
+            }
+        }
+    )
+    llms = [mocker.MagicMock(name=n) for n in ("primary", "openai", "haiku")]
+    mocker.patch.object(shy_agent, "get_llm", return_value=llms[0])
+    mocker.patch.object(shy_agent, "get_fallback_llms", return_value=llms[1:])
+
+    llm = shy_agent._agent_llm()
+    assert isinstance(llm, FailoverLLM)
+    assert [name for name, _ in llm.entries] == [
+        "anthropic:claude-sonnet-4",
+        "openai:o3",
+        "anthropic:claude-3-5-haiku",
+    ]
+    # o3 rejects the stop sequences
+    llms[1].bind.assert_not_called()
+    llms[2].bind.assert_called_once_with(stop=shy_agent.REACT_STOP_SEQUENCES)
+    assert llm.entries[1][1].first is shy_agent._without_cache_control
+    assert llm.entries[2][1] is llms[2].bind.return_value
+
+
+def test_cache_control_is_removed_for_other_providers():
+    mock_settings({"llm": {"provider": "anthropic", "name": "claude"}})
+    messages = shy_agent._with_cache_breakpoints(
+        [HumanMessage("a"), HumanMessage("b")], {1}
+    )
+    assert messages[1].content[0]["cache_control"]
+    stripped = shy_agent._without_cache_control.invoke(messages)
+    assert stripped[0] is messages[0]
+    assert stripped[1].content == [{"type": "text", "text": "b"}]
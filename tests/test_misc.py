@@ -0,0 +1,74 @@
+import os
+import pytest
+from shy_sh.agents import misc
+from langchain_core.messages import AIMessage
+from shy_sh.agents.misc import run_few_shot_examples, parse_react_tool, has_tool_calls
+from tests.utils import mock_settings
+
+
+@pytest.fixture
+def repo(tmp_path, mocker, monkeypatch):
+    mocker.patch.object(misc, "PROBES_CACHE_FILE", tmp_path / "cache" / "probes.json")
+    mocker.patch.object(misc, "_warm_up_llm")
+    (tmp_path / "repo" / ".git").mkdir(parents=True)
+    (tmp_path / "repo" / ".git" / "HEAD").write_text("ref: refs/heads/main")
+    monkeypatch.chdir(tmp_path / "repo")
+    return tmp_path / "repo"
+
+
+def test_few_shot_examples_are_cached(repo, mocker):
+    run_shell = mocker.patch.object(misc, "run_shell", side_effect=lambda x: x)
+    first = run_few_shot_examples()
+    second = run_few_shot_examples()
+
+    assert run_shell.call_count == 2
+    assert [m.content for m in first] == [m.content for m in second]
+    assert "Tool response:\npwd" in [m.content for m in second]
+
+
+def test_few_shot_examples_cache_invalidation(repo, mocker):
+    run_shell = mocker.patch.object(misc, "run_shell", side_effect=lambda x: x)
+    run_few_shot_examples()
+    head = repo / ".git" / "HEAD"
+    head.write_text("ref: refs/heads/other")
+    os.utime(head, ns=(0, 0))
+    run_few_shot_examples()
+
+    assert run_shell.call_count == 4
+
+
+def test_few_shot_examples_extra_probes(repo, mocker):
+    mock_settings(
+        {
+            "llm": {"provider": "ollama", "name": "test"},
+            "bootstrap": {"extra_probes": [{"arg": "ls", "cache": False}]},
+        }
+    )
+    run_shell = mocker.patch.object(misc, "run_shell", side_effect=lambda x: x)
+    run_few_shot_examples()
+    examples = run_few_shot_examples()
+
+    assert run_shell.call_count == 4
+    assert "Tool response:\nls" in [m.content for m in examples]
+
+
+def test_react_tool_is_parsed_once(mocker):
+    parse = mocker.spy(misc, "_parse_react_tool_content")
+    message = AIMessage(content='{"tool": "shell", "arg": "ls", "thoughts": "list"}')
+
+    assert has_tool_calls(message)
+    assert parse_react_tool(message).arg == "ls"
+    assert parse.call_count == 1
+    assert message.additional_kwargs["react_tool"]["tool"] == "shell"
+
+    message = AIMessage(content="Just text")
+    assert not has_tool_calls(message)
+    assert not has_tool_calls(message)
+    assert parse.call_count == 2
+
+
+def test_react_tool_fallbacks():
+    message = AIMessage(content='{"tool": "shell", "arg": "grep \\d+ file"}')
+    assert parse_react_tool(message).arg == "grep \\d+ file"
+    message = AIMessage(content='{"tool": "shell", "arg": "echo }"} oops }')
+    assert parse_react_tool(message).arg == "echo }"
@@ -0,0 +1,70 @@
+from shy_sh.agents import output
+from shy_sh.agents.output import reduce_output, tool_output_budget
+
+
+class _CharsTokenizer:
+    def count(self, text):
+        return len(text) // 4
+
+
+def _patch_tokenizer(mocker):
+    mocker.patch.object(output, "get_tokenizer", return_value=_CharsTokenizer())
+
+
+def test_reduce_output_keeps_short_output(mocker):
+    _patch_tokenizer(mocker)
+    text = "hello\nworld\n"
+    assert reduce_output(text, 1000) is text
+
+
+def test_reduce_output_collapses_similar_lines(mocker):
+    _patch_tokenizer(mocker)
+    lines = [
+        f"src/file{i}.c:{i * 7}: warning: unused variable 'v{i}'" for i in range(5000)
+    ]
+    lines.insert(2500, "src/main.c:10: error: expected ';' before '}' token")
+    text = "\n".join(["make all", *lines, "make: *** [all] Error 1"])
+
+    reduced = reduce_output(text, 1000)
+
+    assert len(reduced) // 4 <= 1000
+    assert reduced.startswith("make all\nsrc/file0.c:0: warning")
+    assert "error: expected ';'" in reduced
+    assert "make: *** [all] Error 1" in reduced
+    assert "similar lines" in reduced
+    assert "repeated lines collapsed" in reduced
+    assert reduce_output(text, 1000) == reduced
+
+
+def test_reduce_output_keeps_head_and_tail(mocker):
+    _patch_tokenizer(mocker)
+    words = ["".join(chr(97 + int(d)) for d in str(i)) for i in range(10000)]
+    text = "\n".join(f"{i} {word * 10}" for i, word in enumerate(words))
+
+    reduced = reduce_output(text, 2000)
+
+    assert len(reduced) // 4 <= 2000
+    assert reduced.startswith("0 aaaa")
+    assert reduced.splitlines()[-3] == "9999 " + "jjjj" * 10
+    assert "lines omitted" in reduced
+
+
+def test_reduce_output_shortens_long_lines(mocker):
+    _patch_tokenizer(mocker)
+    text = "x" * 1_000_000
+
+    reduced = reduce_output(text, 500)
+
+    assert len(reduced) // 4 <= 500
+    assert "chars)..." in reduced
+
+
+def test_tool_output_budget(mocker):
+    mocker.patch.object(output, "get_llm_context", return_value=100_000)
+    mocker.patch.object(output, "get_output_reserve", return_value=2000)
+    mocker.patch.object(output.token_ledger, "total", return_value=90_000)
+    assert tool_output_budget({"history": [], "tool_history": []}) == 5000
+    output.token_ledger.total.return_value = 1000
+    assert tool_output_budget({"history": [], "tool_history": []}) == 25000
+    output.token_ledger.total.return_value = 200_000
+    assert tool_output_budget({"history": [], "tool_history": []}) == 500
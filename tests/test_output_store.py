@@ -0,0 +1,112 @@
+import sys
+import pytest
+from shy_sh.capture import OutputCapture
+from shy_sh.output_store import OutputStore
+from shy_sh.agents.tools.read_output import read_output
+from shy_sh.utils import run_pty
+from tests.utils import mock_settings
+
+STATE = {
+    "timestamp": "",
+    "lang_spec": "",
+    "ask_before_execute": True,
+    "tools_instructions": None,
+    "few_shot_examples": [],
+    "history": [],
+    "tool_history": [],
+}
+
+
+def _store_lines(store, n):
+    entry = store.create("seq")
+    data = "".join(f"line {i}\r\n" for i in range(1, n + 1)).encode()
+    # split the writes in the middle of lines
+    for i in range(0, len(data), 7):
+        entry.write(data[i : i + 7])
+    entry.finish()
+    return entry
+
+
+def test_output_entry_lines():
+    entry = _store_lines(OutputStore(), 1000)
+    assert entry.id == "out-1"
+    assert entry.line_count == 1000
+    assert entry.lines(1, 2) == ["line 1", "line 2"]
+    assert entry.lines(999, 2000) == ["line 999", "line 1000"]
+    assert entry.lines(1001, 1002) == []
+
+
+def test_output_entry_grep():
+    entry = _store_lines(OutputStore(), 1000)
+    assert entry.grep(r"line 99\b") == [(99, "line 99")]
+    assert [n for n, _ in entry.grep(r"^line 5", max_matches=3)] == [5, 50, 51]
+
+
+def test_output_entry_without_final_newline():
+    entry = OutputStore().create()
+    entry.write(b"first\nlast")
+    assert entry.line_count == 2
+    assert entry.lines(2, 2) == ["last"]
+
+
+def test_store_evicts_least_recently_used(mocker):
+    mock_settings({"output": {"store_max_entries": 3, "store_max_bytes": 1000}})
+    store = OutputStore()
+    first, second, third = [_store_lines(store, 10) for _ in range(3)]
+    store.get(first.id)
+    fourth = _store_lines(store, 10)
+    assert store.ids() == [third.id, first.id, fourth.id]
+    assert second._file.closed
+    assert fourth.id == "out-4"
+
+    # the commands still running are never evicted
+    running = store.create("yes")
+    running.write(b"y\n" * 600)
+    store.trim()
+    assert store.ids() == [running.id]
+    assert running.lines(1, 1) == ["y"]
+
+    store.close()
+    assert store.ids() == []
+    assert running._file.closed and running._mmap is None
+
+
+def test_entry_remap_closes_previous_map():
+    entry = OutputStore().create()
+    entry.write(b"a\n")
+    first_map = entry._map()
+    entry.write(b"b\n")
+    assert entry.lines(2, 2) == ["b"]
+    assert first_map.closed
+
+
+def test_capture_spills_to_store(mocker):
+    store = OutputStore()
+    mocker.patch("shy_sh.capture.output_store", store)
+    capture = OutputCapture(head_bytes=10, tail_bytes=10, spill=True, command="seq")
+    capture.write("".join(f"{i}\n" for i in range(10000)))
+    capture.close()
+    entry = store.get(capture.output_id)
+    assert entry.command == "seq"
+    assert entry.lines(5000, 5000) == ["4999"]
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="pty is not available")
+def test_read_output_tool(mocker):
+    budget = mocker.patch(
+        "shy_sh.agents.tools.read_output.tool_output_budget", return_value=100_000
+    )
+    capture = OutputCapture.from_settings()
+    run_pty(f'"{sys.executable}" -c "for i in range(500): print(i)"', capture)
+    id = capture.output_id
+
+    result = read_output.invoke({"arg": f"{id} 10-12", "state": STATE})
+    assert result == f"{id} has 500 lines\n10: 9\n11: 10\n12: 11"
+    budget.assert_called_once_with(STATE)
+    result = read_output.invoke({"arg": f"{id} grep ^49", "state": STATE})
+    assert result.splitlines()[1:] == [
+        "50: 49",
+        *[f"{n + 1}: {n}" for n in range(490, 500)],
+    ]
+    result = read_output.invoke({"arg": "out-0", "state": STATE})
+    assert result.startswith("Output not found")
@@ -0,0 +1,161 @@
+import time
+import asyncio
+import pytest
+from langchain_core.messages import AIMessage, ToolMessage
+from shy_sh.settings import settings
+from shy_sh.agents.tools.parallel import is_read_only_command
+from shy_sh.agents.shy_agent.nodes import tools_handler as handler
+
+
+def _state(*calls, ask_before_execute=True):
+    message = AIMessage(
+        content="",
+        tool_calls=[
+            {"name": name, "args": {"arg": arg}, "id": f"call_{i}"}
+            for i, (name, arg) in enumerate(calls)
+        ],
+    )
+    return {
+        "timestamp": "",
+        "lang_spec": "",
+        "ask_before_execute": ask_before_execute,
+        "tools_instructions": None,
+        "few_shot_examples": [],
+        "history": [],
+        "tool_history": [message],
+    }
+
+
+@pytest.mark.parametrize(
+    "cmd",
+    [
+        "ls -la",
+        "git status",
+        "df -h | sort -k 5",
+        "pwd && whoami",
+        "find . -name '*.py'",
+        "uniq -c a.txt",
+        "sort -u a.txt",
+        "tail -n 20 log",
+        "git log --oneline",
+        "date +%s",
+        "rg foo",
+        "git remote -v",
+        "sort -- a.txt",
+    ],
+)
+def test_read_only_commands(cmd):
+    assert is_read_only_command(cmd)
+
+
+@pytest.mark.parametrize(
+    "cmd",
+    [
+        "rm -rf build",
+        "ls > files.txt",
+        "echo $(rm x)",
+        "find . -delete",
+        "git commit -m x",
+        "git remote add origin x",
+        "tail -f log",
+        "sleep 10 &",
+        "ls; rm x",
+        "vim file",
+        "FOO=1 ls",
+        "env rm -rf build",
+        "ls\nrm x",
+        "ls\rrm x",
+        "cat <(rm x)",
+        "diff <(ls) >(rm x)",
+        "uniq a.txt b.txt",
+        "sort --output=x a",
+        "sort -ro x a",
+        "tail --follow=name log",
+        "tail -nF 10 log",
+        "tree -o out",
+        "git diff --output=x",
+        "git log --output x",
+        "git show --output=x HEAD",
+        "find . -fls out",
+        "find . -fprint0 out",
+        "rg --pre ./script foo",
+        "rg --pre-glob '*.pdf' foo",
+        "date -s 2020-01-01",
+        "date --set=2020-01-01",
+        "sort --compress-program=sh a",
+        "sort --compress-prog sh a",
+        "sort --out=x a",
+        "hostname",
+        "hostname evil",
+        "hostname -F /tmp/x",
+        "git remote update",
+        "git remote set-head origin -a",
+        "git remote set-branches origin main",
+    ],
+)
+def test_not_read_only_commands(cmd):
+    assert not is_read_only_command(cmd)
+
+
+def test_batches():
+    settings.llm.agent_pattern = "function_call"
+    calls = _state(
+        ("shell", "ls"),
+        ("shell_history", ""),
+        ("shell", "mkdir x"),
+        ("shell", "pwd"),
+    )["tool_history"][0].tool_calls
+    assert [[c["id"] for c in b] for b in handler._batches(calls)] == [
+        ["call_0", "call_1"],
+        ["call_2"],
+        ["call_3"],
+    ]
+
+
+def test_parallel_calls_run_concurrently(mocker):
+    settings.llm.agent_pattern = "function_call"
+
+    def slow_invoke(t_call, state):
+        time.sleep(0.5)
+        return ToolMessage(t_call["args"]["arg"], tool_call_id=t_call["id"])
+
+    mocker.patch.object(handler, "_invoke", side_effect=slow_invoke)
+    state = _state(("shell", "ls"), ("shell", "pwd"), ("shell", "df -h"))
+    confirm = mocker.patch.object(handler, "ask_confirm", return_value="y")
+
+    start = time.monotonic()
+    result = asyncio.run(handler.tools_handler(state))
+
+    assert time.monotonic() - start < 1.2
+    assert confirm.call_count == 1
+    assert [(m.tool_call_id, m.content) for m in result["tool_history"]] == [
+        ("call_0", "ls"),
+        ("call_1", "pwd"),
+        ("call_2", "df -h"),
+    ]
+
+
+def test_parallel_calls_denied(mocker):
+    settings.llm.agent_pattern = "function_call"
+    invoke = mocker.patch.object(handler, "_invoke")
+    mocker.patch.object(handler, "ask_confirm", return_value="n")
+    state = _state(("shell", "ls"), ("shell", "pwd"), ("shell", "rm x"))
+
+    result = asyncio.run(handler.tools_handler(state))
+
+    assert invoke.call_count == 0
+    assert [m.content for m in result["tool_history"]] == [
+        "Command interrupted by the user"
+    ] * 3
+
+
+def test_parallel_shell_output(mocker, capfd):
+    settings.llm.agent_pattern = "function_call"
+    state = _state(("shell", "echo first"), ("shell", "echo second"))
+    state["history"] = [AIMessage(content="task")]
+
+    result = asyncio.run(handler.tools_handler({**state, "ask_before_execute": False}))
+
+    assert [m.content.strip() for m in result["tool_history"]] == ["first", "second"]
+    out = capfd.readouterr().out
+    assert out.index("echo first") < out.index("echo second")
@@ -0,0 +1,83 @@
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+from shy_sh.agents.chains.shy_agent import _cache_friendly_prompt
+from shy_sh.agents import misc
+from shy_sh.agents.misc import get_probes, run_few_shot_examples
+from tests.utils import mock_settings
+
+
+def _inputs(timestamp, history):
+    return {
+        "timestamp": timestamp,
+        "lang_spec": "",
+        "ask_before_execute": True,
+        "tools_instructions": "- shell",
+        "few_shot_examples": [HumanMessage("check"), AIMessage("All set!")],
+        "history": history,
+        "tool_history": [],
+    }
+
+
+def test_prompt_prefix_is_stable():
+    first = _cache_friendly_prompt.invoke(
+        _inputs("2024-01-01 10:00", [HumanMessage("list files")])
+    )
+    second = _cache_friendly_prompt.invoke(
+        _inputs(
+            "2024-01-01 10:05",
+            [HumanMessage("list files"), AIMessage("done"), HumanMessage("again")],
+        )
+    )
+
+    assert isinstance(first[0], SystemMessage)
+    assert "{timestamp}" not in first[0].content
+    assert "2024" not in first[0].content
+    assert first[:3] == second[:3]
+    assert first[3].content == (
+        "Context: the current date and time is 2024-01-01 10:00.\n\nlist files"
+    )
+    assert len(first) == 4
+    assert second[3:5] == [HumanMessage("list files"), AIMessage("done")]
+    assert second[5].content.startswith("Context: the current date and time is")
+    assert second[5].content.endswith("10:05.\n\nagain")
+
+
+def test_anthropic_cache_breakpoints():
+    mock_settings({"llm": {"provider": "anthropic", "name": "claude"}})
+    messages = _cache_friendly_prompt.invoke(
+        _inputs("2024-01-01 10:00", [HumanMessage("list files")])
+    )
+
+    marked = [i for i, m in enumerate(messages) if isinstance(m.content, list)]
+    assert marked == [0, 2, 3]
+    assert messages[3].content == [
+        {
+            "type": "text",
+            "text": "Context: the current date and time is 2024-01-01 10:00.\n\n"
+            "list files",
+            "cache_control": {"type": "ephemeral"},
+        }
+    ]
+
+
+@pytest.mark.parametrize("agent_pattern", ["react", "function_call"])
+def test_probe_outputs_are_sent_with_the_question(mocker, agent_pattern):
+    mock_settings(
+        {"llm": {"provider": "ollama", "name": "test", "agent_pattern": agent_pattern}}
+    )
+    actions = get_probes()
+
+    def prompt(cwd):
+        mocker.patch.object(misc, "run_probes", return_value=[cwd, "main"])
+        inputs = _inputs("2024-01-01 10:00", [HumanMessage("list files")])
+        inputs["few_shot_examples"] = run_few_shot_examples()
+        return _cache_friendly_prompt.invoke(inputs)
+
+    first, second = prompt("/home/a"), prompt("/home/b")
+    examples = len(actions) * 2 + 2
+    assert first[: examples + 1] == second[: examples + 1]
+    assert "/home" not in str([m.content for m in first[: examples + 1]])
+    question = first[-1].content
+    assert f"$ {actions[0]['arg']}\n/home/a\n" in question
+    assert question.endswith("main\n\nlist files")
+    assert isinstance(first[-2], AIMessage)
@@ -0,0 +1,46 @@
+from rich.console import Console
+from shy_sh.render import StreamSyntax, StreamRenderer
+from shy_sh.utils import syntax
+
+
+def _render(renderable):
+    console = Console(width=60, force_terminal=True, color_system="truecolor")
+    with console.capture() as capture:
+        console.print(renderable)
+    return capture.get()
+
+
+def test_stream_syntax_matches_full_highlight():
+    code = "import os\n\nfor f in os.listdir('.'):\n    print(f)  # files\n"
+    stream = StreamSyntax("", "python", "command")
+    for i in range(1, len(code) + 1, 3):
+        stream.code = code[:i]
+        assert _render(stream) == _render(syntax(code[:i], "python", "command"))
+    stream.code = code
+    assert _render(stream) == _render(syntax(code, "python", "command"))
+
+
+def test_stream_renderer_coalesces_frames(mocker):
+    mocker.patch("shy_sh.render.monotonic", return_value=100.0)
+    renderer = StreamRenderer(prefix="🤖: ", max_fps=1)
+    refresh = mocker.spy(renderer, "refresh")
+    with renderer:
+        for delta in ["hello", " ", "world"]:
+            renderer.write(delta)
+
+    assert refresh.call_count == 2
+    assert renderer.text == "hello world"
+
+
+def test_stream_renderer_exact_final_highlight(mocker):
+    mocker.patch("shy_sh.render.monotonic", side_effect=range(1000))
+    code = 'x = """\nfor i in range(3):\n    import os\n"""\nprint(x)\n'
+    renderer = StreamRenderer(lexer="python", theme="command", max_fps=1)
+    with renderer:
+        for line in code.splitlines(keepends=True):
+            renderer.write(line)
+
+    full = syntax(code, "python", "command")
+    stream = renderer._syntax
+    assert stream.highlight(code).spans == full.highlight(code).spans
+    assert _render(stream) == _render(full)
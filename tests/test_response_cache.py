@@ -0,0 +1,55 @@
+import os
+from time import time
+from shy_sh.settings import settings
+from shy_sh.agents.chains.explain import explain_chain
+from shy_sh.agents.response_cache import response_cache
+from tests.utils import mock_llm
+
+INPUTS = {
+    "task": "extract an archive",
+    "script_type": "shell command",
+    "script": "tar -xzvf archive.tar.gz",
+    "lang_spec": "",
+}
+
+
+def _explain(timestamp="2024-01-01 10:00"):
+    return "".join(explain_chain.stream({**INPUTS, "timestamp": timestamp}))
+
+
+def test_response_cache_hit(mocker):
+    settings.llm.temperature = 0.0
+    with mock_llm(mocker, ["first", "second"]):
+        assert _explain() == "first"
+        assert _explain("2024-02-02 12:00") == "first"
+        settings.language = "italian"
+        assert _explain() == "second"
+
+
+def test_response_cache_bypassed_with_temperature(mocker):
+    with mock_llm(mocker, ["first", "second", "third"]):
+        assert _explain() == "first"
+        assert _explain() == "second"
+        settings.response_cache.force = True
+        assert _explain() == "third"
+        assert _explain() == "third"
+
+
+def test_response_cache_ttl(mocker):
+    response_cache.put("key", "response")
+    assert response_cache.get("key") == "response"
+    mocker.patch("shy_sh.agents.response_cache.time", return_value=time() + 10**8)
+    assert response_cache.get("key") is None
+    assert not os.path.exists(response_cache.directory / "key.json")
+
+
+def test_response_cache_evicts_least_recently_used():
+    settings.response_cache.max_bytes = 300
+    for i in range(3):
+        response_cache.put(f"key{i}", "x" * 50)
+        path = response_cache.directory / f"key{i}.json"
+        os.utime(path, (i, i))
+    response_cache.get("key0")
+    response_cache.put("key3", "x" * 50)
+    assert response_cache.get("key1") is None
+    assert [response_cache.get(f"key{i}") for i in (0, 2, 3)] == ["x" * 50] * 3
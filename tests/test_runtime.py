@@ -0,0 +1,110 @@
+import os
+import time
+import signal
+import asyncio
+import threading
+import pytest
+from langchain_core.messages import AIMessage
+from shy_sh.agents.shy_agent import agent
+from shy_sh.agents.shy_agent.runtime import runtime, run_in_main_thread
+
+
+def _interrupt_main_after(seconds):
+    threading.Timer(seconds, os.kill, (os.getpid(), signal.SIGINT)).start()
+
+
+def test_runtime_runs_blocking_calls_on_main_thread():
+    async def main():
+        assert threading.current_thread() is not threading.main_thread()
+        return await run_in_main_thread(threading.current_thread)
+
+    assert runtime.run(main()) is threading.main_thread()
+    assert not runtime.active
+
+
+@pytest.mark.skipif(os.name == "nt", reason="SIGINT can't be sent")
+def test_runtime_cancels_on_ctrl_c():
+    cancelled = threading.Event()
+
+    async def main():
+        try:
+            await asyncio.sleep(30)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    _interrupt_main_after(0.2)
+    start = time.monotonic()
+    with pytest.raises(KeyboardInterrupt):
+        runtime.run(main())
+    assert cancelled.is_set()
+    assert time.monotonic() - start < 5
+
+
+@pytest.mark.skipif(os.name == "nt", reason="SIGINT can't be sent")
+def test_runtime_cancels_main_thread_job():
+    async def main():
+        await run_in_main_thread(time.sleep, 30)
+
+    _interrupt_main_after(0.2)
+    with pytest.raises(KeyboardInterrupt):
+        runtime.run(main())
+
+
+@pytest.mark.skipif(os.name == "nt", reason="SIGINT can't be sent")
+def test_runtime_recovers_after_a_failed_run(mocker):
+    serve_jobs = runtime._serve_jobs
+
+    def fail(*args):
+        raise RuntimeError("boom")
+
+    mocker.patch.object(runtime, "_serve_jobs", side_effect=fail)
+    with pytest.raises(RuntimeError):
+        runtime.run(asyncio.sleep(0.1))
+    # the cancelled run is over before the next one starts
+    time.sleep(0.3)
+    mocker.patch.object(runtime, "_serve_jobs", side_effect=serve_jobs)
+
+    async def main():
+        return await run_in_main_thread(threading.current_thread)
+
+    # a deadlock is broken by ctrl-c instead of hanging the tests
+    timer = threading.Timer(5, os.kill, (os.getpid(), signal.SIGINT))
+    timer.start()
+    try:
+        assert runtime.run(main()) is threading.main_thread()
+    except KeyboardInterrupt:
+        pytest.fail("the run never served its jobs")
+    finally:
+        timer.cancel()
+
+
+class _Graph:
+    async def astream(self, inputs, stream_mode):
+        yield {"chatbot": {"tool_history": [AIMessage(content="first step")]}}
+        yield {
+            "chatbot": {
+                "tool_history": [
+                    AIMessage(
+                        content="",
+                        tool_calls=[
+                            {"name": "shell", "args": {"arg": "ls"}, "id": "1"}
+                        ],
+                    )
+                ]
+            }
+        }
+        await asyncio.sleep(30)
+
+
+@pytest.mark.skipif(os.name == "nt", reason="SIGINT can't be sent")
+def test_agent_keeps_history_when_interrupted(mocker):
+    mocker.patch.object(agent, "run_few_shot_examples", return_value=[])
+    mocker.patch.object(agent, "shy_agent_graph", _Graph())
+    mocker.patch.object(agent.settings.llm, "agent_pattern", "function_call")
+    shy = agent.ShyAgent(interactive=False)
+
+    _interrupt_main_after(0.2)
+    shy.start("hello")
+
+    assert [m.content for m in shy.history] == ["hello", "first step"]
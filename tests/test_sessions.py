@@ -0,0 +1,71 @@
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+from shy_sh.models import ToolMeta
+from shy_sh.sessions import session_store
+from tests.utils import mock_llm
+
+
+def _turn(i):
+    return [
+        HumanMessage(f"question {i}"),
+        AIMessage(f'{{"tool": "shell", "arg": "ls {i}"}}'),
+        ToolMessage("x" * 400, tool_call_id=f"call_{i}", artifact=ToolMeta()),
+        AIMessage(f"answer {i}"),
+    ]
+
+
+def test_session_store_loads_the_last_turns():
+    session_id = session_store.create("question 0")
+    for i in range(5):
+        question, *steps = _turn(i)
+        session_store.append(session_id, [question], new_turn=True)
+        session_store.append(session_id, steps)
+
+    turn_tokens = session_store.get(session_id)["tokens"] // 5
+    messages = session_store.load(session_id, turn_tokens * 2 + 10)
+
+    assert len(messages) == 8
+    assert messages[0].content == "question 3"
+    assert messages[-1].content == "answer 4"
+    assert isinstance(messages[2], ToolMessage)
+    assert messages[2].artifact == ToolMeta()
+    assert session_store.load(session_id, 1) == []
+
+
+def test_session_store_pop_and_latest():
+    first = session_store.create("first")
+    second = session_store.create("second")
+    session_store.append(first, _turn(0), new_turn=True)
+    session_store.pop(first)
+
+    assert session_store.latest() == first
+    assert session_store.get(second)["messages"] == 0
+    assert [m.content for m in session_store.load(first, 10000)][-1] == "x" * 400
+
+
+def test_session_store_compaction():
+    ids = [session_store.create(f"session {i}") for i in range(4)]
+    for session_id in ids:
+        session_store.append(session_id, _turn(session_id), new_turn=True)
+
+    # each session is about 1.3KB
+    session_store.compact(2600)
+
+    assert [s["id"] for s in session_store.list()] == ids[:1:-1]
+
+
+def test_resume_session(exec, mocker):
+    with mock_llm(mocker, ["first answer", "second answer"]):
+        assert exec("first question").exit_code == 0
+        result = exec("--resume what did I ask?")
+        assert result.exit_code == 0
+        assert "Session 1 resumed (2 messages)" in result.stdout
+        assert "✨: what did I ask?" in result.stdout
+
+    history = session_store.load(1, 10000)
+    assert [m.content for m in history] == [
+        "first question",
+        "first answer",
+        "what did I ask?",
+        "second answer",
+    ]
+    assert "first question" in exec("--sessions").stdout
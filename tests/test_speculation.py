@@ -0,0 +1,65 @@
+from threading import Event
+from langchain_core.runnables import RunnableGenerator
+from shy_sh.stats import stats
+from shy_sh.agents.speculation import SpeculativeStream
+from tests.utils import mock_llm
+
+
+def _chunks(chunks, release=None):
+    def stream(_):
+        for chunk in chunks:
+            if release:
+                release.wait(5)
+            yield chunk
+
+    return RunnableGenerator(stream)
+
+
+def test_speculative_stream_replays_chunks():
+    stream = SpeculativeStream("test", _chunks(["a", "b", "c"]), {})
+    assert "".join(stream) == "abc"
+    stream.close()
+    assert stats.values()["speculation.test.started"] == 1
+    assert stats.values()["speculation.test.used"] == 1
+
+
+def test_speculative_stream_follows_running_stream():
+    release = Event()
+    stream = SpeculativeStream("test", _chunks(["a", "b"], release), {})
+    release.set()
+    assert list(stream) == ["a", "b"]
+
+
+def test_speculative_stream_cancel():
+    release = Event()
+    stream = SpeculativeStream("test", _chunks(["a", "b"], release), {})
+    stream.close()
+    release.set()
+    assert stats.values()["speculation.test.cancelled"] == 1
+    assert "speculation.test.used" not in stats.values()
+
+
+def test_shell_tool_serves_prefetched_explanation(exec, mocker):
+    mocker.patch("shy_sh.agents.tools.shell.settings.speculative", True)
+    mocker.patch("shy_sh.agents.tools.shell.ask_confirm", return_value="e")
+    mocker.patch("shy_sh.agents.chains.explain.ask_confirm", return_value="n")
+    explain_stream = mocker.patch(
+        "shy_sh.agents.chains.explain.explain_chain.stream",
+        wraps=lambda *args, **kwargs: iter(["it prints ", "fine thanks"]),
+    )
+    alternatives_stream = mocker.patch(
+        "shy_sh.agents.chains.alternative_commands.alternative_commands_chain.stream",
+        wraps=lambda *args, **kwargs: iter(["# echo\n```\necho ok\n```"]),
+    )
+    with mock_llm(
+        mocker,
+        ['{"tool": "shell", "arg": "echo fine thanks", "thoughts": "test"}'],
+    ):
+        result = exec("how are you")
+        assert result.exit_code == 0
+        assert "it prints fine thanks" in result.stdout
+        assert explain_stream.call_count == 1
+        assert alternatives_stream.call_count == 1
+    values = stats.values()
+    assert values["speculation.explain.used"] == 1
+    assert values["speculation.alternatives.cancelled"] == 1
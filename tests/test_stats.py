@@ -0,0 +1,38 @@
+import json
+import pytest
+import multiprocessing
+from shy_sh import stats as stats_module
+from shy_sh.stats import Stats
+
+
+def _add_and_flush(path, times):
+    stats = Stats(path)
+    for _ in range(times):
+        stats.add("calls")
+        stats.add("seconds", 0.5)
+        stats.flush()
+
+
+def test_flush_adds_to_the_file(tmp_path):
+    stats = Stats(tmp_path / "stats.json")
+    stats.add("calls")
+    stats.flush()
+    stats.add("calls", 2)
+    assert stats.values() == {"calls": 3}
+    stats.flush()
+    assert json.loads((tmp_path / "stats.json").read_text()) == {"calls": 3}
+
+
+@pytest.mark.skipif(stats_module.fcntl is None, reason="needs fcntl")
+def test_concurrent_flushes_keep_every_increment(tmp_path):
+    path = tmp_path / "stats.json"
+    context = multiprocessing.get_context("fork")
+    processes = [
+        context.Process(target=_add_and_flush, args=(path, 25)) for _ in range(6)
+    ]
+    for p in processes:
+        p.start()
+    for p in processes:
+        p.join()
+
+    assert json.loads(path.read_text()) == {"calls": 150, "seconds": 75}
@@ -0,0 +1,61 @@
+from langchain_core.messages import AIMessageChunk
+from shy_sh.agents.streaming import StreamAccumulator, ReactToolParser
+
+
+def test_stream_accumulator_text():
+    stream = StreamAccumulator()
+    for delta in ["he", "", "llo", " wor", "ld"]:
+        stream.add(AIMessageChunk(content=delta))
+    stream.add(AIMessageChunk(content=[{"type": "text", "text": "!"}]))
+
+    assert stream.text == "hello world!"
+    assert stream.first_text == "he"
+    assert not stream.has_tool_calls
+    assert stream.message().content == "hello world!"
+
+
+def test_stream_accumulator_tool_calls():
+    stream = StreamAccumulator()
+    deltas = [
+        {"name": "shell", "args": "", "id": "call_1", "index": 0},
+        {"name": None, "args": '{"arg": ', "id": None, "index": 0},
+        {"name": "shell_history", "args": "{}", "id": "call_2", "index": 1},
+        {"name": None, "args": '"ls"}', "id": None, "index": 0},
+    ]
+    for delta in deltas:
+        stream.add(AIMessageChunk(content="", tool_call_chunks=[delta]))
+
+    assert stream.has_tool_calls
+    assert not stream.raw_content
+    assert stream.tool_calls == [
+        {"name": "shell", "args": {"arg": "ls"}, "id": "call_1", "type": "tool_call"},
+        {"name": "shell_history", "args": {}, "id": "call_2", "type": "tool_call"},
+    ]
+
+
+def test_react_tool_parser_split_chunks():
+    text = (
+        'Let me check. {"tool": "shell", "arg": "echo \\"}{\\" | grep \'{\'", '
+        '"thoughts": "braces {inside} strings"} trailing text'
+    )
+    for size in [1, 2, 3, 7, len(text)]:
+        parser = ReactToolParser()
+        results = [parser.feed(text[i : i + size]) for i in range(0, len(text), size)]
+        tool = results[-1]
+        assert tool.tool == "shell"
+        assert tool.arg == "echo \"}{\" | grep '{'"
+        assert tool.thoughts == "braces {inside} strings"
+
+
+def test_react_tool_parser_detects_the_object_when_it_closes():
+    parser = ReactToolParser()
+    assert parser.feed('{"tool": "shell", "arg": "ls"') is None
+    assert parser.feed("}").arg == "ls"
+    assert parser.feed('{"tool": "other", "arg": "pwd"}').arg == "ls"
+
+
+def test_react_tool_parser_skips_invalid_objects():
+    parser = ReactToolParser()
+    assert parser.feed('Example: {"a": {"b": 1}}\n') is None
+    assert parser.feed("no tool here") is None
+    assert parser.feed('{"tool": "shell", "arg": "pwd"}').arg == "pwd"
@@ -0,0 +1,150 @@
+import asyncio
+from threading import Event
+from langchain_core.messages import AIMessage, HumanMessage
+from shy_sh.stats import stats
+from shy_sh.agents.tokens import TokenLedger
+from shy_sh.agents.shy_agent import summary
+from shy_sh.agents.shy_agent.summary import (
+    HistorySummarizer,
+    SUMMARY_PREFIX,
+    split_turns,
+)
+from tests.utils import mock_settings
+
+
+def _turn(i):
+    return [
+        HumanMessage(f"question {i}"),
+        AIMessage(f'{{"tool": "shell", "arg": "ls {i}"}}'),
+        HumanMessage(f"Tool response:\nfile{i}"),
+        AIMessage(f"answer {i}"),
+    ]
+
+
+def _history(turns):
+    return [m for i in range(turns) for m in _turn(i)] + [HumanMessage("last")]
+
+
+def _setup(mocker, context=1000):
+    ledger = TokenLedger()
+    # every message counts 100 tokens
+    mocker.patch.object(ledger, "_encode_len", return_value=97)
+    mocker.patch.object(summary, "token_ledger", ledger)
+    mocker.patch.object(summary, "get_llm_context", return_value=context)
+    calls = []
+
+    def summarize(previous, messages):
+        calls.append((previous, [m.content for m in messages]))
+        return f"summary {len(calls)}"
+
+    mocker.patch.object(summary, "_summarize", side_effect=summarize)
+    return calls
+
+
+def _compress(summarizer, history):
+    return asyncio.run(summarizer.compress(history, [], offset=0))
+
+
+def _wait(summarizer):
+    pending = summarizer._pending
+    if pending is not None:
+        pending.result(timeout=5)
+
+
+def test_split_turns_keeps_tool_responses():
+    turns = split_turns(_history(2))
+    assert [len(t) for t in turns] == [4, 4, 1]
+
+
+def test_summarizer_folds_the_oldest_turns(mocker):
+    calls = _setup(mocker, context=2000)
+    summarizer = HistorySummarizer()
+    history = _history(2)
+
+    # under the high-water mark nothing happens
+    assert _compress(summarizer, history) == history
+    assert not calls
+
+    # over it the oldest turns are summarized in background, the full
+    # history is still used while it fits
+    history = _history(2) + _turn(2)[1:] + [HumanMessage("next")]
+    assert _compress(summarizer, history) == history
+    _wait(summarizer)
+    assert calls == [("", [m.content for m in history[:8]])]
+
+    view = _compress(summarizer, history)
+    assert view[0].content == SUMMARY_PREFIX + "summary 1"
+    assert view[1:] == history[8:]
+    assert stats.values()["history.summaries"] == 1
+
+
+def test_summarizer_reuses_the_summary(mocker):
+    calls = _setup(mocker, context=2000)
+    mock_settings({"history": {"keep_turns": 1}})
+    summarizer = HistorySummarizer()
+    history = _history(3)
+    _compress(summarizer, history)
+    _wait(summarizer)
+    history += [AIMessage("answer"), *_turn(3), *_turn(4), *_turn(5)]
+    history.append(HumanMessage("again"))
+    _compress(summarizer, history)
+    _wait(summarizer)
+
+    # the second call gets only the turns evicted since the first one
+    assert calls[1][0] == "summary 1"
+    assert calls[1][1][0] == "last"
+    assert len(calls[1][1]) == 14
+    view = _compress(summarizer, history)
+    assert view[0].content == SUMMARY_PREFIX + "summary 2"
+    assert view[1:] == [history[-1]]
+
+
+def test_summarizer_waits_when_the_context_is_full(mocker):
+    calls = _setup(mocker, context=500)
+    mock_settings({"history": {"keep_turns": 1}})
+    history = _history(3)
+
+    view = _compress(HistorySummarizer(), history)
+
+    assert len(calls) == 1
+    assert view[0].content == SUMMARY_PREFIX + "summary 1"
+    assert view[1:] == [history[-1]]
+
+
+def test_summarizer_disabled_drops_whole_turns(mocker):
+    calls = _setup(mocker, context=1000)
+    mock_settings({"history": {"summarize": False}})
+    history = _history(3)
+
+    view = _compress(HistorySummarizer(), history)
+
+    assert not calls
+    assert view == history[4:]
+
+
+def test_summarizer_discards_the_summary_of_another_conversation(mocker):
+    calls = _setup(mocker, context=2000)
+    mock_settings({"history": {"keep_turns": 1}})
+    started, release = Event(), Event()
+    summarize = summary._summarize.side_effect
+
+    def slow_summarize(previous, messages):
+        started.set()
+        release.wait(5)
+        return summarize(previous, messages)
+
+    summary._summarize.side_effect = slow_summarize
+    summarizer = HistorySummarizer()
+    _compress(summarizer, _history(3))
+    pending = summarizer._pending
+    assert started.wait(5)
+
+    # a resumed session while the summary of the old one is running
+    resumed = _history(2)
+    assert _compress(summarizer, resumed) == resumed
+    assert summarizer._pending is None
+    release.set()
+    pending.result(timeout=5)
+
+    assert len(calls) == 1
+    assert _compress(summarizer, resumed) == resumed
@@ -0,0 +1,30 @@
+from langchain_core.messages import HumanMessage, AIMessage
+from shy_sh.agents.tokens import TokenLedger, resolve_tokenizer, get_tokenizer
+
+
+def test_token_ledger_counts_each_message_once(mocker):
+    ledger = TokenLedger()
+    encode = mocker.patch.object(ledger, "_encode_len", side_effect=len)
+    messages = [HumanMessage(content="hello"), AIMessage(content="world!")]
+
+    assert ledger.total(messages, offset=0) == 17
+    assert ledger.total(messages + [HumanMessage(content="hello")], offset=0) == 25
+    assert encode.call_count == 2
+
+
+def test_resolve_tokenizer():
+    assert resolve_tokenizer("openai", "gpt-4o-mini") == ("o200k_base", None)
+    assert resolve_tokenizer("openai", "gpt-4-turbo") == ("cl100k_base", None)
+    assert resolve_tokenizer("groq", "llama3-70b-8192") == ("cl100k_base", 1.0)
+    assert resolve_tokenizer("aws", "us.meta.llama3-1-8b-instruct-v1:0") == (
+        "cl100k_base",
+        1.0,
+    )
+    assert resolve_tokenizer("anthropic", "claude-3-5-sonnet-latest")[1] == 1.15
+    assert resolve_tokenizer("anthropic", "unknown") == ("cl100k_base", 1.15)
+
+
+def test_get_tokenizer_is_cached():
+    tokenizer = get_tokenizer("google", "gemini-1.5-flash")
+    assert get_tokenizer("google", "gemini-1.5-flash") is tokenizer
+    assert tokenizer.count("hello world") > 0
@@ -0,0 +1,77 @@
+import pytest
+import asyncio
+from shy_sh.agents import llms
+from shy_sh.agents.transport import ConnectionPools, connection_pools, origin
+from shy_sh.stats import stats
+from tests.utils import mock_settings, stub_server
+
+
+@pytest.fixture
+def server():
+    with stub_server() as server:
+        yield server
+
+
+def test_origin():
+    assert origin("https://llm.prtl.cc/v1/") == "https://llm.prtl.cc"
+    assert origin("localhost:11434") == "http://localhost:11434"
+
+
+def test_clients_share_the_pool(server):
+    pools = ConnectionPools()
+    pools._connect(server.url)
+    assert server.connections == 1
+    assert stats._pending["http.warm_ups"] == 1
+
+    for _ in range(2):
+        pools.client(server.url).get(f"{server.url}/a").raise_for_status()
+        # closing a client doesn't close the shared pool
+        with pools.client(f"{server.url}/v1") as client:
+            client.post(f"{server.url}/b", json={}).raise_for_status()
+    assert server.connections == 1
+
+
+def test_async_clients_share_the_pool(server):
+    pools = ConnectionPools()
+
+    async def run():
+        await pools._aconnect(server.url)
+        for _ in range(3):
+            response = await pools.async_client(server.url).get(f"{server.url}/a")
+            response.raise_for_status()
+
+    asyncio.run(run())
+    assert server.connections == 1
+    # the pools are per event loop
+    asyncio.run(run())
+    assert server.connections == 2
+
+
+def test_warm_up_failure():
+    ConnectionPools()._connect("http://127.0.0.1:1")
+    assert stats._pending["http.warm_up_errors"] == 1
+
+
+def test_llm_reuses_the_warm_connection(mocker, server):
+    mock_settings({"llm": {"provider": "openai", "name": "gpt-4o", "api_key": "k"}})
+    mocker.patch.object(llms, "OPENAI_BASE_URL", server.url)
+    mocker.patch.object(connection_pools, "_transports", {})
+
+    connection_pools._connect(llms.get_llm_endpoints()[0])
+    llm = llms._get_llm(llms.settings.llm)
+    assert llm.invoke("hi").content == "ok"
+    assert llm.invoke("hi again").content == "ok"
+    assert server.connections == 1
+
+
+def test_ollama_uses_the_pools(mocker):
+    mock_settings({"llm": {"provider": "ollama", "name": "llama3.2"}})
+    mocker.patch.object(llms, "ollama_host", return_value="http://ollama:11434")
+    mocker.patch.object(connection_pools, "_transports", {})
+    llm = llms._get_llm(llms.settings.llm)
+    assert llm._client._client._transport is connection_pools.transport(
+        "http://ollama:11434"
+    )
+    assert llm._async_client._client._transport is connection_pools.async_transport(
+        "http://ollama:11434"
+    )
@@ -0,0 +1,52 @@
+import os
+import sys
+import time
+import pytest
+from shy_sh import utils
+from shy_sh.capture import OutputCapture
+from shy_sh.utils import stream_shell
+
+
+def _python(code):
+    return f'"{sys.executable}" -c "{code}"'
+
+
+def test_stream_shell_decodes_split_characters():
+    stream = stream_shell(
+        _python(
+            "import sys, time; out = sys.stdout.buffer; "
+            "out.write(b'h\\xc3'); out.flush(); time.sleep(0.1); "
+            "out.write(b'\\xa9llo'); out.flush(); sys.exit(3)"
+        )
+    )
+    assert "".join(stream) == "héllo"
+    assert stream.returncode == 3
+
+
+def test_stream_shell_drains_stderr():
+    stream = stream_shell(
+        _python(
+            "import sys; sys.stderr.write('x' * 1000000); sys.stderr.flush(); "
+            "print('done')"
+        )
+    )
+    output = "".join(stream)
+    assert output.count("x") == 1000000
+    assert "done" in output
+    assert stream.returncode == 0
+
+
+@pytest.mark.skipif(os.name == "nt", reason="no process groups")
+def test_stream_shell_kills_commands_ignoring_sigterm(mocker):
+    mocker.patch.object(utils, "STOP_GRACE_SECONDS", 0.2)
+    capture = OutputCapture(max_seconds=0.3)
+    stream = stream_shell(
+        _python(
+            "import signal, time; signal.signal(signal.SIGTERM, signal.SIG_IGN); "
+            "print('ready', flush=True); time.sleep(30)"
+        ),
+        capture,
+    )
+    start = time.monotonic()
+    assert "ready" in "".join(stream)
+    assert time.monotonic() - start < 5
@@ -1,8 +1,11 @@
 from shy_sh.settings import settings, _Settings
-from shy_sh.agents.llms import get_llm
+from shy_sh.agents.llms import get_llm, get_fallback_llms
 from langchain_community.llms.fake import FakeListLLM
 from langchain_core.messages import AIMessage
 from contextlib import contextmanager
+from threading import Thread
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
 
 
 def mock_settings(config):
@@ -20,3 +23,64 @@ def mock_llm(mocker, responses=["test", "test2", "test3", "test4"]):
     mocker.patch("shy_sh.agents.llms._get_llm", return_value=llm)
     yield llm
     get_llm.cache_clear()
+    get_fallback_llms.cache_clear()
+
+
+COMPLETION = {
+    "id": "chatcmpl-1",
+    "object": "chat.completion",
+    "created": 0,
+    "model": "gpt-4o",
+    "choices": [
+        {
+            "index": 0,
+            "message": {"role": "assistant", "content": "ok"},
+            "finish_reason": "stop",
+        }
+    ],
+}
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        self.server.connections += 1
+
+    def _reply(self, body=b""):
+        self.server.requests.append(f"{self.command} {self.path}")
+        self.send_response(self.server.status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        return body
+
+    def do_HEAD(self):
+        self._reply()
+
+    def do_GET(self):
+        self.wfile.write(self._reply(b"{}"))
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self.wfile.write(self._reply(json.dumps(COMPLETION).encode()))
+
+    def log_message(self, *args):
+        pass
+
+
+@contextmanager
+def stub_server(status=200):
+    """A local OpenAI compatible server counting its connections and requests"""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _StubHandler)
+    server.connections = 0
+    server.requests = []
+    server.status = status
+    server.url = f"http://127.0.0.1:{server.server_address[1]}"
+    Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        yield server
+    finally:
+        server.shutdown()
+        server.server_close()